@@ -1,12 +1,20 @@
-from typing import Union
+from math import comb
+from os import getpid, makedirs, replace
+from os.path import expanduser, isfile, join
+from typing import List, Tuple, Union
+from uuid import uuid4
 
+import numpy as np
 from pymoo.algorithms.moo.unsga3 import NSGA3
 from pymoo.algorithms.soo.nonconvex.ga import GA
 from pymoo.algorithms.soo.nonconvex.nelder import NelderMead
 from pymoo.algorithms.soo.nonconvex.pso import PSO
 from pymoo.core.population import Population
+from pymoo.core.repair import NoRepair, Repair
 from pymoo.factory import get_reference_directions
 from pymoo.operators.sampling.rnd import FloatRandomSampling
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+from scipy.stats.qmc import LatinHypercube
 
 
 class Optimizers:
@@ -20,24 +28,279 @@ class Optimizers:
         self,
         popSize: int,
         restartPop: Union[FloatRandomSampling, Population] = FloatRandomSampling(),
+        repair: Union[Repair, None] = None,
         **kwargs
     ):
-        return GA(pop_size=popSize, eliminate_duplicates=True, sampling=restartPop)  # type: ignore
+        return GA(pop_size=popSize, eliminate_duplicates=True, sampling=restartPop, repair=repair)  # type: ignore
 
     def particleSwarm(
         self,
         popSize: int,
         restartPop: Union[FloatRandomSampling, Population] = FloatRandomSampling(),
+        repair: Union[Repair, None] = None,
         **kwargs
     ):
-        return PSO(pop_size=popSize, sampling=restartPop)  # type: ignore
+        return PSO(pop_size=popSize, sampling=restartPop, repair=repair or NoRepair())  # type: ignore
 
     def nsga3(
         self,
         popSize: int,
         nObj: int,
         restartPop: Union[FloatRandomSampling, Population] = FloatRandomSampling(),
+        refDirsMethod: str = "energy",
+        nRefDirs: Union[int, None] = None,
+        refDirsSeed: int = 1,
+        cacheDirectory: Union[str, None] = None,
+        repair: Union[Repair, None] = None,
         **kwargs
     ):
-        ref_dirs = get_reference_directions("energy", nObj, n_points=nObj + 1, seed=1)
-        return NSGA3(pop_size=popSize, ref_dirs=ref_dirs, eliminate_duplicates=True, sampling=restartPop)  # type: ignore
+        ref_dirs = referenceDirections(
+            refDirsMethod,
+            nObj,
+            nPoints=nRefDirs or popSize,
+            seed=refDirsSeed,
+            cacheDirectory=cacheDirectory,
+        )
+        return NSGA3(pop_size=popSize, ref_dirs=ref_dirs, eliminate_duplicates=True, sampling=restartPop, repair=repair)  # type: ignore
+
+
+class MixedVariableRepair(Repair):
+    """Snap the integer and categorical variables of the offspring to their discrete lattice."""
+
+    def __init__(
+        self, variableTypes: List[str], catalogs: List[Union[List[float], None]]
+    ) -> None:
+        """Initialize the repair.
+
+        Args:
+            variableTypes (List[str]): Type of each variable: "real", "integer" or "categorical".
+            catalogs (List[Union[List[float], None]]): Sorted values of each categorical variable, None for the others.
+        """
+        super().__init__()
+        self.variableTypes = variableTypes
+        self.catalogs = catalogs
+
+    def _do(self, problem, X, **kwargs):
+        X = np.array(X, dtype=float)
+        for i, (variableType, catalog) in enumerate(zip(self.variableTypes, self.catalogs)):
+            if variableType == "integer":
+                X[:, i] = np.clip(  # the search bounds are widened by half a step
+                    np.round(X[:, i]), np.ceil(problem.xl[i]), np.floor(problem.xu[i])
+                )
+            elif variableType == "categorical":
+                catalog = np.asarray(catalog, dtype=float)
+                nearest = np.abs(X[:, i, None] - catalog[None, :]).argmin(axis=1)
+                X[:, i] = catalog[nearest]
+        return X
+
+
+class SteadyStateEvolution:
+    """A steady-state evolutionary algorithm with an ask/tell interface.
+
+    Each call to ask() breeds a single candidate from the current population and each call to tell()
+    inserts one evaluated design and drops the worst one, so that evaluations can be consumed in any
+    order and as soon as they complete (asynchronous optimization).
+    """
+
+    def __init__(
+        self,
+        lowerBounds: List[float],
+        upperBounds: List[float],
+        popSize: int,
+        seed: int = 1,
+        crossoverEta: float = 15,
+        mutationEta: float = 20,
+        crossoverProb: float = 0.9,
+    ) -> None:
+        self.xl = np.asarray(lowerBounds, dtype=float)
+        self.xu = np.asarray(upperBounds, dtype=float)
+        self.nVar = len(self.xl)
+        self.popSize = popSize
+        self.crossoverEta = crossoverEta
+        self.mutationEta = mutationEta
+        self.crossoverProb = crossoverProb
+
+        self._rng = np.random.default_rng(seed)
+        initial = LatinHypercube(d=self.nVar, seed=seed).random(n=popSize)
+        self._initial = list(self.xl + initial * (self.xu - self.xl))
+
+        self.X = np.empty((0, self.nVar))
+        self.F = None
+        self.CV = np.empty(0)
+        self._order = np.empty(0, dtype=int)
+
+    def ask(self) -> np.ndarray:
+        """Returns a new candidate: an initial sample first, then the offspring of two tournament winners."""
+        if self._initial:
+            return self._initial.pop()
+        if len(self.X) < 2:
+            return self.xl + self._rng.random(self.nVar) * (self.xu - self.xl)
+
+        first, second = self._tournament(), self._tournament()
+        child = self._mutation(self._crossover(self.X[first], self.X[second]))
+        for _ in range(10):  # avoid re-evaluating a design already in the population
+            if not np.any(np.all(self.X == child, axis=1)):
+                break
+            child = self._mutation(child, force=True)
+        return child
+
+    def tell(self, x: np.ndarray, f: List[float], g: List[float]) -> None:
+        """Insert an evaluated design and keep the best popSize designs.
+
+        Args:
+            x (np.ndarray): The design.
+            f (List[float]): Its objectives.
+            g (List[float]): Its constraints (feasible when <= 0).
+        """
+        f = np.atleast_1d(np.asarray(f, dtype=float))
+        cv = float(np.sum(np.maximum(np.asarray(g, dtype=float), 0)))
+        self.X = np.vstack([self.X, x])
+        self.F = f[None, :] if self.F is None else np.vstack([self.F, f])
+        self.CV = np.append(self.CV, cv)
+
+        self._order = self._survivalOrder()
+        if len(self.X) > self.popSize:
+            keep = np.sort(self._order[: self.popSize])
+            self.X, self.F, self.CV = self.X[keep], self.F[keep], self.CV[keep]
+            self._order = self._survivalOrder()
+
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the best designs found: the first non-dominated front (the best design for single objective)."""
+        feasible = self.CV == 0
+        candidates = np.flatnonzero(feasible) if feasible.any() else self._order[:1]
+        front = NonDominatedSorting().do(self.F[candidates], only_non_dominated_front=True)
+        best = candidates[front]
+        return self.X[best], self.F[best]
+
+    def _survivalOrder(self) -> np.ndarray:
+        """Order designs from best to worst: feasible first by front and crowding, infeasible by violation."""
+        feasible = np.flatnonzero(self.CV == 0)
+        infeasible = np.flatnonzero(self.CV > 0)
+        order = []
+        if len(feasible):
+            for front in NonDominatedSorting().do(self.F[feasible]):
+                members = feasible[front]
+                crowding = SteadyStateEvolution._crowdingDistance(self.F[members])
+                order.extend(members[np.argsort(-crowding, kind="stable")])
+        order.extend(infeasible[np.argsort(self.CV[infeasible], kind="stable")])
+        return np.asarray(order, dtype=int)
+
+    def _tournament(self) -> int:
+        position = np.empty(len(self._order), dtype=int)
+        position[self._order] = np.arange(len(self._order))
+        first, second = self._rng.choice(len(self.X), size=2, replace=False)
+        return first if position[first] < position[second] else second
+
+    def _crossover(self, parent1: np.ndarray, parent2: np.ndarray) -> np.ndarray:
+        """Simulated binary crossover returning one child."""
+        if self._rng.random() > self.crossoverProb:
+            return parent1.copy()
+        u = self._rng.random(self.nVar)
+        beta = np.where(
+            u <= 0.5,
+            (2 * u) ** (1 / (self.crossoverEta + 1)),
+            (1 / (2 * (1 - u))) ** (1 / (self.crossoverEta + 1)),
+        )
+        sign = np.where(self._rng.random(self.nVar) < 0.5, 1, -1)
+        child = 0.5 * ((parent1 + parent2) + sign * beta * (parent1 - parent2))
+        return np.clip(child, self.xl, self.xu)
+
+    def _mutation(self, x: np.ndarray, force: bool = False) -> np.ndarray:
+        """Polynomial mutation with a probability of 1/nVar per variable (at least one variable if forced)."""
+        mutate = self._rng.random(self.nVar) < 1 / self.nVar
+        if force:
+            mutate[self._rng.integers(self.nVar)] = True
+        u = self._rng.random(self.nVar)
+        delta = np.where(
+            u < 0.5,
+            (2 * u) ** (1 / (self.mutationEta + 1)) - 1,
+            1 - (2 * (1 - u)) ** (1 / (self.mutationEta + 1)),
+        )
+        x = np.where(mutate, x + delta * (self.xu - self.xl), x)
+        return np.clip(x, self.xl, self.xu)
+
+    @staticmethod
+    def _crowdingDistance(F: np.ndarray) -> np.ndarray:
+        nPoints, nObj = F.shape
+        if nPoints <= 2:
+            return np.full(nPoints, np.inf)
+        distance = np.zeros(nPoints)
+        for j in range(nObj):
+            order = np.argsort(F[:, j])
+            span = F[order[-1], j] - F[order[0], j]
+            distance[order[0]] = distance[order[-1]] = np.inf
+            if span > 0:
+                distance[order[1:-1]] += (F[order[2:], j] - F[order[:-2], j]) / span
+        return distance
+
+
+_referenceDirectionsCache = {}
+
+
+def referenceDirections(
+    method: str,
+    nObj: int,
+    nPoints: int,
+    seed: int = 1,
+    cacheDirectory: Union[str, None] = None,
+) -> np.ndarray:
+    """Reference directions for NSGA3, computed once and cached in memory and on disk.
+
+    Args:
+        method (str): "das-dennis", "multi-layer" (a boundary and an inner Das-Dennis layer, for many objectives) or "energy".
+        nObj (int): Number of objectives.
+        nPoints (int): Maximum number of directions, typically the population size. Das-Dennis layers use the largest number of partitions that fits.
+        seed (int, optional): Random seed of the energy method. Defaults to 1.
+        cacheDirectory (Union[str, None], optional): Directory of the disk cache. Defaults to ~/.cache/theeng/refdirs.
+
+    Raises:
+        ValueError: If the method is not known.
+
+    Returns:
+        np.ndarray: The reference directions (nDirections, nObj).
+    """
+    if method not in ("das-dennis", "multi-layer", "energy"):
+        raise ValueError(
+            f"Invalid reference directions method {method}. Use das-dennis, multi-layer or energy."
+        )
+    key = (method, nObj, nPoints, seed)
+    if key in _referenceDirectionsCache:
+        return _referenceDirectionsCache[key]
+
+    cacheDirectory = cacheDirectory or join(expanduser("~"), ".cache", "theeng", "refdirs")
+    cachePath = join(cacheDirectory, f"{method}-{nObj}-{nPoints}-{seed}.npy")
+    if isfile(cachePath):
+        ref_dirs = np.load(cachePath)
+    else:
+        if method == "energy":
+            ref_dirs = get_reference_directions("energy", nObj, n_points=nPoints, seed=seed)
+        elif method == "das-dennis":
+            ref_dirs = get_reference_directions(
+                "das-dennis", nObj, n_partitions=_partitions(nObj, nPoints)
+            )
+        else:
+            partitions = _partitions(nObj, nPoints // 2)
+            ref_dirs = get_reference_directions(
+                "multi-layer",
+                get_reference_directions(
+                    "das-dennis", nObj, n_partitions=partitions, scaling=1.0
+                ),
+                get_reference_directions(
+                    "das-dennis", nObj, n_partitions=partitions, scaling=0.5
+                ),
+            )
+        makedirs(cacheDirectory, exist_ok=True)
+        temporaryPath = f"{cachePath}.{getpid()}-{uuid4().hex}.tmp.npy"  # unique across processes
+        np.save(temporaryPath, ref_dirs)
+        replace(temporaryPath, cachePath)  # atomic, parallel runs may write the same file
+
+    _referenceDirectionsCache[key] = ref_dirs
+    return ref_dirs
+
+
+def _partitions(nObj: int, nPoints: int) -> int:
+    """Largest number of Das-Dennis partitions giving at most nPoints directions (at least one partition)."""
+    partitions = 1
+    while comb(partitions + nObj, nObj - 1) <= nPoints:
+        partitions += 1
+    return partitions
@@ -1,6 +1,7 @@
-from math import sqrt
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple
 
+import numpy as np
 from pandas import DataFrame, concat
 
 from theeng.core.problem import ProblemConstructor
@@ -12,19 +13,18 @@ class Rankers:
     ) -> None:
         self.data = data
         self.objectivesData = data[problem.getObjectivesExpressions()]
-        normData = Rankers._normalization(self.objectivesData)
-        self.weightedNormData = Rankers._weightening(normData, weights)
+        self.normData = Rankers._normalization(self.objectivesData)
+        self.weights = weights
+        self.weightedNormData = Rankers._weightening(self.normData, weights)
 
     def topsis(self):
         bestDesign = self.weightedNormData.min(axis=0)
         worstDesign = self.weightedNormData.max(axis=0)
-        performanceScore = []
-        for _, design in self.weightedNormData.iterrows():
-            positiveSeparation = sqrt(sum((design - bestDesign) ** 2))
-            negativeSeparation = sqrt(sum((design - worstDesign) ** 2))
-            performanceScore.append(
-                negativeSeparation / (negativeSeparation + positiveSeparation)
-            )
+        performanceScore = Rankers._topsisScores(
+            self.weightedNormData.to_numpy(dtype=float),
+            bestDesign.to_numpy(dtype=float),
+            worstDesign.to_numpy(dtype=float),
+        )
         resultData = concat(
             [
                 self.data.reset_index(drop=True),
@@ -61,19 +61,123 @@ class Rankers:
         sortedResultData = Rankers._returnEfficient(sortedResultData, reverse=False) # simple additive score is better when 0
         return sortedResultData
 
+    def vikor(self, v: float = 0.5):
+        """VIKOR compromise ranking: the group utility S and the individual regret R of each design, merged in Q.
+
+        Args:
+            v (float, optional): Weight of the group utility against the individual regret. Defaults to 0.5.
+        """
+        weightedNormData = self.weightedNormData.to_numpy(dtype=float)
+        groupUtility = weightedNormData.sum(axis=1)  # distance from the ideal, the normalized minimum
+        individualRegret = weightedNormData.max(axis=1)
+        performanceScore = v * Rankers._rescale(groupUtility) + (1 - v) * Rankers._rescale(
+            individualRegret
+        )
+        resultData = concat(
+            [
+                self.data.reset_index(drop=True),
+                DataFrame(
+                    performanceScore,
+                    columns=[
+                        "Score",
+                    ],
+                ),
+            ],
+            axis=1,
+        )
+        sortedResultData = resultData.sort_values("Score", ascending=True)
+        sortedResultData = Rankers._returnEfficient(sortedResultData, reverse=False) # vikor score is better when 0
+        return sortedResultData
+
+    def promethee(
+        self,
+        preference: str = "linear",
+        q: float = 0.05,
+        p: float = 0.5,
+        blockSize: int = 1024,
+        nWorkers: int = 1,
+    ):
+        """PROMETHEE II net outranking flows, from pairwise preferences computed in blocks of designs.
+
+        Args:
+            preference (str, optional): Preference function, "usual", "linear" (indifference q, preference p) or "gaussian" (width p). Defaults to "linear".
+            q (float, optional): Indifference threshold, in normalized objective units. Defaults to 0.05.
+            p (float, optional): Preference threshold, in normalized objective units, above q. Defaults to 0.5.
+            blockSize (int, optional): Number of designs compared at once, bounding memory to blockSize**2 * nObj values. Defaults to 1024.
+            nWorkers (int, optional): Number of processes sharing the blocks. Defaults to 1.
+        """
+        if preference not in ("usual", "linear", "gaussian"):
+            raise ValueError("Preference must be usual, linear or gaussian.")
+        if preference == "linear" and (q < 0 or p <= q):
+            raise ValueError("Linear preference needs 0 <= q < p.")
+        if preference == "gaussian" and p <= 0:
+            raise ValueError("Gaussian preference needs p > 0.")
+        normData = self.normData.to_numpy(dtype=float)
+        weights = np.asarray(self.weights, dtype=float)
+        n = len(normData)
+        if preference == "linear" and q == 0 and p >= 1:
+            # no difference reaches p, so each pair adds its difference / p; nan values skip their pairs as nansum does
+            differencesSum = np.nansum(normData, axis=0) - (~np.isnan(normData)).sum(axis=0) * normData
+            performanceScore = np.nan_to_num(differencesSum) @ weights / p
+        else:
+            starts = range(0, n, blockSize)
+            arguments = [
+                (normData, weights, preference, q, p, start, min(start + blockSize, n), blockSize)
+                for start in starts
+            ]
+            if nWorkers > 1:
+                with ProcessPoolExecutor(max_workers=nWorkers) as executor:
+                    flows = list(executor.map(_prometheeFlows, *zip(*arguments)))
+            else:
+                flows = [_prometheeFlows(*argument) for argument in arguments]
+            performanceScore = np.concatenate(flows) if flows else np.empty(0)
+        performanceScore = performanceScore / max(n - 1, 1)
+
+        resultData = concat(
+            [
+                self.data.reset_index(drop=True),
+                DataFrame(
+                    performanceScore,
+                    columns=[
+                        "Score",
+                    ],
+                ),
+            ],
+            axis=1,
+        )
+        sortedResultData = resultData.sort_values("Score", ascending=True)
+        sortedResultData = Rankers._returnEfficient(sortedResultData, reverse=True) # promethee net flow is better when high
+        return sortedResultData
+
+    @staticmethod
+    def _rescale(values: np.ndarray) -> np.ndarray:
+        spread = np.nanmax(values) - np.nanmin(values) if len(values) else 0
+        return (values - np.nanmin(values)) / spread if spread > 0 else np.zeros_like(values)
+
     @staticmethod
     def _returnEfficient(data: DataFrame, efficiencyCliff: float = 0.20, reverse: bool = False):
         if "Score" in data.columns:
-            sortedScores = sorted(data["Score"], reverse=reverse)
-            numElementsToExtract = int(len(data["Score"]) * efficiencyCliff)  # get number of elements corresponding to the smaller 20%
-            smallElements = sortedScores[:numElementsToExtract]  # get 20% smaller elements to extract
-
-            data["Efficiency"] = [
-                True if value in smallElements else False for value in data["Score"]
-            ]
+            scores = data["Score"].to_numpy(dtype=float)
+            numElementsToExtract = int(len(scores) * efficiencyCliff)  # get number of elements corresponding to the smaller 20%
+            if not numElementsToExtract or np.isnan(scores).all():
+                data["Efficiency"] = False
+                return data
+            sortedScores = np.sort(scores[~np.isnan(scores)])
+            if reverse:
+                sortedScores = sortedScores[::-1]
+            cliff = sortedScores[min(numElementsToExtract, len(sortedScores)) - 1]  # last of the 20% smaller elements
+            data["Efficiency"] = scores >= cliff if reverse else scores <= cliff
             return data
         return data
 
+    @staticmethod
+    def _topsisScores(
+        weightedNormData: np.ndarray, bestDesign: np.ndarray, worstDesign: np.ndarray
+    ) -> np.ndarray:
+        positiveSeparation = np.sqrt(((weightedNormData - bestDesign) ** 2).sum(axis=1))
+        negativeSeparation = np.sqrt(((weightedNormData - worstDesign) ** 2).sum(axis=1))
+        return negativeSeparation / (negativeSeparation + positiveSeparation)
+
     @staticmethod
     def _normalization(data: DataFrame):
         normData = (data - data.min()) / (data.max() - data.min())
@@ -83,3 +187,38 @@ class Rankers:
     def _weightening(data: DataFrame, weights: Tuple[float]):
         weightedNormData = data.multiply(weights, axis=1)
         return weightedNormData
+
+
+def _netPreference(
+    differences: np.ndarray, preference: str, q: float, p: float
+) -> np.ndarray:
+    """Preference for the first design minus preference for the second, an odd function of the difference of a normalized objective (positive when the first design is better)."""
+    if preference == "usual":
+        return np.sign(differences)
+    elif preference == "linear":
+        return np.sign(differences) * np.clip(
+            (np.abs(differences) - q) / max(p - q, 1e-12), 0, 1
+        )
+    return np.sign(differences) * -np.expm1(-(differences**2) / (2 * p**2))
+
+
+def _prometheeFlows(
+    normData: np.ndarray,
+    weights: np.ndarray,
+    preference: str,
+    q: float,
+    p: float,
+    start: int,
+    stop: int,
+    blockSize: int,
+) -> np.ndarray:
+    """Unscaled net flows of the designs start:stop against all the designs, one block of pairs and one objective at a time."""
+    rows = normData[start:stop]
+    columns = normData
+    flows = np.zeros(len(rows))
+    for other in range(0, len(columns), blockSize):
+        block = columns[other : other + blockSize]
+        for i, weight in enumerate(weights):
+            differences = block[None, :, i] - rows[:, None, i]  # objectives are minimized
+            flows += weight * np.nansum(_netPreference(differences, preference, q, p), axis=1)
+    return flows
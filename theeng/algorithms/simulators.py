@@ -4,7 +4,7 @@ from os.path import exists
 from sys import path
 from typing import Dict, Iterable, List, Union
 
-from numpy import average, max, min
+from theeng.core.fields import FieldStore, isPercentile, reduceField
 
 f = open("configs\\settings.json")
 data = load(f)
@@ -26,6 +26,7 @@ class Simulators:
         resultsExpressions: List[str],
         iterableOutput: List[Union[str, None]],
         fcdPath: str,
+        fieldStore: Union[FieldStore, None] = None,
     ) -> None:
         """Initialize an FEM evaluator.
 
@@ -33,11 +34,21 @@ class Simulators:
             problem (ProblemConstructor): problem to be evaluated.
             resultsRequest (List[str]): list of results aliases contained in the spreadsheet.
             fcdPath (str): path to the FreeCAD file containing the model.
+            fieldStore (Union[FieldStore, None], optional): if given, the full iterable results are persisted in it. Defaults to None.
         """
         self.resultsExpressions = resultsExpressions
         self.iterableOutput = iterableOutput
+        self.fieldStore = fieldStore
         self._doc = FreeCAD.open(fcdPath)
         self._sheet = self._doc.getObject("Spreadsheet")
+        self._analysis = next(
+            (
+                obj
+                for obj in self._doc.Objects
+                if obj.TypeId in ("Fem::FemAnalysis", "Fem::FemAnalysisPython")
+            ),
+            None,
+        )
 
     def femSimulator(self, parameters: Dict[str, float]) -> Dict[str, float]:
         """Evaluate the design parameters and return the results by updating the spreadsheet and running the FEM analysis in FreeCAD.
@@ -55,7 +66,9 @@ class Simulators:
         # self._sheet.recompute()
         self._doc.recompute()
 
-        fea = ccxtools.FemToolsCcx()
+        # several models may be open (e.g. fidelity levels): solve the analysis of this one
+        FreeCAD.setActiveDocument(self._doc.Name)
+        fea = ccxtools.FemToolsCcx(analysis=self._analysis)
         fea.update_objects()
         fea.setup_working_dir()
         fea.setup_ccx()
@@ -72,6 +85,7 @@ class Simulators:
 
         self._sheet.recompute()
         results = defaultdict(float)
+        fields = {}
         for result, iterableAction in zip(self.resultsExpressions, self.iterableOutput):
             if result in parameters:
                 ccx_result = parameters[result]
@@ -81,21 +95,17 @@ class Simulators:
                 if not isinstance(ccx_result, float):
                     raise Exception("Result is not float.")
                 results[result] = ccx_result
-            elif iterableAction == "Max":
+            elif iterableAction in ("Max", "Min", "Avg") or isPercentile(iterableAction):
                 if not isinstance(ccx_result, Iterable):
                     raise Exception("Result is not Iterable.")
-                results[result] = max(ccx_result)  # type: ignore
-            elif iterableAction == "Min":
-                if not isinstance(ccx_result, Iterable):
-                    raise Exception("Result is not Iterable.")
-                results[result] = min(ccx_result)  # type: ignore
-            elif iterableAction == "Avg":
-                if not isinstance(ccx_result, Iterable):
-                    raise Exception("Result is not Iterable.")
-                results[result] = average(ccx_result)  # type: ignore
+                results[result] = reduceField(ccx_result, iterableAction)  # type: ignore
+                fields[result] = ccx_result
             else:
                 raise Exception("Invalid iterable action.")
 
+        if self.fieldStore is not None and fields:
+            self.fieldStore.append(fields, parameters)
+
         return results
 
     def cfdSimulator(self, parameters: Dict[str, float]) -> Dict[str, float]:
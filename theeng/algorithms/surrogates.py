@@ -1,5 +1,7 @@
-from typing import Tuple
+from typing import Callable, Tuple, Union
 
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin, clone
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.neural_network import MLPRegressor
@@ -168,3 +170,160 @@ class Surrogates:
         )
 
         return pipeline
+
+    def reducedOrder(
+        self,
+        regressorName: str = "polynomial",
+        n_modes: Union[int, None] = None,
+        energy: float = 0.999,
+        **kwargs
+    ) -> "ReducedOrderModel":
+        """_summary_
+
+        Args:
+            regressorName (str, optional): The surrogate used to regress the modal coefficients. Defaults to "polynomial".
+            n_modes (Union[int, None], optional): Number of retained modes. Defaults to None (chosen from energy).
+            energy (float, optional): Fraction of the snapshots energy to retain when n_modes is None. Defaults to 0.999.
+
+        Returns:
+            ReducedOrderModel: A Scikit-Learn compatible reduced-order model.
+        """
+        regressor = getattr(self, regressorName)(**kwargs)
+        return ReducedOrderModel(regressor=regressor, n_modes=n_modes, energy=energy)
+
+
+class ReducedOrderModel(BaseEstimator, RegressorMixin):
+    """Proper orthogonal decomposition of field snapshots with a regression of the modal coefficients."""
+
+    def __init__(
+        self, regressor=None, n_modes: Union[int, None] = None, energy: float = 0.999
+    ) -> None:
+        self.regressor = regressor
+        self.n_modes = n_modes
+        self.energy = energy
+
+    def fit(self, X, Y):
+        """Compress the snapshots Y (nDesigns, nValues) with a truncated SVD and regress the modal coefficients on X.
+
+        Args:
+            X (array_like): Design parameters.
+            Y (array_like): Field snapshots, one row per design.
+
+        Returns:
+            ReducedOrderModel: The fitted model.
+        """
+        Y = np.asarray(Y, dtype=np.float64)
+        self.mean_ = Y.mean(axis=0)
+        U, S, Vt = np.linalg.svd(Y - self.mean_, full_matrices=False)
+
+        nModes = self.n_modes
+        if nModes is None:
+            cumulativeEnergy = np.cumsum(S**2) / max(np.sum(S**2), np.finfo(float).tiny)
+            nModes = int(np.searchsorted(cumulativeEnergy, self.energy)) + 1
+        nModes = max(1, min(nModes, len(S)))
+
+        self.singularValues_ = S
+        self.modes_ = Vt[:nModes]
+        coefficients = U[:, :nModes] * S[:nModes]
+        self.regressor_ = clone(self.regressor).fit(X, coefficients)
+        return self
+
+    def predictCoefficients(self, X) -> np.ndarray:
+        """Predict the modal coefficients of the designs X.
+
+        Args:
+            X (array_like): Design parameters.
+
+        Returns:
+            np.ndarray: The modal coefficients (nDesigns, nModes).
+        """
+        return np.asarray(self.regressor_.predict(X)).reshape(len(X), -1)
+
+    def predict(self, X) -> np.ndarray:
+        """Reconstruct the full fields of the designs X.
+
+        Args:
+            X (array_like): Design parameters.
+
+        Returns:
+            np.ndarray: The predicted fields (nDesigns, nValues).
+        """
+        return self.predictCoefficients(X) @ self.modes_ + self.mean_
+
+
+class SurrogateGradients:
+    """Analytic Jacobians of fitted surrogate pipelines, including the chain rule of the StandardScaler."""
+
+    def __init__(self, pipeline: Pipeline) -> None:
+        self.pipeline = pipeline
+
+    def polynomial(self) -> Callable[[np.ndarray], np.ndarray]:
+        """Jacobian of a scaler, PolynomialFeatures and LinearRegression pipeline.
+
+        Returns:
+            Callable[[np.ndarray], np.ndarray]: Maps designs (nDesigns, nVar) to the Jacobian (nDesigns, nResults, nVar).
+        """
+        powers = self.pipeline.named_steps["poly"].powers_
+
+        def featuresJacobian(Z: np.ndarray) -> np.ndarray:
+            dFeatures = np.empty((len(Z), len(powers), Z.shape[1]))
+            for j in range(Z.shape[1]):
+                reduced = powers.copy()
+                reduced[:, j] = np.maximum(reduced[:, j] - 1, 0)
+                dFeatures[:, :, j] = powers[:, j] * np.prod(
+                    Z[:, None, :] ** reduced[None, :, :], axis=2
+                )
+            return dFeatures
+
+        return self._chainRule(featuresJacobian)
+
+    def spline(self) -> Callable[[np.ndarray], np.ndarray]:
+        """Jacobian of a scaler, SplineTransformer and LinearRegression pipeline.
+
+        Returns:
+            Callable[[np.ndarray], np.ndarray]: Maps designs (nDesigns, nVar) to the Jacobian (nDesigns, nResults, nVar).
+        """
+        transformer = self.pipeline.named_steps["spline"]
+        degree = transformer.degree
+        extrapolation = transformer.extrapolation
+        splines = transformer.bsplines_
+        derivatives = [spl.derivative() for spl in splines]
+        nSplines = splines[0].c.shape[1]
+
+        def featuresJacobian(Z: np.ndarray) -> np.ndarray:
+            nVar = Z.shape[1]
+            dFeatures = np.zeros((len(Z), nVar * nSplines, nVar))
+            for j, (spl, dspl) in enumerate(zip(splines, derivatives)):
+                z = Z[:, j]
+                xmin, xmax = spl.t[degree], spl.t[-degree - 1]
+                if extrapolation == "periodic":
+                    z = xmin + (z - xmin) % (xmax - xmin) if xmax > xmin else z
+                    values = dspl(z)
+                elif extrapolation in ("continue", "error"):
+                    values = dspl(z)
+                else:  # "constant" has zero slope outside the base interval, "linear" keeps the boundary slope
+                    values = dspl(np.clip(z, xmin, xmax))
+                    if extrapolation == "constant":
+                        values[(z < xmin) | (z > xmax)] = 0
+                dFeatures[:, j * nSplines : (j + 1) * nSplines, j] = values
+            if not transformer.include_bias:
+                keep = [k for k in range(nVar * nSplines) if (k + 1) % nSplines]
+                dFeatures = dFeatures[:, keep, :]
+            return dFeatures
+
+        return self._chainRule(featuresJacobian)
+
+    def _chainRule(
+        self, featuresJacobian: Callable[[np.ndarray], np.ndarray]
+    ) -> Callable[[np.ndarray], np.ndarray]:
+        scaler = self.pipeline.named_steps["scaler"]
+        coefficients = np.atleast_2d(self.pipeline.named_steps["linear"].coef_)
+
+        def jacobian(X) -> np.ndarray:
+            X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+            scale = scaler.scale_ if scaler.scale_ is not None else np.ones(X.shape[1])
+            Z = scaler.transform(X)
+            dFeatures = featuresJacobian(Z)  # derivatives with respect to the scaled parameters
+            return np.einsum("rk,nkv->nrv", coefficients, dFeatures) / scale
+
+        return jacobian
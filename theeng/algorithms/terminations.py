@@ -0,0 +1,109 @@
+from typing import Tuple
+
+import numpy as np
+from pymoo.core.termination import Termination
+from pymoo.util.misc import termination_from_tuple
+
+from theeng.core.pareto import hypervolume
+
+
+class ConvergenceTermination(Termination):
+    """Stop when the front has stopped moving, or when the evaluation budget is exhausted.
+
+    After every generation the hypervolume of the feasible non-dominated designs (in objectives normalized on
+    the first generation), the IGD-style movement of the front with respect to the previous generation and the
+    constraint violation of the population are recorded in history. The run stops once the relative hypervolume
+    improvement, the front movement and the violation improvement all stay below tolerance for patience generations.
+    """
+
+    def __init__(
+        self,
+        budget: Tuple[str, int] = ("n_eval", 100),
+        tolerance: float = 1e-3,
+        patience: int = 5,
+        nSamples: int = 100000,
+    ) -> None:
+        """Initialize the termination criterion.
+
+        Args:
+            budget (Tuple[str, int], optional): The maximum budget as a pymoo termination tuple. Defaults to ("n_eval", 100).
+            tolerance (float, optional): Threshold below which an improvement is considered negligible. Defaults to 1e-3.
+            patience (int, optional): Number of consecutive negligible generations before stopping. Defaults to 5.
+            nSamples (int, optional): Monte Carlo samples of the hypervolume for more than three objectives. Defaults to 100000.
+        """
+        super().__init__()
+        self.budget = termination_from_tuple(budget)
+        self.tolerance = tolerance
+        self.patience = patience
+        self.nSamples = nSamples
+        self.history = []
+
+        self._ideal = None
+        self._scale = None
+        self._front = None
+        self._stalled = 0
+        self._lastGeneration = None
+
+    def _update(self, algorithm):
+        progress = self.budget.update(algorithm)
+        if algorithm.n_gen == self._lastGeneration:
+            return progress
+        self._lastGeneration = algorithm.n_gen
+
+        F, CV = algorithm.pop.get("F", "CV")
+        CV = np.ravel(CV)
+        feasibleF = F[CV <= 0]
+        if self._ideal is None and len(feasibleF):
+            self._ideal = feasibleF.min(axis=0)
+            span = feasibleF.max(axis=0) - self._ideal
+            self._scale = np.where(span > 1e-32, span, 1.0)
+
+        front = None
+        hv = 0.0
+        movement = np.inf
+        if len(feasibleF):
+            opt = algorithm.opt.get("F")[np.ravel(algorithm.opt.get("CV")) <= 0]
+            front = (opt - self._ideal) / self._scale
+            reference = np.full(F.shape[1], 1.1)
+            hv = hypervolume(front, reference, nSamples=self.nSamples)
+            if self._front is not None and len(self._front):
+                distances = np.linalg.norm(
+                    self._front[:, None, :] - front[None, :, :], axis=2
+                )
+                movement = float(distances.min(axis=1).mean())
+
+        previous = self.history[-1] if self.history else None
+        improvement = np.inf
+        cvImprovement = np.inf
+        if previous is not None:
+            improvement = (hv - previous["hypervolume"]) / max(abs(previous["hypervolume"]), 1e-32)
+            cvImprovement = previous["cvMin"] - float(CV.min())
+
+        self.history.append(
+            {
+                "n_gen": algorithm.n_gen,
+                "n_eval": algorithm.evaluator.n_eval,
+                "hypervolume": hv,
+                "improvement": improvement,
+                "frontMovement": movement,
+                "cvMin": float(CV.min()),
+                "cvMean": float(CV.mean()),
+            }
+        )
+        self._front = front
+
+        feasible = len(feasibleF) > 0
+        if (
+            feasible
+            and improvement < self.tolerance
+            and movement < self.tolerance
+            and cvImprovement < self.tolerance
+        ):
+            self._stalled += 1
+        else:
+            self._stalled = 0
+
+        if self._stalled >= self.patience:
+            return 1.0
+        return progress
+
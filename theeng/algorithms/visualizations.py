@@ -1,7 +1,13 @@
-from pandas import DataFrame
+from typing import List, Union
+
+import numpy as np
+from pandas import DataFrame, to_numeric
 import plotly.express as px
+import plotly.graph_objects as go
 from plotly.graph_objects import Figure
 
+from theeng.core.pareto import nonDominatedMask
+
 
 class Visualizations:
     def __init__(self, data: DataFrame) -> None:
@@ -14,6 +20,15 @@ class Visualizations:
             raise ValueError("You must specify xName and yName")
 
         if xName in self.data.columns and yName in self.data.columns:
+            maxPoints = kwargs.get("maxPoints", 5000)
+            if len(self.data) > maxPoints:
+                return self._largeScatterPlot(
+                    xName,
+                    yName,
+                    maxPoints,
+                    kwargs.get("paretoColumns", [xName, yName]),
+                    kwargs.get("densityBins", 100),
+                )
             if "Efficiency" in self.data.columns:
                 visualizationObject = px.scatter(
                     self.data, x=xName, y=yName, color="Efficiency"
@@ -31,11 +46,120 @@ class Visualizations:
 
     def parallelCoordinate(self, **kwargs) -> Figure:
         filteredData = self._filterData(**kwargs)
+        maxPoints = kwargs.get("maxPoints", 2000)
+        if len(filteredData) > maxPoints:
+            keep = self._downsample(
+                list(filteredData.columns), maxPoints, kwargs.get("paretoColumns")
+            )
+            filteredData = filteredData.iloc[keep]
+        filteredData = filteredData.infer_objects()  # numeric columns of transposed data are objects
         visualizationObject = px.parallel_coordinates(
             filteredData, dimensions=list(filteredData.columns)
         )
         return visualizationObject
 
+    def _largeScatterPlot(
+        self,
+        xName: str,
+        yName: str,
+        maxPoints: int,
+        paretoColumns: Union[List[str], None],
+        densityBins: int,
+    ) -> Figure:
+        """Binned density of all the designs under a WebGL scatter of the Pareto, extreme and sampled designs."""
+        x = self.data[xName].to_numpy(dtype=float)
+        y = self.data[yName].to_numpy(dtype=float)
+        finite = np.isfinite(x) & np.isfinite(y)
+        counts, xEdges, yEdges = np.histogram2d(x[finite], y[finite], bins=densityBins)
+        density = np.where(counts > 0, np.log10(np.maximum(counts, 1)) + 1, np.nan)  # empty bins transparent
+
+        visualizationObject = go.Figure()
+        visualizationObject.add_trace(
+            go.Heatmap(
+                x=(xEdges[:-1] + xEdges[1:]) / 2,
+                y=(yEdges[:-1] + yEdges[1:]) / 2,
+                z=density.T,
+                colorscale="Greys",
+                showscale=False,
+                name="Density",
+                hovertemplate="%{customdata} designs<extra></extra>",
+                customdata=counts.T.astype(int),
+            )
+        )
+
+        keep = self._downsample([xName, yName], maxPoints, paretoColumns)
+        sample = self.data.iloc[keep]
+        if "Efficiency" in sample.columns:
+            groups = [
+                (str(value), sample[sample["Efficiency"] == value])
+                for value in sample["Efficiency"].unique()
+            ]
+        else:
+            groups = [("Designs", sample)]
+        for name, group in groups:
+            visualizationObject.add_trace(
+                go.Scattergl(
+                    x=group[xName].to_numpy(dtype=float),
+                    y=group[yName].to_numpy(dtype=float),
+                    mode="markers",
+                    marker={"size": 4},
+                    name=name,
+                )
+            )
+        visualizationObject.update_layout(
+            xaxis_title=xName,
+            yaxis_title=yName,
+            title=f"{len(sample)} of {len(self.data)} designs",
+        )
+        return visualizationObject
+
+    def _downsample(
+        self,
+        columns: List[str],
+        maxPoints: int,
+        paretoColumns: Union[List[str], None] = None,
+        seed: int = 1,
+    ) -> np.ndarray:
+        """Positions of at most maxPoints rows: the extremes of each column, then the Pareto front of paretoColumns, then the efficient designs, then a random sample of the others."""
+        n = len(self.data)
+        numeric = self.data[columns].apply(to_numeric, errors="coerce").to_numpy(dtype=float)
+        numeric = numeric[:, np.isfinite(numeric).any(axis=0)]
+        extremes = np.unique(
+            np.concatenate(
+                [
+                    np.argmin(np.where(np.isfinite(numeric), numeric, np.inf), axis=0),
+                    np.argmax(np.where(np.isfinite(numeric), numeric, -np.inf), axis=0),
+                ]
+            )
+        ).astype(int)
+
+        tiers = []  # by decreasing priority
+        if paretoColumns:
+            F = self.data[paretoColumns].apply(to_numeric, errors="coerce").to_numpy(dtype=float)
+            finite = np.isfinite(F).all(axis=1)
+            tiers.append(np.flatnonzero(finite)[nonDominatedMask(F[finite])])
+        if "Efficiency" in self.data.columns:
+            tiers.append(np.flatnonzero(self.data["Efficiency"].to_numpy(dtype=bool)))
+
+        first = to_numeric(self.data[columns[0]], errors="coerce").to_numpy(dtype=float)
+        keep = extremes[:maxPoints]
+        for tier in tiers:
+            tier = np.setdiff1d(tier, keep)
+            budget = maxPoints - len(keep)
+            if len(tier) > budget:  # evenly spaced along the first column
+                order = tier[np.argsort(first[tier])]
+                tier = order[np.linspace(0, len(order) - 1, budget).astype(int)] if budget else order[:0]
+            keep = np.concatenate([keep, tier])
+
+        rng = np.random.default_rng(seed)
+        others = np.setdiff1d(np.arange(n), keep)
+        budget = maxPoints - len(keep)
+        if budget > 0 and len(others):
+            keep = np.concatenate(
+                [keep, rng.choice(others, min(budget, len(others)), replace=False)]
+            )
+        return np.sort(keep)
+
     def _filterData(self, **kwargs):
         columnsNames = kwargs.get("columnsNames")
         if columnsNames:
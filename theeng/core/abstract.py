@@ -2,6 +2,7 @@ from difflib import SequenceMatcher
 from inspect import getmembers, ismethod
 from typing import Callable, Dict, List, Tuple
 
+from theeng.core.cache import EvaluationCache
 from theeng.core.problem import ProblemConstructor
 
 
@@ -11,6 +12,9 @@ class Step:
         problem: ProblemConstructor,
         evaluator: Callable[[Dict[str, float]], Dict[str, float]],
     ):
+        if problem.isMixed():
+            # designs are decoded to the discrete lattice, never simulating one twice across steps
+            evaluator = EvaluationCache.shared(evaluator, problem)
         self.problem = problem
         self.evaluator = evaluator
 
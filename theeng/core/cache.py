@@ -0,0 +1,419 @@
+from threading import Event, Lock, RLock
+from typing import Callable, Dict, List, Tuple, Union
+from weakref import WeakKeyDictionary
+
+import numpy as np
+from pandas import DataFrame
+from scipy.spatial import cKDTree
+
+from theeng.core.problem import ProblemConstructor
+
+_sharedCaches = WeakKeyDictionary()  # problem: {evaluator: EvaluationCache}
+
+
+class EvaluationCache:
+    """An evaluator wrapper that decodes designs to the discrete lattice and never evaluates the same design twice.
+
+    Concurrent requests for a design being evaluated wait for its result instead of evaluating it again.
+    """
+
+    def __init__(
+        self,
+        evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        problem: Union[ProblemConstructor, None] = None,
+    ) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            evaluator (Callable[[Dict[str, float]], Dict[str, float]]): The evaluator to wrap, typically the simulator.
+            problem (Union[ProblemConstructor, None], optional): Problem used to decode integer and categorical parameters. Defaults to None (designs are used as they are).
+        """
+        self.evaluator = evaluator
+        self.problem = problem
+        self.hits = 0
+        self.misses = 0
+        self._results = {}
+        self._pending = {}
+        self._lock = Lock()
+
+    def __call__(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        """Evaluate a design, or return the results of its previous evaluation.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+
+        Returns:
+            Dict[str, float]: The results of the decoded design.
+        """
+        if self.problem is not None:
+            parameters = self.problem.decodeParameters(parameters)
+        key = EvaluationCache._key(parameters)
+
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return dict(self._results[key])
+            event = self._pending.get(key)
+            if event is None:
+                event = self._pending[key] = Event()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+
+        if not owner:  # the same design is being evaluated by another worker
+            event.wait()
+            with self._lock:
+                if key in self._results:
+                    return dict(self._results[key])
+            return self(parameters)  # the evaluation failed, try it ourselves
+
+        try:
+            results = self.evaluator(parameters)
+            with self._lock:
+                self._results[key] = dict(results)
+            return results
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            event.set()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def shared(
+        evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        problem: ProblemConstructor,
+    ) -> "EvaluationCache":
+        """Returns the cache of an evaluator for a problem, created on first use, so that every step evaluating it shares its results.
+
+        Args:
+            evaluator (Callable[[Dict[str, float]], Dict[str, float]]): The evaluator to wrap, returned as is if already a cache.
+            problem (ProblemConstructor): Problem used to decode integer and categorical parameters.
+
+        Returns:
+            EvaluationCache: The shared cache.
+        """
+        if isinstance(evaluator, EvaluationCache):
+            return evaluator
+        caches = _sharedCaches.setdefault(problem, {})
+        if evaluator not in caches:
+            caches[evaluator] = EvaluationCache(evaluator, problem)
+        return caches[evaluator]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pending"] = {}
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def preload(self, data: DataFrame, problem: ProblemConstructor) -> int:
+        """Fill the cache with already evaluated designs, e.g. the sampler data or a study database.
+
+        Args:
+            data (DataFrame): Designs laid out as the Sampler or Optimizer data.
+            problem (ProblemConstructor): The problem defining parameters and results names.
+
+        Returns:
+            int: Number of designs added.
+        """
+        pNames = problem.getPnames()
+        resultsExpressions = problem.getResultsExpressions()
+        added = 0
+        with self._lock:
+            for _, row in data.iterrows():
+                parameters = problem.decodeParameters({name: row[name] for name in pNames})
+                key = EvaluationCache._key(parameters)
+                if key not in self._results:
+                    self._results[key] = {name: row[name] for name in resultsExpressions}
+                    added += 1
+        return added
+
+    def getStatistics(self) -> Dict[str, int]:
+        """Returns the number of evaluated designs and of requests served from the cache.
+
+        Returns:
+            Dict[str, int]: The cache statistics.
+        """
+        return {"evaluations": self.misses, "hits": self.hits, "designs": len(self)}
+
+    @staticmethod
+    def _key(parameters: Dict[str, float]) -> tuple:
+        return tuple((name, float(value)) for name, value in parameters.items())
+
+
+class NeighborIndex:
+    """An incremental nearest-neighbor index of the evaluated designs, in parameter space normalized by the bounds.
+
+    Designs are stored in a logarithmic set of static KD-trees (Bentley-Saxe): new designs go to a small buffer
+    scanned linearly, and a full buffer is merged with the trees of equal or smaller size. Insertions cost
+    O(log n) amortized rebuilds and queries search O(log n) trees, staying well below a millisecond at a million designs.
+
+    The index can wrap an evaluator: designs within tolerance of an evaluated one reuse its results, designs
+    surrounded by enough neighbors within radius are interpolated, the others are evaluated and indexed.
+    """
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        evaluator: Union[Callable[[Dict[str, float]], Dict[str, float]], None] = None,
+        tolerance: float = 1e-6,
+        radius: float = 0.0,
+        nNeighbors: int = 4,
+        bufferSize: int = 256,
+    ) -> None:
+        """Initialize an empty index.
+
+        Args:
+            problem (ProblemConstructor): The problem defining parameters names and bounds.
+            evaluator (Union[Callable[[Dict[str, float]], Dict[str, float]], None], optional): The evaluator to wrap when the index is called. Defaults to None.
+            tolerance (float, optional): Normalized distance under which two designs are considered the same. Defaults to 1e-6.
+            radius (float, optional): Normalized distance within which results are interpolated, 0 to disable interpolation. Defaults to 0.0.
+            nNeighbors (int, optional): Number of neighbors within radius needed to interpolate. Defaults to 4.
+            bufferSize (int, optional): Number of designs kept out of the trees. Defaults to 256.
+        """
+        self.problem = problem
+        self.evaluator = evaluator
+        self.tolerance = tolerance
+        self.radius = radius
+        self.nNeighbors = nNeighbors
+        self.bufferSize = bufferSize
+
+        self.pNames = problem.getPnames()
+        lowerBounds, upperBounds = problem.getBounds()
+        self._lower = np.asarray(lowerBounds, dtype=float)
+        self._span = np.asarray(upperBounds, dtype=float) - self._lower
+        self._span[self._span == 0] = 1.0
+
+        self.resultsNames = None
+        self._values = []  # results of each design, in insertion order
+        self._levels = []  # (tree, indices) by decreasing size
+        self._buffer = np.empty((bufferSize, len(self.pNames)))
+        self._bufferIndices = np.empty(bufferSize, dtype=int)
+        self._nBuffer = 0
+
+        self.reused = 0
+        self.interpolated = 0
+        self.evaluated = 0
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = RLock()
+
+    def __call__(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        """Returns the results of the design, reused, interpolated or evaluated.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+
+        Returns:
+            Dict[str, float]: The results of the design.
+        """
+        if self.evaluator is None:
+            raise ValueError("No evaluator to wrap. Pass one to the NeighborIndex.")
+        results = self.lookup(parameters)
+        if results is not None:
+            self.reused += 1
+            return results
+        if self.radius > 0:
+            results = self.interpolate(parameters)
+            if results is not None:
+                self.interpolated += 1
+                return results
+
+        results = self.evaluator(parameters)
+        self.evaluated += 1
+        self.add(parameters, results)
+        return results
+
+    def add(self, parameters: Dict[str, float], results: Dict[str, float]) -> None:
+        """Index an evaluated design.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+            results (Dict[str, float]): Its results.
+        """
+        self.addMany([[parameters[name] for name in self.pNames]], [results])
+
+    def addMany(self, X, results: List[Dict[str, float]]) -> None:
+        """Index a batch of evaluated designs.
+
+        Args:
+            X (array_like): Designs parameters, one row per design ordered as the problem parameters.
+            results (List[Dict[str, float]]): The results of each design.
+        """
+        U = self._normalize(X)
+        if not len(U):
+            return
+        with self._lock:
+            if self.resultsNames is None:
+                self.resultsNames = list(results[0].keys())
+            start = len(self._values)
+            self._values.extend(
+                tuple(result[name] for name in self.resultsNames) for result in results
+            )
+            indices = np.arange(start, start + len(U))
+
+            if len(U) >= self.bufferSize:  # bulk load, straight to a tree
+                self._push(U, indices)
+                return
+            for u, index in zip(U, indices):
+                self._buffer[self._nBuffer] = u
+                self._bufferIndices[self._nBuffer] = index
+                self._nBuffer += 1
+                if self._nBuffer == self.bufferSize:
+                    self._push(self._buffer.copy(), self._bufferIndices.copy())
+                    self._nBuffer = 0
+
+    def addData(self, data: DataFrame) -> None:
+        """Index the designs of a DataFrame laid out as the Sampler or Optimizer data.
+
+        Args:
+            data (DataFrame): The evaluated designs.
+        """
+        resultsExpressions = self.problem.getResultsExpressions()
+        results = data[resultsExpressions].to_dict("records")
+        self.addMany(data[self.pNames].to_numpy(dtype=float), results)
+
+    def query(self, parameters, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the nearest indexed designs.
+
+        Args:
+            parameters (Union[Dict[str, float], array_like]): The design.
+            k (int, optional): Number of neighbors. Defaults to 1.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Normalized distances and insertion indices of the neighbors, nearest first.
+        """
+        if isinstance(parameters, dict):
+            parameters = [parameters[name] for name in self.pNames]
+        return self._nearest(self._normalize([parameters])[0], k)
+
+    def lookup(
+        self, parameters: Dict[str, float], tolerance: Union[float, None] = None
+    ) -> Union[Dict[str, float], None]:
+        """Returns the results of an indexed design within tolerance, None if there is none.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+            tolerance (Union[float, None], optional): Normalized distance. Defaults to the index tolerance.
+
+        Returns:
+            Union[Dict[str, float], None]: The results of the nearest design.
+        """
+        tolerance = self.tolerance if tolerance is None else tolerance
+        distances, indices = self.query(parameters)
+        if not len(distances) or distances[0] > tolerance:
+            return None
+        return dict(zip(self.resultsNames, self._values[indices[0]]))
+
+    def interpolate(
+        self,
+        parameters: Dict[str, float],
+        nNeighbors: Union[int, None] = None,
+        radius: Union[float, None] = None,
+    ) -> Union[Dict[str, float], None]:
+        """Inverse distance weighted interpolation of the nearest designs, None if too few lie within radius.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+            nNeighbors (Union[int, None], optional): Number of neighbors. Defaults to the index nNeighbors.
+            radius (Union[float, None], optional): Normalized radius. Defaults to the index radius.
+
+        Returns:
+            Union[Dict[str, float], None]: The interpolated results.
+        """
+        nNeighbors = nNeighbors or self.nNeighbors
+        radius = self.radius if radius is None else radius
+        distances, indices = self.query(parameters, k=nNeighbors)
+        if len(distances) < nNeighbors or distances[-1] > radius:
+            return None
+        if distances[0] <= self.tolerance:
+            return dict(zip(self.resultsNames, self._values[indices[0]]))
+
+        weights = 1 / distances**2
+        values = np.array([self._values[i] for i in indices], dtype=float)
+        interpolated = weights @ values / weights.sum()
+        return dict(zip(self.resultsNames, interpolated.tolist()))
+
+    def isNew(self, X, tolerance: Union[float, None] = None) -> np.ndarray:
+        """Flag the candidate designs farther than tolerance from the indexed designs and from the previous candidates.
+
+        Args:
+            X (array_like): Candidate designs, one row per design ordered as the problem parameters.
+            tolerance (Union[float, None], optional): Normalized distance. Defaults to the index tolerance.
+
+        Returns:
+            np.ndarray: A boolean mask of the candidates worth evaluating.
+        """
+        tolerance = self.tolerance if tolerance is None else tolerance
+        U = self._normalize(X)
+        new = np.ones(len(U), dtype=bool)
+        for i, u in enumerate(U):
+            distances, _ = self._nearest(u, 1)
+            if len(distances) and distances[0] <= tolerance:
+                new[i] = False
+        if len(U) > 1:  # near-duplicates within the batch, keep the first one
+            for i, j in sorted(cKDTree(U).query_pairs(tolerance)):
+                if new[i]:
+                    new[j] = False
+        return new
+
+    def getStatistics(self) -> Dict[str, int]:
+        """Returns the number of indexed designs and how the wrapped evaluations were served.
+
+        Returns:
+            Dict[str, int]: The index statistics.
+        """
+        return {
+            "designs": len(self),
+            "trees": len(self._levels),
+            "reused": self.reused,
+            "interpolated": self.interpolated,
+            "evaluated": self.evaluated,
+        }
+
+    def _nearest(self, u: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            levels = list(self._levels)
+            buffer = self._buffer[: self._nBuffer].copy()
+            bufferIndices = self._bufferIndices[: self._nBuffer].copy()
+
+        distances = [np.sqrt(((buffer - u) ** 2).sum(axis=1))]
+        indices = [bufferIndices]
+        for tree, treeIndices in levels:
+            d, i = tree.query(u, k=min(k, tree.n))
+            distances.append(np.atleast_1d(d))
+            indices.append(treeIndices[np.atleast_1d(i)])
+        distances = np.concatenate(distances)
+        indices = np.concatenate(indices)
+        order = np.argsort(distances, kind="stable")[:k]
+        return distances[order], indices[order]
+
+    def _normalize(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float).reshape(-1, len(self.pNames))
+        return (X - self._lower) / self._span
+
+    def _push(self, U: np.ndarray, indices: np.ndarray) -> None:
+        """Merge a block of designs with the trees not larger than it, then rebuild one tree."""
+        while self._levels and self._levels[-1][1].size <= len(U):
+            tree, treeIndices = self._levels.pop()
+            U = np.concatenate([tree.data, U])
+            indices = np.concatenate([treeIndices, indices])
+        tree = cKDTree(U, balanced_tree=False, compact_nodes=False)
+        self._levels.append((tree, indices))
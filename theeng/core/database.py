@@ -0,0 +1,277 @@
+import sqlite3
+from datetime import datetime
+from hashlib import sha256
+from json import dumps
+from threading import Lock
+from time import time
+from typing import Callable, Dict, List, Tuple, Union
+
+from pandas import DataFrame, read_sql_query
+
+from theeng.core.problem import ProblemConstructor
+
+
+class StudyDatabase:
+    """An append-only SQLite database of design evaluations, cumulative across runs."""
+
+    def __init__(
+        self,
+        path: str,
+        study: str = "default",
+        modelHash: str = "",
+        runId: Union[str, None] = None,
+    ) -> None:
+        """Open (or create) a study database.
+
+        Args:
+            path (str): Path to the SQLite file.
+            study (str, optional): Name of the study the evaluations belong to. Defaults to "default".
+            modelHash (str, optional): Hash of the simulated model, see hashModel(). Defaults to "".
+            runId (Union[str, None], optional): Identifier of the current run. Defaults to a timestamp.
+        """
+        self.path = path
+        self.study = study
+        self.modelHash = modelHash
+        self.runId = runId or datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._createTables()
+
+    def insert(
+        self,
+        parameters: Dict[str, float],
+        results: Dict[str, float],
+        source: str = "simulator",
+    ) -> int:
+        """Append one evaluation to the database and commit it.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+            results (Dict[str, float]): The results returned by the evaluator.
+            source (str, optional): Which step produced the evaluation (e.g. "sampler", "optimizer", "verification"). Defaults to "simulator".
+
+        Returns:
+            int: The id of the evaluation.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO evaluations (study, modelHash, runId, source, designKey, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.study,
+                    self.modelHash,
+                    self.runId,
+                    source,
+                    StudyDatabase._designKey(parameters),
+                    time(),
+                ),
+            )
+            evaluationId = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO parameters (evaluationId, name, value) VALUES (?, ?, ?)",
+                [(evaluationId, name, float(value)) for name, value in parameters.items()],
+            )
+            self._connection.executemany(
+                "INSERT INTO results (evaluationId, name, value) VALUES (?, ?, ?)",
+                [(evaluationId, name, float(value)) for name, value in results.items()],
+            )
+            self._connection.commit()
+        return evaluationId  # type: ignore
+
+    def lookup(self, parameters: Dict[str, float]) -> Union[Dict[str, float], None]:
+        """Returns the stored results of an identical design of this study and model, if any.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+
+        Returns:
+            Union[Dict[str, float], None]: The results in the order they were returned by the evaluator, None if the design was never evaluated.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id FROM evaluations WHERE study = ? AND modelHash = ? AND designKey = ? ORDER BY id DESC LIMIT 1",
+                (self.study, self.modelHash, StudyDatabase._designKey(parameters)),
+            ).fetchone()
+            if row is None:
+                return None
+            values = self._connection.execute(
+                "SELECT name, value FROM results WHERE evaluationId = ? ORDER BY rowid",
+                (row[0],),
+            ).fetchall()
+        return dict(values)
+
+    def recorder(
+        self,
+        evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        source: str = "simulator",
+        reuse: bool = False,
+    ) -> Callable[[Dict[str, float]], Dict[str, float]]:
+        """Wrap an evaluator so that every evaluation is written to the database as soon as it completes.
+
+        Args:
+            evaluator (Callable[[Dict[str, float]], Dict[str, float]]): The evaluator to record, typically the simulator.
+            source (str, optional): Tag stored with each evaluation. Defaults to "simulator".
+            reuse (bool, optional): Return stored results for designs already evaluated instead of evaluating them again. Defaults to False.
+
+        Returns:
+            Callable[[Dict[str, float]], Dict[str, float]]: The recording evaluator.
+        """
+
+        def recordingEvaluator(parameters: Dict[str, float]) -> Dict[str, float]:
+            if reuse:
+                results = self.lookup(parameters)
+                if results is not None:
+                    return results
+            results = evaluator(parameters)
+            self.insert(parameters, results, source=source)
+            return results
+
+        return recordingEvaluator
+
+    def query(
+        self,
+        bounds: Union[Dict[str, Tuple[float, float]], None] = None,
+        runId: Union[str, None] = None,
+        source: Union[str, None] = None,
+        allModels: bool = False,
+    ) -> DataFrame:
+        """Returns the stored evaluations of the study as a wide DataFrame of parameters and results.
+
+        Args:
+            bounds (Union[Dict[str, Tuple[float, float]], None], optional): Parameter ranges {name: (lower, upper)} the designs must lie in. Defaults to None.
+            runId (Union[str, None], optional): Only return evaluations of this run. Defaults to None.
+            source (Union[str, None], optional): Only return evaluations with this source tag. Defaults to None.
+            allModels (bool, optional): Include evaluations of other model hashes. Defaults to False.
+
+        Returns:
+            DataFrame: One row per evaluation, indexed by evaluation id.
+        """
+        conditions = ["study = ?"]
+        arguments: List = [self.study]
+        if not allModels:
+            conditions.append("modelHash = ?")
+            arguments.append(self.modelHash)
+        if runId is not None:
+            conditions.append("runId = ?")
+            arguments.append(runId)
+        if source is not None:
+            conditions.append("source = ?")
+            arguments.append(source)
+        for name, (lowerBound, upperBound) in (bounds or {}).items():
+            conditions.append(
+                "id IN (SELECT evaluationId FROM parameters WHERE name = ? AND value BETWEEN ? AND ?)"
+            )
+            arguments += [name, lowerBound, upperBound]
+        selection = f"SELECT id FROM evaluations WHERE {' AND '.join(conditions)}"
+
+        with self._lock:
+            values = read_sql_query(
+                f"""SELECT evaluationId, name, value FROM parameters WHERE evaluationId IN ({selection})
+                UNION ALL
+                SELECT evaluationId, name, value FROM results WHERE evaluationId IN ({selection})""",
+                self._connection,
+                params=arguments + arguments,
+            )
+
+        if values.empty:
+            return DataFrame()
+        names = list(dict.fromkeys(values["name"]))  # keep parameters first
+        data = values.pivot_table(
+            index="evaluationId", columns="name", values="value", aggfunc="first"
+        )
+        return data.reindex(columns=names)
+
+    def getData(self, problem: ProblemConstructor, **kwargs) -> DataFrame:
+        """Returns the stored evaluations in the same layout as Sampler and Optimizer data, i.e. with objectives and constraints.
+
+        Args:
+            problem (ProblemConstructor): The problem defining parameters, results, objectives and constraints.
+            **kwargs: Filters passed to query().
+
+        Returns:
+            DataFrame: The evaluations data.
+        """
+        pNames = problem.getPnames()
+        resultsExpressions = problem.getResultsExpressions()
+        objectiveExpressions = problem.getObjectivesExpressions()
+        constraintExpressions = problem.getConstraintsExpressions()
+
+        columns = list(dict.fromkeys(pNames + resultsExpressions))
+        stored = self.query(**kwargs).reindex(columns=columns)
+        stored = stored.dropna()
+
+        rows = []
+        for _, row in stored.iterrows():
+            results = {name: row[name] for name in resultsExpressions}
+            objs = [obj(results) for obj in problem.getObjectives()]
+            consts = [constr(results) for constr in problem.getConstraints()]
+            rows.append(
+                [row[name] for name in pNames]
+                + list(results.values())
+                + objs
+                + consts
+            )
+
+        data = DataFrame(
+            rows,
+            columns=pNames
+            + resultsExpressions
+            + objectiveExpressions
+            + constraintExpressions,
+            index=stored.index,
+        )
+
+        data = data.T.drop_duplicates().T
+
+        return data
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self._connection.close()
+
+    def _createTables(self) -> None:
+        with self._lock:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS evaluations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    study TEXT,
+                    modelHash TEXT,
+                    runId TEXT,
+                    source TEXT,
+                    designKey TEXT,
+                    timestamp REAL
+                );
+                CREATE TABLE IF NOT EXISTS parameters (evaluationId INTEGER, name TEXT, value REAL);
+                CREATE TABLE IF NOT EXISTS results (evaluationId INTEGER, name TEXT, value REAL);
+                CREATE INDEX IF NOT EXISTS evaluationsStudy ON evaluations (study, modelHash, designKey);
+                CREATE INDEX IF NOT EXISTS evaluationsRun ON evaluations (runId);
+                CREATE INDEX IF NOT EXISTS parametersRange ON parameters (name, value);
+                CREATE INDEX IF NOT EXISTS parametersEvaluation ON parameters (evaluationId);
+                CREATE INDEX IF NOT EXISTS resultsEvaluation ON results (evaluationId);
+                """
+            )
+            self._connection.commit()
+
+    @staticmethod
+    def hashModel(path: str) -> str:
+        """Hash the content of a model file (e.g. the FreeCAD file) to key its evaluations.
+
+        Args:
+            path (str): Path to the model file.
+
+        Returns:
+            str: The SHA-256 hex digest of the file.
+        """
+        digest = sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1048576), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _designKey(parameters: Dict[str, float]) -> str:
+        return dumps(
+            [[name, float(value)] for name, value in sorted(parameters.items())]
+        )
@@ -0,0 +1,234 @@
+from threading import Lock
+from time import time
+from typing import Callable, Dict, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from theeng.core.problem import ProblemConstructor
+from theeng.core.surrogate import Surrogate
+
+
+class MultiFidelityEvaluator:
+    """An evaluator running a hierarchy of fidelity levels (e.g. coarse and fine meshes) and deciding per design how far to climb.
+
+    Each level but the cheapest is approximated by the level below plus an additive discrepancy model trained on
+    the designs simulated at both levels. A design climbs to the next level while the discrepancy model is not
+    trained yet, is too uncertain, or the design is promising. Otherwise the corrected prediction is returned.
+    """
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        surrogateName: str = "gaussianProcess",
+        surrogateKwargs: Union[dict, None] = None,
+        minPairs: Union[int, None] = None,
+        uncertaintyTolerance: float = 0.05,
+        promisingFraction: float = 0.2,
+    ) -> None:
+        """Initialize the evaluator without levels.
+
+        Args:
+            problem (ProblemConstructor): The problem defining parameters, results and objectives.
+            surrogateName (str, optional): Name of the method of Surrogates modelling the discrepancies. Defaults to "gaussianProcess".
+            surrogateKwargs (Union[dict, None], optional): Arguments of the surrogate method. Defaults to None.
+            minPairs (Union[int, None], optional): Designs simulated at two consecutive levels before their discrepancy is trusted. Defaults to 2 * nVar + 1.
+            uncertaintyTolerance (float, optional): Largest standard deviation of the corrected results, relative to their spread, accepted without climbing. Defaults to 0.05.
+            promisingFraction (float, optional): Designs whose corrected weighted objective lies in this best fraction of the designs seen so far always climb. Defaults to 0.2.
+        """
+        self.problem = problem
+        self.pNames = problem.getPnames()
+        self.resultsExpressions = problem.getResultsExpressions()
+        self.objectives = problem.getObjectives()
+        self.constraints = problem.getConstraints()
+        weights = problem.getObjectiveWeights() or [1.0] * problem.getNobj()
+        self.weights = np.asarray(weights, dtype=float)
+
+        self.surrogateName = surrogateName
+        self.surrogateKwargs = surrogateKwargs or {}
+        self.minPairs = minPairs or 2 * problem.getNvar() + 1
+        self.uncertaintyTolerance = uncertaintyTolerance
+        self.promisingFraction = promisingFraction
+
+        # the discrepancy models predict one discrepancy per result, named apart from the parameters
+        self.discrepancyNames = [f"{name} discrepancy" for name in self.resultsExpressions]
+        self.discrepancyProblem = ProblemConstructor()
+        self.discrepancyProblem.setResults({name: None for name in self.discrepancyNames})
+        self.discrepancyProblem.setBounds(dict(zip(self.pNames, zip(*problem.getBounds()))))
+
+        self.levels = []
+        self.history = []
+        self._lock = Lock()
+
+    def addLevel(
+        self,
+        name: str,
+        evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        cost: float = 1.0,
+    ) -> None:
+        """Register a fidelity level. Levels are ordered by increasing cost, the most expensive being the reference.
+
+        Args:
+            name (str): Name of the level, e.g. "coarse".
+            evaluator (Callable[[Dict[str, float]], Dict[str, float]]): The simulator of this level.
+            cost (float, optional): Estimated cost of one evaluation, e.g. in seconds. Defaults to 1.0.
+        """
+        self.levels.append(
+            {
+                "name": name,
+                "evaluator": evaluator,
+                "cost": cost,
+                "nEvaluations": 0,
+                "time": 0.0,
+                "pairs": [],  # (parameters, results of the level below, results of this level)
+                "model": None,
+                "nTrained": 0,
+            }
+        )
+        self.levels.sort(key=lambda level: level["cost"])
+
+    def evaluate(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        """Evaluate a design, climbing the fidelity levels only as far as needed.
+
+        Args:
+            parameters (Dict[str, float]): The design parameters.
+
+        Returns:
+            Dict[str, float]: The results of the highest level, simulated or predicted by the discrepancy models.
+        """
+        if not self.levels:
+            raise ValueError("No fidelity level registered. Use addLevel() first.")
+
+        x = np.array([[parameters[name] for name in self.pNames]], dtype=float)
+        results = self._run(0, parameters)
+        level = 0
+        while level + 1 < len(self.levels):
+            corrected, std = self._correct(level + 1, x, results)
+            if corrected is not None and not self._mustClimb(corrected, std):
+                predicted = self._predictTop(level + 1, x, corrected)
+                self._record(parameters, level, predicted, True)
+                return predicted
+            upper = self._run(level + 1, parameters)
+            with self._lock:
+                self.levels[level + 1]["pairs"].append((x[0], results, upper))
+            results = upper
+            level += 1
+
+        self._record(parameters, level, results, False)
+        return results
+
+    __call__ = evaluate
+
+    def getStatistics(self) -> DataFrame:
+        """Returns the evaluations and cost spent at each level.
+
+        Returns:
+            DataFrame: One row per level.
+        """
+        return DataFrame(
+            [
+                {
+                    "level": level["name"],
+                    "cost": level["cost"],
+                    "nEvaluations": level["nEvaluations"],
+                    "meanTime": level["time"] / level["nEvaluations"]
+                    if level["nEvaluations"]
+                    else np.nan,
+                    "totalCost": level["cost"] * level["nEvaluations"],
+                    "nPairs": len(level["pairs"]),
+                }
+                for level in self.levels
+            ]
+        ).set_index("level")
+
+    def getHistory(self) -> DataFrame:
+        """Returns the designs evaluated so far with the level they reached.
+
+        Returns:
+            DataFrame: The design parameters, the reached level and whether the returned results were predicted.
+        """
+        return DataFrame(self.history)
+
+    def _run(self, level: int, parameters: Dict[str, float]) -> Dict[str, float]:
+        start = time()
+        results = self.levels[level]["evaluator"](parameters)
+        with self._lock:
+            self.levels[level]["nEvaluations"] += 1
+            self.levels[level]["time"] += time() - start
+        return results
+
+    def _correct(self, level: int, x: np.ndarray, lower: Dict[str, float]):
+        """Predict the results of level from those of the level below, None while the discrepancy is not trusted."""
+        model = self._getModel(level)
+        if model is None:
+            return None, None
+        discrepancy, std = model.predictBatch(x, returnStd=True)
+        lowerValues = np.array([lower[name] for name in self.resultsExpressions], dtype=float)
+        return lowerValues + discrepancy[0], std[0]
+
+    def _predictTop(self, level: int, x: np.ndarray, results: np.ndarray) -> Dict[str, float]:
+        """Chain the discrepancy models from level up to the reference level."""
+        for upper in range(level + 1, len(self.levels)):
+            model = self._getModel(upper)
+            if model is None:
+                break
+            results = results + model.predictBatch(x)[0]
+        return dict(zip(self.resultsExpressions, results.tolist()))
+
+    def _mustClimb(self, corrected: np.ndarray, std: np.ndarray) -> bool:
+        reference = np.array(
+            [[pair[2][name] for name in self.resultsExpressions] for pair in self.levels[-1]["pairs"]]
+            or [corrected],
+            dtype=float,
+        )
+        spread = reference.std(axis=0) + 1e-12
+        if np.any(std / spread > self.uncertaintyTolerance):
+            return True
+
+        results = dict(zip(self.resultsExpressions, corrected))
+        if any(constr(results) > 0 for constr in self.constraints):
+            return False
+        score = self.weights @ [obj(results) for obj in self.objectives]
+        with self._lock:
+            scores = [entry["score"] for entry in self.history if entry["score"] is not None]
+        return not scores or score <= np.quantile(scores, self.promisingFraction)
+
+    def _getModel(self, level: int) -> Union[Surrogate, None]:
+        with self._lock:
+            state = self.levels[level]
+            pairs = list(state["pairs"])
+            if len(pairs) < self.minPairs:
+                return None
+            if state["nTrained"] == len(pairs):
+                return state["model"]
+
+            X = np.array([x for x, _, _ in pairs])
+            discrepancies = np.array(
+                [
+                    [upper[name] - lower[name] for name in self.resultsExpressions]
+                    for _, lower, upper in pairs
+                ]
+            )
+            data = DataFrame(
+                np.hstack([X, discrepancies]), columns=self.pNames + self.discrepancyNames
+            )
+            model = Surrogate(self.discrepancyProblem, data)
+            model.generate(self.surrogateName, validate=False, **self.surrogateKwargs)
+            state["model"], state["nTrained"] = model, len(pairs)
+            return model
+
+    def _record(
+        self,
+        parameters: Dict[str, float],
+        level: int,
+        results: Dict[str, float],
+        predicted: bool,
+    ) -> None:
+        entry = dict(parameters)
+        entry["level"] = self.levels[level]["name"]
+        entry["predicted"] = predicted
+        entry["score"] = None
+        if all(constr(results) <= 0 for constr in self.constraints):
+            entry["score"] = float(self.weights @ [obj(results) for obj in self.objectives])
+        with self._lock:
+            self.history.append(entry)
@@ -0,0 +1,320 @@
+from json import dump, load
+from os import makedirs
+from os.path import getsize, isfile, join
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame, Series
+
+
+class FieldStore:
+    """A chunked, memory-mapped store of full result fields (e.g. nodal displacements or stresses) indexed by design id."""
+
+    def __init__(
+        self, directory: str, chunkSize: int = 1048576, dtype: str = "float32"
+    ) -> None:
+        """Open (or create) a field store.
+
+        Args:
+            directory (str): Directory containing the store files.
+            chunkSize (int, optional): Number of values by which the field files are grown. Defaults to 1048576.
+            dtype (str, optional): Data type of the stored values, only used when the store is created. Defaults to "float32".
+        """
+        makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunkSize = chunkSize
+
+        self._metaPath = join(directory, "store.json")
+        if isfile(self._metaPath):
+            with open(self._metaPath, "r") as f:
+                meta = load(f)
+        else:
+            meta = {"dtype": dtype, "pNames": [], "fields": []}
+
+        self.dtype = np.dtype(meta["dtype"])
+        self.pNames = meta["pNames"]
+        self.fieldNames = meta["fields"]
+
+        self._lock = Lock()
+        self._index = {name: self._loadIndex(name) for name in self.fieldNames}
+        self._maps = {}
+
+        designsPath = join(directory, "designs.dat")
+        if isfile(designsPath):
+            self._designs = np.fromfile(designsPath, dtype=np.float64).reshape(
+                -1, len(self.pNames) + 1
+            )
+        else:
+            self._designs = np.empty((0, len(self.pNames) + 1))
+        self.nextId = int(self._designs[:, 0].max()) + 1 if len(self._designs) else 0
+
+    def append(
+        self,
+        fields: Dict[str, Iterable[float]],
+        parameters: Union[Dict[str, float], None] = None,
+        designId: Union[int, None] = None,
+    ) -> int:
+        """Persist the full fields of one evaluated design.
+
+        Args:
+            fields (Dict[str, Iterable[float]]): Dictionary of result aliases and their full (iterable) values.
+            parameters (Union[Dict[str, float], None], optional): Design parameters that produced the fields. Defaults to None.
+            designId (Union[int, None], optional): Id of the design. Defaults to the next free id.
+
+        Returns:
+            int: The id under which the fields have been stored.
+        """
+        with self._lock:
+            if designId is None:
+                designId = self.nextId
+            self.nextId = max(self.nextId, designId + 1)
+
+            if parameters is not None:
+                self._appendDesign(designId, parameters)
+
+            for fieldName, values in fields.items():
+                if fieldName not in self.fieldNames:
+                    self.fieldNames.append(fieldName)
+                    self._index[fieldName] = np.empty((0, 3), dtype=np.int64)
+                    self._writeMeta()
+                self._appendField(fieldName, designId, values)
+
+        return designId
+
+    def getDesignIds(self, fieldName: Union[str, None] = None) -> List[int]:
+        """Returns the ids of the stored designs.
+
+        Args:
+            fieldName (Union[str, None], optional): If given, only designs having this field are returned. Defaults to None.
+
+        Returns:
+            List[int]: The design ids.
+        """
+        if fieldName is None:
+            return self._designs[:, 0].astype(int).tolist()
+        self._checkField(fieldName)
+        return self._index[fieldName][:, 0].tolist()
+
+    def getParameters(self) -> DataFrame:
+        """Returns the design parameters of the stored designs indexed by design id.
+
+        Returns:
+            DataFrame: The design parameters.
+        """
+        data = DataFrame(self._designs[:, 1:], columns=self.pNames)
+        data.index = self._designs[:, 0].astype(int)
+        data.index.name = "designId"
+        return data
+
+    def getField(self, fieldName: str, designId: int) -> np.ndarray:
+        """Returns the full field of a design as a read-only memory-mapped array.
+
+        Args:
+            fieldName (str): The result alias.
+            designId (int): The design id.
+
+        Returns:
+            np.ndarray: The field values.
+        """
+        index = self._getIndex(fieldName)
+        rows = np.flatnonzero(index[:, 0] == designId)
+        if not len(rows):
+            raise KeyError(f"Design {designId} has no field {fieldName}.")
+        _, offset, length = index[rows[-1]]
+        return self._getMap(fieldName)[offset : offset + length]
+
+    def getFields(
+        self, fieldName: str, designIds: Union[List[int], None] = None
+    ) -> np.ndarray:
+        """Returns the fields of several designs stacked as a (nDesigns, nValues) array.
+
+        Args:
+            fieldName (str): The result alias.
+            designIds (Union[List[int], None], optional): The designs to return. Defaults to all designs.
+
+        Raises:
+            ValueError: If the designs have fields of different length (e.g. different meshes).
+
+        Returns:
+            np.ndarray: The stacked fields.
+        """
+        _, offsets, lengths = self._select(fieldName, designIds)
+        if not len(lengths):
+            return np.empty((0, 0), dtype=self.dtype)
+        if not np.all(lengths == lengths[0]):
+            raise ValueError(
+                f"Fields {fieldName} have different lengths and cannot be stacked."
+            )
+        values = self._getMap(fieldName)
+        if np.all(np.diff(offsets) == lengths[0]):  # contiguous block, no copy
+            return values[offsets[0] : offsets[0] + len(offsets) * lengths[0]].reshape(
+                len(offsets), lengths[0]
+            )
+        return values[offsets[:, None] + np.arange(lengths[0])]
+
+    def reduce(
+        self,
+        fieldName: str,
+        action: str = "Max",
+        designIds: Union[List[int], None] = None,
+    ) -> Series:
+        """Reduce the stored fields to one scalar per design.
+
+        Args:
+            fieldName (str): The result alias.
+            action (str, optional): One of "Max", "Min", "Avg", "Std", "ArgMax", "ArgMin" or a percentile "P<q>" (e.g. "P95"). Defaults to "Max".
+            designIds (Union[List[int], None], optional): The designs to reduce. Defaults to all designs.
+
+        Returns:
+            Series: The reduced values indexed by design id.
+        """
+        ids, offsets, lengths = self._select(fieldName, designIds)
+        values = self._getMap(fieldName)
+
+        if len(lengths) and np.all(lengths == lengths[0]):
+            reduced = reduceField(self.getFields(fieldName, ids.tolist()), action, axis=1)
+        elif action in ("Max", "Min", "Avg"):
+            # ragged fields: reduce all segments in a single pass over the flat array
+            ufunc = {"Max": np.maximum, "Min": np.minimum, "Avg": np.add}[action]
+            order = np.argsort(offsets)
+            segments = np.concatenate(
+                [values[o : o + n] for o, n in zip(offsets[order], lengths[order])]
+            )
+            starts = np.concatenate([[0], np.cumsum(lengths[order])[:-1]])
+            reduced = np.empty(len(ids), dtype=np.float64)
+            reduced[order] = ufunc.reduceat(segments, starts)
+            if action == "Avg":
+                reduced = reduced / lengths
+        else:
+            reduced = np.array(
+                [reduceField(values[o : o + n], action) for o, n in zip(offsets, lengths)]
+            )
+
+        return Series(reduced, index=ids, name=f"{action}({fieldName})")
+
+    def _select(
+        self, fieldName: str, designIds: Union[List[int], None]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        index = self._getIndex(fieldName)
+        if designIds is not None:
+            lastRow = {designId: row for row, designId in enumerate(index[:, 0])}
+            missing = [designId for designId in designIds if designId not in lastRow]
+            if missing:
+                raise KeyError(f"Designs {missing} have no field {fieldName}.")
+            index = index[[lastRow[designId] for designId in designIds]]
+        return index[:, 0], index[:, 1], index[:, 2]
+
+    def _appendDesign(self, designId: int, parameters: Dict[str, float]) -> None:
+        if not self.pNames:
+            self.pNames = list(parameters.keys())
+            self._designs = np.empty((0, len(self.pNames) + 1))
+            self._writeMeta()
+        row = np.array(
+            [[designId] + [parameters[name] for name in self.pNames]], dtype=np.float64
+        )
+        with open(join(self.directory, "designs.dat"), "ab") as f:
+            row.tofile(f)
+        self._designs = np.concatenate([self._designs, row])
+
+    def _appendField(
+        self, fieldName: str, designId: int, values: Iterable[float]
+    ) -> None:
+        values = np.asarray(values, dtype=self.dtype).ravel()
+        index = self._index[fieldName]
+        offset = int(index[-1, 1] + index[-1, 2]) if len(index) else 0
+
+        valuesPath = join(self.directory, f"{fieldName}.dat")
+        capacity = getsize(valuesPath) // self.dtype.itemsize if isfile(valuesPath) else 0
+        mode = "r+b" if isfile(valuesPath) else "w+b"
+        with open(valuesPath, mode) as f:
+            if offset + len(values) > capacity:  # grow the file by whole chunks
+                nChunks = -(-(offset + len(values) - capacity) // self.chunkSize)
+                f.truncate((capacity + nChunks * self.chunkSize) * self.dtype.itemsize)
+                self._maps.pop(fieldName, None)
+            f.seek(offset * self.dtype.itemsize)
+            f.write(values.tobytes())
+
+        entry = np.array([[designId, offset, len(values)]], dtype=np.int64)
+        with open(join(self.directory, f"{fieldName}.idx"), "ab") as f:
+            entry.tofile(f)
+        self._index[fieldName] = np.concatenate([index, entry])
+
+    def _getIndex(self, fieldName: str) -> np.ndarray:
+        self._checkField(fieldName)
+        return self._index[fieldName]
+
+    def _getMap(self, fieldName: str) -> np.ndarray:
+        if fieldName not in self._maps:
+            self._maps[fieldName] = np.memmap(
+                join(self.directory, f"{fieldName}.dat"), dtype=self.dtype, mode="r"
+            )
+        return self._maps[fieldName]
+
+    def _loadIndex(self, fieldName: str) -> np.ndarray:
+        indexPath = join(self.directory, f"{fieldName}.idx")
+        if not isfile(indexPath):
+            return np.empty((0, 3), dtype=np.int64)
+        return np.fromfile(indexPath, dtype=np.int64).reshape(-1, 3)
+
+    def _writeMeta(self) -> None:
+        with open(self._metaPath, "w") as f:
+            dump(
+                {"dtype": self.dtype.name, "pNames": self.pNames, "fields": self.fieldNames},
+                f,
+            )
+
+    def _checkField(self, fieldName: str) -> None:
+        if fieldName not in self.fieldNames:
+            raise KeyError(
+                f"Field {fieldName} is not stored. Available fields: {self.fieldNames}"
+            )
+
+
+def reduceField(values, action: str, axis: Union[int, None] = None):
+    """Reduce an iterable result (or a batch of them along axis) to a scalar.
+
+    Args:
+        values (array_like): The field values.
+        action (str): One of "Max", "Min", "Avg", "Std", "ArgMax", "ArgMin" or a percentile "P<q>" (e.g. "P95").
+        axis (Union[int, None], optional): Axis along which to reduce. Defaults to None (whole array).
+
+    Raises:
+        ValueError: If the action is not known.
+
+    Returns:
+        The reduced value(s).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if action == "Max":
+        return np.max(values, axis=axis)
+    elif action == "Min":
+        return np.min(values, axis=axis)
+    elif action == "Avg":
+        return np.average(values, axis=axis)
+    elif action == "Std":
+        return np.std(values, axis=axis)
+    elif action == "ArgMax":
+        return np.argmax(values, axis=axis)
+    elif action == "ArgMin":
+        return np.argmin(values, axis=axis)
+    elif isPercentile(action):
+        return np.percentile(values, float(action[1:]), axis=axis)
+    raise ValueError(f"Invalid iterable action {action}.")
+
+
+def isPercentile(action: Union[str, None]) -> bool:
+    """Test if an iterable action is a percentile request such as "P95".
+
+    Args:
+        action (Union[str, None]): The iterable action.
+
+    Returns:
+        bool: True if the action is a valid percentile.
+    """
+    if not isinstance(action, str) or not action.startswith("P"):
+        return False
+    try:
+        return 0 <= float(action[1:]) <= 100
+    except ValueError:
+        return False
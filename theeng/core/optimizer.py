@@ -1,14 +1,53 @@
-from typing import Callable, Dict, Iterable, List, Tuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from time import time
+from typing import Callable, Dict, Iterable, List, Tuple, Union
 
-from numpy import concatenate
-from pandas import DataFrame
+from numpy import (
+    argmin,
+    argsort,
+    array,
+    asarray,
+    concatenate,
+    hstack,
+    inf,
+    isclose,
+    lexsort,
+    maximum,
+    minimum,
+    ndarray,
+    ravel,
+    stack,
+    unique,
+    zeros,
+)
+from numpy.random import default_rng
+from pandas import DataFrame, concat
 from pymoo.core.callback import Callback
+from pymoo.core.population import Population
 from pymoo.core.problem import ElementwiseProblem
 from pymoo.optimize import minimize
+from scipy.optimize import Bounds, NonlinearConstraint
+from scipy.optimize import minimize as scipyMinimize
+from scipy.stats.qmc import LatinHypercube
 
-from theeng.algorithms.optimizers import Optimizers
+from theeng.algorithms.optimizers import (
+    MixedVariableRepair,
+    Optimizers,
+    SteadyStateEvolution,
+)
+from theeng.algorithms.terminations import ConvergenceTermination
 from theeng.core.abstract import Step
+from theeng.core.cache import EvaluationCache
+from theeng.core.pareto import ParetoArchive, nonDominatedSort
 from theeng.core.problem import ProblemConstructor
+from theeng.core.robust import RobustProblem
+from theeng.core.stream import ResultsStream, workerName
+from theeng.core.surrogate import Surrogate
 
 
 class Optimizer(Step):
@@ -18,13 +57,38 @@ class Optimizer(Step):
         evaluator: Callable[[Dict[str, float]], Dict[str, float]],
     ) -> None:
         super().__init__(problem, evaluator)
+        self.asyncStatistics = {}
+        self.convergenceHistory = DataFrame()
+        self.population = None
+        self.optimumViolation = []
+        self.prescreenStatistics = {}
+        self.trustRegionHistory = None
 
     def optimize(
         self,
         optimizerName: str = "nsga3",
         termination: Tuple[str, int] = ("n_eval", 100),
+        stream: Union[ResultsStream, None] = None,
+        archive: Union[ParetoArchive, None] = None,
+        convergenceTolerance: Union[float, None] = None,
+        convergencePatience: int = 5,
+        seed: int = 1,
         **kwargs
     ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Optimize the problem with a pymoo algorithm.
+
+        Args:
+            optimizerName (str, optional): Name of the method of Optimizers to use. Defaults to "nsga3".
+            termination (Tuple[str, int], optional): Termination (or maximum budget when converging) as a pymoo tuple. Defaults to ("n_eval", 100).
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
+            archive (Union[ParetoArchive, None], optional): Archive updated after each generation. Defaults to None.
+            convergenceTolerance (Union[float, None], optional): If given, stop early once hypervolume, front movement and constraint violation stop improving by more than this. Defaults to None.
+            convergencePatience (int, optional): Number of consecutive generations without improvement before stopping early. Defaults to 5.
+            seed (int, optional): Random seed of the algorithm. Defaults to 1.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs, their objectives and the history data.
+        """
         if self.nObj > 1:
             if not optimizerName == "nsga3":
                 raise Exception(
@@ -34,18 +98,36 @@ class Optimizer(Step):
         problem = OptimizationProblem(
             self.problem,
             self.evaluator,
+            stream=stream,
         )
+        if self.problem.isMixed():
+            kwargs.setdefault("repair", self._getRepair())
         algorithm = self._getMethod(Optimizers, optimizerName)(**kwargs, nObj=self.nObj)
 
+        if convergenceTolerance is not None:
+            termination = ConvergenceTermination(
+                budget=termination,
+                tolerance=convergenceTolerance,
+                patience=convergencePatience,
+            )
+
         res = minimize(
             problem,
             algorithm,
             termination=termination,
-            seed=1,
-            callback=HistCallback(),
+            seed=seed,
+            callback=HistCallback(archive=archive),
             return_least_infeasible=True,
         )
 
+        if stream is not None:
+            stream.flush()
+
+        if isinstance(res.algorithm.termination, ConvergenceTermination):
+            self.convergenceHistory = DataFrame(res.algorithm.termination.history)
+        self.population = res.pop.get("X", "F", "CV")
+        self.optimumViolation = ravel(res.CV).tolist()
+
         x = res.X.tolist()
         f = res.F.tolist()
 
@@ -53,20 +135,780 @@ class Optimizer(Step):
             x = [x]
         if not isinstance(f[0], Iterable):
             f = [f]
+        x = self._decodeDesigns(x)
 
-        x_hist = concatenate(res.algorithm.callback.data["x_hist"]).tolist()
-        r_hist = concatenate(res.algorithm.callback.data["r_hist"]).tolist()
+        data = self._historyToData(res.algorithm.callback)
 
-        data = concatenate([x_hist, r_hist], axis=1)
-        data = DataFrame(
-            data,
-            columns=self.pNames
+        return x, f, data
+
+    def optimizeMultiStart(
+        self,
+        optimizerName: str = "nelderMead",
+        nStarts: int = 4,
+        termination: Tuple[str, int] = ("n_eval", 100),
+        nWorkers: Union[int, None] = None,
+        parallelization: str = "process",
+        archive: Union[ParetoArchive, None] = None,
+        **kwargs
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Run independent optimizations with different seeds (hence start points) in parallel and merge them.
+
+        Args:
+            optimizerName (str, optional): Name of the method of Optimizers to use. Defaults to "nelderMead".
+            nStarts (int, optional): Number of independent runs. Defaults to 4.
+            termination (Tuple[str, int], optional): Termination of each run. Defaults to ("n_eval", 100).
+            nWorkers (Union[int, None], optional): Number of parallel runs. Defaults to the number of CPUs.
+            parallelization (str, optional): "process" for picklable evaluators, "thread" otherwise. Defaults to "process".
+            archive (Union[ParetoArchive, None], optional): Archive updated with the merged history. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs over all runs, their objectives and the merged history data.
+        """
+        with Optimizer._getExecutor(parallelization)(max_workers=nWorkers) as executor:
+            futures = [
+                executor.submit(
+                    _runOptimization,
+                    self.problem,
+                    self.evaluator,
+                    optimizerName,
+                    termination,
+                    seed,
+                    None,
+                    kwargs,
+                )
+                for seed in range(1, nStarts + 1)
+            ]
+            runs = [future.result() for future in futures]
+
+        return self._mergeRuns(runs, archive)
+
+    def optimizeIslands(
+        self,
+        optimizerName: str = "geneticAlgorithm",
+        nIslands: int = 4,
+        nEpochs: int = 5,
+        epochGenerations: int = 10,
+        nMigrants: int = 2,
+        nWorkers: Union[int, None] = None,
+        parallelization: str = "process",
+        archive: Union[ParetoArchive, None] = None,
+        **kwargs
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Island model: evolve several populations in parallel with a periodic ring migration of the best designs.
+
+        Each epoch every island evolves for epochGenerations generations, then its best nMigrants designs replace the
+        worst designs of the next island. Islands are restarted from their population at each epoch, which re-evaluates
+        it: the model is meant for cheap (e.g. surrogate) objectives.
+
+        Args:
+            optimizerName (str, optional): Name of a population based method of Optimizers. Defaults to "geneticAlgorithm".
+            nIslands (int, optional): Number of populations. Defaults to 4.
+            nEpochs (int, optional): Number of migration epochs. Defaults to 5.
+            epochGenerations (int, optional): Generations evolved between migrations. Defaults to 10.
+            nMigrants (int, optional): Number of designs migrating from each island. Defaults to 2.
+            nWorkers (Union[int, None], optional): Number of parallel islands. Defaults to the number of CPUs.
+            parallelization (str, optional): "process" for picklable evaluators, "thread" otherwise. Defaults to "process".
+            archive (Union[ParetoArchive, None], optional): Archive updated with the merged history. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs over all islands, their objectives and the merged history data.
+        """
+        populations = [None] * nIslands
+        runs = []
+        with Optimizer._getExecutor(parallelization)(max_workers=nWorkers) as executor:
+            for epoch in range(nEpochs):
+                futures = [
+                    executor.submit(
+                        _runOptimization,
+                        self.problem,
+                        self.evaluator,
+                        optimizerName,
+                        ("n_gen", epochGenerations),
+                        1 + island + epoch * nIslands,
+                        populations[island],
+                        kwargs,
+                    )
+                    for island in range(nIslands)
+                ]
+                epochRuns = [future.result() for future in futures]
+                runs += epochRuns
+
+                ranked = []
+                for _, _, _, _, (X, F, CV) in epochRuns:
+                    fronts = nonDominatedSort(DataFrame(F), list(range(F.shape[1]))).values
+                    order = lexsort((F[:, 0], fronts, maximum(CV.ravel(), 0)))
+                    ranked.append(X[order])
+                for island in range(nIslands):  # ring migration, best replace worst
+                    migrants = ranked[island - 1][:nMigrants]
+                    populations[island] = concatenate(
+                        [ranked[island][: len(ranked[island]) - len(migrants)], migrants]
+                    )
+
+        return self._mergeRuns(runs, archive)
+
+    def optimizeAsync(
+        self,
+        termination: Tuple[str, int] = ("n_eval", 100),
+        popSize: int = 20,
+        nWorkers: int = 4,
+        parallelization: str = "thread",
+        seed: int = 1,
+        stream: Union[ResultsStream, None] = None,
+        archive: Union[ParetoArchive, None] = None,
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Steady-state asynchronous optimization keeping all workers busy.
+
+        As soon as any evaluation completes, its design is inserted in the population and a new candidate
+        is bred and submitted, so that slow evaluations never make the other workers wait for the end of a generation.
+
+        Args:
+            termination (Tuple[str, int], optional): ("n_eval", n) or ("n_gen", n), a generation being popSize evaluations. Defaults to ("n_eval", 100).
+            popSize (int, optional): Size of the steady-state population. Defaults to 20.
+            nWorkers (int, optional): Number of concurrent evaluations. Defaults to 4.
+            parallelization (str, optional): "thread" for evaluators driving external programs, "process" for picklable CPU-bound evaluators. Defaults to "thread".
+            seed (int, optional): Random seed. Defaults to 1.
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
+            archive (Union[ParetoArchive, None], optional): Archive updated with each completed evaluation. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs, their objectives and the history data.
+        """
+        criterion, value = termination
+        if criterion == "n_eval":
+            nEval = value
+        elif criterion == "n_gen":
+            nEval = value * popSize
+        else:
+            raise ValueError("Asynchronous optimization supports n_eval or n_gen terminations.")
+
+        executorClass = Optimizer._getExecutor(parallelization)
+
+        algorithm = SteadyStateEvolution(
+            self.lowerBounds, self.upperBounds, popSize=popSize, seed=seed
+        )
+        callback = HistCallback()
+        names = (
+            self.pNames
             + self.resultsExpressions
             + self.objectiveExpressions
-            + self.constraintExpressions,
+            + self.constraintExpressions
         )
 
-        data = data.T.drop_duplicates().T  # drop duplicate columns
+        busyTime = 0.0
+        startTime = time()
+        submitted = 0
+        with executorClass(max_workers=nWorkers) as executor:
+            pending = {}
+
+            def submit():
+                nonlocal submitted
+                x = algorithm.ask()
+                if self.problem.isMixed():
+                    x = array(self.problem.decode(x))
+                future = executor.submit(
+                    _evaluateDesign,
+                    self.evaluator,
+                    self.objectives,
+                    self.constraints,
+                    self.pNames,
+                    list(x),
+                )
+                pending[future] = x
+                submitted += 1
+
+            while submitted < min(nWorkers, nEval):
+                submit()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    x = pending.pop(future)
+                    r, f, g, start, end, worker = future.result()
+                    algorithm.tell(x, f, g)
+                    if submitted < nEval:
+                        submit()
+
+                    busyTime += end - start
+                    callback.data["x_hist"].append(array([x]))
+                    callback.data["r_hist"].append(array([r + f + g]))
+                    if stream is not None:
+                        stream.writeEvaluation(names, list(x) + r + f + g, start, end, worker)
+                    if archive is not None:
+                        archive.insert(f, list(x) + r + f + g, cv=sum(max(c, 0) for c in g))
+
+        if stream is not None:
+            stream.flush()
+
+        wallTime = time() - startTime
+        self.asyncStatistics = {
+            "nEvaluations": submitted,
+            "wallTime": wallTime,
+            "utilization": busyTime / (nWorkers * wallTime) if wallTime > 0 else 0.0,
+        }
+
+        xBest, fBest = algorithm.result()
+        data = self._historyToData(callback)
+
+        return xBest.tolist(), fBest.tolist(), data
+
+    def optimizePrescreened(
+        self,
+        surrogateName: str = "gaussianProcess",
+        optimizerName: str = "nsga3",
+        termination: Tuple[str, int] = ("n_eval", 100),
+        oversampling: int = 5,
+        kappa: float = 1.0,
+        nSamples: int = 32,
+        seed: int = 1,
+        stream: Union[ResultsStream, None] = None,
+        archive: Union[ParetoArchive, None] = None,
+        surrogateKwargs: Union[dict, None] = None,
+        **kwargs
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Evolutionary optimization on the evaluator where a surrogate pre-screens the offspring.
+
+        Each generation breeds oversampling times more offspring than usual. A surrogate trained on all the designs
+        evaluated so far ranks them by an optimistic (lower confidence bound) estimate of their objectives and
+        constraints, and only the best ones are evaluated and compete for survival. The surrogate is refitted
+        after every generation.
+
+        Args:
+            surrogateName (str, optional): Name of the method of Surrogates to use. Its uncertainty comes from the Gaussian process or a bootstrap ensemble. Defaults to "gaussianProcess".
+            optimizerName (str, optional): "nsga3" or "geneticAlgorithm". Defaults to "nsga3".
+            termination (Tuple[str, int], optional): Termination as a pymoo tuple, evaluations counting only the evaluator calls. Defaults to ("n_eval", 100).
+            oversampling (int, optional): Ratio of bred to evaluated offspring. Defaults to 5.
+            kappa (float, optional): Weight of the uncertainty in the lower confidence bound, 0 ranks by the predicted values. Defaults to 1.0.
+            nSamples (int, optional): Number of samples propagating the results uncertainty through the expressions. Defaults to 32.
+            seed (int, optional): Random seed. Defaults to 1.
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
+            archive (Union[ParetoArchive, None], optional): Archive updated after each generation. Defaults to None.
+            surrogateKwargs (Union[dict, None], optional): Arguments of the surrogate method. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs, their objectives and the history data.
+        """
+        if optimizerName not in ("nsga3", "geneticAlgorithm"):
+            raise ValueError(
+                "Pre-screening requires a genetic algorithm. Use nsga3 or geneticAlgorithm."
+            )
+        if self.nObj > 1 and optimizerName != "nsga3":
+            raise Exception(
+                "Only NSGA3 is supported for multi-objective optimization. Use nsga3 name."
+            )
+
+        problem = OptimizationProblem(self.problem, self.evaluator, stream=stream)
+        if self.problem.isMixed():
+            kwargs.setdefault("repair", self._getRepair())
+        algorithm = self._getMethod(Optimizers, optimizerName)(**kwargs, nObj=self.nObj)
+        algorithm.setup(problem, termination=termination, seed=seed)
+        nOffsprings = algorithm.n_offsprings
+        objectivesBatch = self.problem.getObjectivesBatch()
+        constraintsBatch = self.problem.getConstraintsBatch()
+        rng = default_rng(seed)
+        callback = HistCallback(archive=archive)
+        surrogate = None
+        nCandidates = 0
+
+        while algorithm.has_next():
+            if surrogate is not None:
+                algorithm.n_offsprings = nOffsprings * oversampling
+            infills = algorithm.ask()
+            if infills is None or not len(infills):
+                break
+
+            if surrogate is not None and len(infills) > nOffsprings:
+                nCandidates += len(infills)
+                mean, std = surrogate.predictBatch(infills.get("X"), returnStd=True)
+                samples = mean + std * rng.standard_normal((nSamples,) + mean.shape)
+                results = {
+                    name: samples[:, :, i] for i, name in enumerate(self.resultsExpressions)
+                }
+                F = self._lowerConfidenceBound(objectivesBatch, results, kappa)
+                G = self._lowerConfidenceBound(constraintsBatch, results, kappa)
+                CV = maximum(G, 0).sum(axis=1)
+
+                fronts = nonDominatedSort(DataFrame(F), list(range(self.nObj))).values
+                crowding = zeros(len(F))
+                for front in unique(fronts):
+                    members = (fronts == front).nonzero()[0]
+                    crowding[members] = SteadyStateEvolution._crowdingDistance(F[members])
+                order = lexsort((-crowding, fronts, CV))
+                infills = infills[order[:nOffsprings]]
+
+            algorithm.evaluator.eval(problem, infills)
+            algorithm.tell(infills=infills)
+            callback.record(infills)
+
+            surrogate = Surrogate(self.problem, self._historyToData(callback))
+            surrogate.generate(surrogateName, validate=False, **(surrogateKwargs or {}))
+
+        if stream is not None:
+            stream.flush()
+
+        res = algorithm.result()
+        self.population = res.pop.get("X", "F", "CV")
+        self.optimumViolation = ravel(res.CV).tolist()
+        self.prescreenStatistics = {
+            "nEvaluations": algorithm.evaluator.n_eval,
+            "nCandidates": nCandidates,
+        }
+
+        x = res.X.tolist()
+        f = res.F.tolist()
+
+        if not isinstance(x[0], Iterable):
+            x = [x]
+        if not isinstance(f[0], Iterable):
+            f = [f]
+        x = self._decodeDesigns(x)
+
+        data = self._historyToData(callback)
+
+        return x, f, data
+
+    @staticmethod
+    def _lowerConfidenceBound(
+        expressions: List[Callable], results: Dict[str, ndarray], kappa: float
+    ) -> ndarray:
+        """Lower confidence bound of each expression from samples of the results (nSamples, nDesigns)."""
+        if not expressions:
+            return zeros((next(iter(results.values())).shape[1], 0))
+        values = stack([expression(results) for expression in expressions], axis=2)
+        return values.mean(axis=0) - kappa * values.std(axis=0)
+
+    def optimizeGradient(
+        self,
+        gradient: Callable[[Dict[str, float]], Dict[str, Iterable[float]]],
+        method: str = "SLSQP",
+        nStarts: int = 8,
+        maxIter: int = 200,
+        tolerance: float = 1e-8,
+        constraintTolerance: float = 1e-6,
+        seed: int = 1,
+        stream: Union[ResultsStream, None] = None,
+        archive: Union[ParetoArchive, None] = None,
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Gradient-based optimization from several Latin hypercube start points, meant for smooth (surrogate) evaluators.
+
+        Objective and constraint gradients are obtained by differentiating their expressions with the results
+        gradients, e.g. the analytic gradient of Surrogate.generateGradient(). Several objectives are scalarized
+        by their weighted sum, using the objective weights of the problem.
+
+        Args:
+            gradient (Callable[[Dict[str, float]], Dict[str, Iterable[float]]]): Returns the gradient of each result with respect to the design parameters.
+            method (str, optional): A scipy method supporting bounds, "SLSQP" or "trust-constr" when the problem has constraints. Defaults to "SLSQP".
+            nStarts (int, optional): Number of start points. Defaults to 8.
+            maxIter (int, optional): Maximum number of iterations of each start. Defaults to 200.
+            tolerance (float, optional): Convergence tolerance of the scipy method. Defaults to 1e-8.
+            constraintTolerance (float, optional): Constraint violation still considered feasible when choosing the optimum. Defaults to 1e-6.
+            seed (int, optional): Random seed of the start points. Defaults to 1.
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
+            archive (Union[ParetoArchive, None], optional): Archive updated with each evaluation. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best design, its objectives and the history data.
+        """
+        objectiveGradients = self.problem.getObjectivesGradients()
+        constraintGradients = self.problem.getConstraintsGradients()
+        weights = array(self.problem.getObjectiveWeights() or [1.0] * self.nObj, dtype=float)
+        if self.nObj == 1:
+            weights = array([1.0])
+        names = (
+            self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions
+        )
+        callback = HistCallback()
+        cache = {}
+
+        def evaluate(x):
+            key = tuple(x)
+            if key not in cache:  # scipy asks objective and constraints at the same point
+                parameters = {name: value for name, value in zip(self.pNames, x)}
+                start = time()
+                results = self.evaluator(parameters)
+                jacobian = gradient(parameters)
+                f = [obj(results) for obj in self.objectives]
+                g = [constr(results) for constr in self.constraints]
+                df = [grad(results, jacobian) for grad in objectiveGradients]
+                dg = [grad(results, jacobian) for grad in constraintGradients]
+                row = list(x) + list(results.values()) + f + g
+
+                callback.data["x_hist"].append(array([x]))
+                callback.data["r_hist"].append(array([row[self.nVar :]]))
+                if stream is not None:
+                    stream.writeEvaluation(names, row, start, time())
+                if archive is not None:
+                    archive.insert(f, row, cv=sum(max(c, 0) for c in g))
+                cache.clear()
+                cache[key] = (f, g, df, dg)
+            return cache[key]
+
+        def fun(x):
+            f, _, df, _ = evaluate(x)
+            return float(weights @ asarray(f)), weights @ asarray(df).reshape(self.nObj, -1)
+
+        constraints = []
+        if self.constraints:
+            if method == "trust-constr":
+                constraints = [
+                    NonlinearConstraint(
+                        lambda x: asarray(evaluate(x)[1]),
+                        -inf,
+                        0,
+                        jac=lambda x: asarray(evaluate(x)[3]),
+                    )
+                ]
+            else:  # scipy expects fun(x) >= 0
+                constraints = [
+                    {
+                        "type": "ineq",
+                        "fun": lambda x: -asarray(evaluate(x)[1]),
+                        "jac": lambda x: -asarray(evaluate(x)[3]),
+                    }
+                ]
+
+        lowerBounds, upperBounds = array(self.lowerBounds), array(self.upperBounds)
+        starts = lowerBounds + LatinHypercube(d=self.nVar, seed=seed).random(nStarts) * (
+            upperBounds - lowerBounds
+        )
+
+        candidates = []
+        for x0 in starts:
+            res = scipyMinimize(
+                fun,
+                x0,
+                jac=True,
+                method=method,
+                bounds=Bounds(lowerBounds, upperBounds),
+                constraints=constraints,
+                tol=tolerance,
+                options={"maxiter": maxIter},
+            )
+            f, g, _, _ = evaluate(res.x)
+            violation = sum(max(c, 0) for c in g)
+            candidates.append(
+                (
+                    violation > constraintTolerance,  # feasible starts first
+                    violation,
+                    float(weights @ asarray(f)),
+                    res.x.tolist(),
+                    f,
+                )
+            )
+
+        _, violation, _, x, f = min(candidates, key=lambda c: c[:3])
+        x = self._decodeDesigns([x])[0]
+        self.optimumViolation = [violation]
+        data = self._historyToData(callback)
+
+        return [x], [f], data
+
+    def optimizeTrustRegion(
+        self,
+        simulator: Callable[[Dict[str, float]], Dict[str, float]],
+        data: DataFrame,
+        surrogateName: str = "polynomial",
+        optimizerName: Union[str, None] = None,
+        termination: Tuple[str, int] = ("n_eval", 2000),
+        x0: Union[List[float], None] = None,
+        batchSize: int = 4,
+        maxRounds: int = 10,
+        tolerance: float = 0.05,
+        radius: float = 0.25,
+        minRadius: float = 0.01,
+        expansion: float = 2.0,
+        contraction: float = 0.5,
+        nWorkers: Union[int, None] = None,
+        parallelization: str = "thread",
+        stream: Union[ResultsStream, None] = None,
+        surrogateKwargs: Union[dict, None] = None,
+        **kwargs
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Trust-region management of the surrogate: optimize locally, verify on the simulator, adapt the region and refit.
+
+        Each round the surrogate is refitted on the designs inside (twice) the trust region, or on the nearest ones when
+        there are too few for a quadratic fit, optimized within it, and a
+        batch of its best candidates is simulated in parallel. The ratio of actual to predicted improvement expands or
+        contracts the region, whose center moves to the best simulated design. The loop stops once predictions and
+        simulations of the best candidate agree within tolerance, when the region collapses or after maxRounds.
+        Several objectives are compared by their weighted sum, using the objective weights of the problem.
+
+        Args:
+            simulator (Callable[[Dict[str, float]], Dict[str, float]]): The evaluator used for verification.
+            data (DataFrame): Simulated designs, e.g. the sampler data, used to fit the surrogate and center the first region.
+            surrogateName (str, optional): Name of the method of Surrogates to use. Defaults to "polynomial".
+            optimizerName (Union[str, None], optional): Name of the method of Optimizers used on the surrogate. Defaults to geneticAlgorithm, nsga3 for several objectives.
+            termination (Tuple[str, int], optional): Termination of each surrogate optimization. Defaults to ("n_eval", 2000).
+            x0 (Union[List[float], None], optional): Center of the first region, e.g. the optimum of a global surrogate optimization. Defaults to the best design of data.
+            batchSize (int, optional): Number of designs simulated each round. Defaults to 4.
+            maxRounds (int, optional): Maximum number of rounds, bounding the extra simulations to maxRounds * batchSize. Defaults to 10.
+            tolerance (float, optional): Agreement between predicted and simulated objectives and constraints, relative to their spread in the data. Defaults to 0.05.
+            radius (float, optional): Initial half width of the region, as a fraction of the bounds range. Defaults to 0.25.
+            minRadius (float, optional): Radius below which the loop stops. Defaults to 0.01.
+            expansion (float, optional): Radius factor after a successful round on the region boundary. Defaults to 2.0.
+            contraction (float, optional): Radius factor after a poor round. Defaults to 0.5.
+            nWorkers (Union[int, None], optional): Number of parallel simulations. Defaults to batchSize.
+            parallelization (str, optional): "thread" for simulators driving external programs, "process" for picklable ones. Defaults to "thread".
+            stream (Union[ResultsStream, None], optional): Sink receiving each simulation as soon as it completes. Defaults to None.
+            surrogateKwargs (Union[dict, None], optional): Arguments of the surrogate method. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best simulated design, its objectives and the data of the verification simulations.
+        """
+        optimizerName = optimizerName or ("nsga3" if self.nObj > 1 else "geneticAlgorithm")
+        kwargs.setdefault("popSize", 40)
+        if self.problem.isMixed():
+            simulator = EvaluationCache.shared(simulator, self.problem)
+            kwargs.setdefault("repair", self._getRepair())
+        weights = array(self.problem.getObjectiveWeights() or [1.0] * self.nObj, dtype=float)
+        if self.nObj == 1:
+            weights = array([1.0])
+        objectivesBatch = self.problem.getObjectivesBatch()
+        constraintsBatch = self.problem.getConstraintsBatch()
+        names = (
+            self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions
+        )
+        nConst = len(self.constraints)
+        fColumns = slice(len(names) - self.nObj - nConst, len(names) - nConst)
+        gColumns = slice(len(names) - nConst, len(names))
+        trainingColumns = self.nVar + len(self.resultsExpressions)  # objectives may repeat result names
+        lowerBounds, upperBounds = array(self.lowerBounds), array(self.upperBounds)
+        span = upperBounds - lowerBounds
+        minLocalPoints = (self.nVar + 1) * (self.nVar + 2) // 2  # enough for a full quadratic
+
+        def merit(F: ndarray, G: ndarray) -> ndarray:
+            """Rows sortable with lexsort: feasibility, violation, then weighted objectives."""
+            CV = maximum(G, 0).sum(axis=1)
+            return stack([CV > 0, CV, F @ weights], axis=1)
+
+        def bestOf(merits: ndarray) -> int:
+            return int(lexsort(merits.T[::-1])[0])
+
+        known = data.reindex(columns=names).to_numpy(dtype=float)
+        best = bestOf(merit(known[:, fColumns], known[:, gColumns]))
+        bestX, bestRow = known[best, : self.nVar], known[best]
+        bestMerit = merit(known[best : best + 1, fColumns], known[best : best + 1, gColumns])[0]
+        center = bestX if x0 is None else array(x0, dtype=float)
+
+        verified = []
+        history = []
+        with Optimizer._getExecutor(parallelization)(max_workers=nWorkers or batchSize) as executor:
+            for iteration in range(maxRounds):
+                localLower = maximum(lowerBounds, center - radius * span)
+                localUpper = minimum(upperBounds, center + radius * span)
+
+                distance = (abs(known[:, : self.nVar] - center) / span).max(axis=1)
+                nLocal = max(int((distance <= 2 * radius).sum()), minLocalPoints)
+                training = known[argsort(distance, kind="stable")[:nLocal]]  # nearest designs
+                surrogate = Surrogate(
+                    self.problem,
+                    DataFrame(
+                        training[:, :trainingColumns],
+                        columns=self.pNames + self.resultsExpressions,
+                    ),
+                )
+                predictor, _ = surrogate.generate(
+                    surrogateName, validate=False, **(surrogateKwargs or {})
+                )
+
+                res = minimize(
+                    OptimizationProblem(
+                        self.problem,
+                        predictor,
+                        lowerBounds=localLower.tolist(),
+                        upperBounds=localUpper.tolist(),
+                    ),
+                    self._getMethod(Optimizers, optimizerName)(**kwargs, nObj=self.nObj),
+                    termination=termination,
+                    seed=iteration + 1,
+                    return_least_infeasible=True,
+                )
+                candidates = unique(array(self._decodeDesigns(res.pop.get("X").tolist())), axis=0)
+                predictedF, predictedG = Optimizer._predictExpressions(
+                    surrogate, candidates, objectivesBatch, constraintsBatch
+                )
+                order = lexsort(merit(predictedF, predictedG).T[::-1])[:batchSize]
+                candidates = candidates[order]
+                predictedF, predictedG = predictedF[order], predictedG[order]
+
+                futures = [
+                    executor.submit(
+                        _evaluateDesign,
+                        simulator,
+                        self.objectives,
+                        self.constraints,
+                        self.pNames,
+                        list(x),
+                    )
+                    for x in candidates
+                ]
+                rows = []
+                for x, future in zip(candidates, futures):
+                    r, f, g, start, end, worker = future.result()
+                    rows.append(list(x) + r + f + g)
+                    if stream is not None:
+                        stream.writeEvaluation(names, rows[-1], start, end, worker)
+                rows = array(rows, dtype=float)
+                verified.append(rows)
+                known = concatenate([known, rows])
+
+                actualMerit = merit(rows[:, fColumns], rows[:, gColumns])
+                predictedMerit = merit(predictedF, predictedG)
+                actual = hstack([rows[:, fColumns], rows[:, gColumns]])[0]
+                predicted = hstack([predictedF, predictedG])[0]
+                spread = hstack([known[:, fColumns], known[:, gColumns]]).std(axis=0)
+                error = float(max(abs(predicted - actual) / (spread + 1e-12)))  # relative to the spread of the data, constraints are often near 0
+
+                if bestMerit[0] or predictedMerit[0, 0]:  # no improvement ratio while infeasible
+                    ratio = 1.0 if tuple(actualMerit[0]) < tuple(bestMerit) else 0.0
+                else:
+                    predictedImprovement = bestMerit[2] - predictedMerit[0, 2]
+                    actualImprovement = bestMerit[2] - actualMerit[0, 2]
+                    ratio = (
+                        actualImprovement / predictedImprovement
+                        if predictedImprovement > 0
+                        else 0.0
+                    )
+
+                best = bestOf(actualMerit)
+                if tuple(actualMerit[best]) < tuple(bestMerit):
+                    bestX, bestRow, bestMerit = candidates[best], rows[best], actualMerit[best]
+                    center = bestX
+
+                onBoundary = (
+                    isclose(candidates[0], localLower) | isclose(candidates[0], localUpper)
+                ).any()
+                if ratio < 0.25:
+                    radius *= contraction
+                elif ratio > 0.75 and onBoundary:
+                    radius = min(radius * expansion, 1.0)
+
+                history.append(
+                    {
+                        "round": iteration,
+                        "radius": radius,
+                        "ratio": ratio,
+                        "error": error,
+                        "merit": bestMerit[2],
+                        "violation": bestMerit[1],
+                    }
+                )
+                if error <= tolerance or radius < minRadius:
+                    break
+
+        self.trustRegionHistory = DataFrame(history)
+        self.optimumViolation = [float(bestMerit[1])]
+
+        data = DataFrame(concatenate(verified), columns=names)
+        data = data.T.drop_duplicates().T
+
+        return [bestX.tolist()], [bestRow[fColumns].tolist()], data
+
+    @staticmethod
+    def _predictExpressions(
+        surrogate: Surrogate,
+        x: ndarray,
+        objectivesBatch: List[Callable],
+        constraintsBatch: List[Callable],
+    ) -> Tuple[ndarray, ndarray]:
+        """Objectives and constraints predicted by the surrogate for a batch of designs."""
+        predictions = surrogate.predictBatch(x)
+        results = {
+            name: predictions[:, i] for i, name in enumerate(surrogate.resultsExpressions)
+        }
+        F = stack([objective(results) for objective in objectivesBatch], axis=1)
+        G = (
+            stack([constraint(results) for constraint in constraintsBatch], axis=1)
+            if constraintsBatch
+            else zeros((len(x), 0))
+        )
+        return F, G
+
+    def optimizeRobust(
+        self,
+        surrogate: Surrogate,
+        tolerances: Dict[str, Tuple[str, float]],
+        optimizerName: str = "nsga3",
+        termination: Tuple[str, int] = ("n_gen", 100),
+        nSamples: int = 1000,
+        measure: str = "meanStd",
+        kappa: float = 1.0,
+        quantile: float = 0.9,
+        reliability: float = 0.95,
+        seed: int = 1,
+        archive: Union[ParetoArchive, None] = None,
+        **kwargs
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        """Optimize the robust objectives of the problem on a surrogate, under manufacturing tolerances.
+
+        Args:
+            surrogate (Surrogate): A trained surrogate of the evaluator.
+            tolerances (Dict[str, Tuple[str, float]]): Distribution of each toleranced parameter, e.g. {"Width": ("normal", 0.1)}.
+            optimizerName (str, optional): Name of the method of Optimizers to use. Defaults to "nsga3".
+            termination (Tuple[str, int], optional): Termination as a pymoo tuple. Defaults to ("n_gen", 100).
+            nSamples (int, optional): Number of perturbed samples of each design. Defaults to 1000.
+            measure (str, optional): Robust measure of the objectives: "mean", "std", "meanStd" or "quantile". Defaults to "meanStd".
+            kappa (float, optional): Weight of the standard deviation in "meanStd". Defaults to 1.0.
+            quantile (float, optional): Quantile of the objectives in "quantile". Defaults to 0.9.
+            reliability (float, optional): Probability with which every constraint must be satisfied. Defaults to 0.95.
+            seed (int, optional): Random seed of the algorithm and of the perturbations. Defaults to 1.
+            archive (Union[ParetoArchive, None], optional): Archive updated after each generation. Defaults to None.
+
+        Returns:
+            Tuple[List[List[float]], List[List[float]], DataFrame]: Best designs, their robust objectives and the history data with the mean and standard deviation of each objective.
+        """
+        if self.nObj > 1 and optimizerName != "nsga3":
+            raise Exception(
+                "Only NSGA3 is supported for multi-objective optimization. Use nsga3 name."
+            )
+
+        problem = RobustProblem(
+            self.problem,
+            surrogate,
+            tolerances,
+            nSamples=nSamples,
+            measure=measure,
+            kappa=kappa,
+            quantile=quantile,
+            reliability=reliability,
+            seed=seed,
+        )
+        if self.problem.isMixed():
+            kwargs.setdefault("repair", self._getRepair())
+        algorithm = self._getMethod(Optimizers, optimizerName)(**kwargs, nObj=self.nObj)
+
+        res = minimize(
+            problem,
+            algorithm,
+            termination=termination,
+            seed=seed,
+            callback=HistCallback(archive=archive),
+            return_least_infeasible=True,
+        )
+
+        self.population = res.pop.get("X", "F", "CV")
+        self.optimumViolation = ravel(res.CV).tolist()
+
+        x = res.X.tolist()
+        f = res.F.tolist()
+
+        if not isinstance(x[0], Iterable):
+            x = [x]
+        if not isinstance(f[0], Iterable):
+            f = [f]
+        x = self._decodeDesigns(x)
+
+        callback = res.algorithm.callback
+        data = concatenate(
+            [concatenate(callback.data["x_hist"]), concatenate(callback.data["r_hist"])],
+            axis=1,
+        )
+        data = DataFrame(data, columns=problem.names)
 
         return x, f, data
 
@@ -74,21 +916,38 @@ class Optimizer(Step):
         self,
         x: List[List[float]],
         simulator: Callable[[Dict[str, float]], Dict[str, float]],
+        stream: Union[ResultsStream, None] = None,
     ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
         f = []
         r = []
+        names = (
+            self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions
+        )
+        if self.problem.isMixed():  # reuse the designs already simulated by the other steps
+            simulator = EvaluationCache.shared(simulator, self.problem)
+            x = self._decodeDesigns(x)
 
         for design in x:
             parameters = {name: value for name, value in zip(self.pNames, design)}
+            start = time()
             results = simulator(parameters)
 
             objs = [obj(results) for obj in self.objectives]
             consts = [constr(results) for constr in self.constraints]
             res = list(results.values()) + objs + consts
 
+            if stream is not None:
+                stream.writeEvaluation(names, list(design) + res, start, time())
+
             f.append(objs)
             r.append(res)
 
+        if stream is not None:
+            stream.flush()
+
         data = concatenate([x, r], axis=1)
         data = DataFrame(
             data,
@@ -102,12 +961,112 @@ class Optimizer(Step):
 
         return x, f, data
 
+    def _mergeRuns(
+        self, runs: list, archive: Union[ParetoArchive, None]
+    ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
+        x = [design for run in runs for design in run[0]]
+        f = [objectives for run in runs for objectives in run[1]]
+        cv = array([violation for run in runs for violation in run[2]], dtype=float)
+        data = concat([run[3] for run in runs], ignore_index=True)
+
+        if archive is not None:
+            archive.insertData(data)
+
+        F = array(f, dtype=float)
+        candidates = (cv <= 0).nonzero()[0]
+        if not len(candidates):
+            candidates = [argmin(cv)]
+        if self.nObj == 1:
+            best = [candidates[argmin(F[candidates, 0])]]
+        else:
+            fronts = nonDominatedSort(DataFrame(F[candidates]), list(range(self.nObj)))
+            best = [c for c, front in zip(candidates, fronts) if front == 0]
+
+        return [x[i] for i in best], [f[i] for i in best], data
+
+    @staticmethod
+    def _getExecutor(parallelization: str):
+        if parallelization == "thread":
+            return ThreadPoolExecutor
+        elif parallelization == "process":
+            return ProcessPoolExecutor
+        raise ValueError("Parallelization must be thread or process.")
+
+    def _getRepair(self) -> MixedVariableRepair:
+        categories = self.problem.getCategories()
+        return MixedVariableRepair(
+            self.problem.getVariableTypes(),
+            [categories.get(name) for name in self.pNames],
+        )
+
+    def _decodeDesigns(self, x: List[List[float]]) -> List[List[float]]:
+        """Snap designs of the relaxed search space to the discrete lattice of mixed-variable problems."""
+        if not self.problem.isMixed():
+            return x
+        return [self.problem.decode(design) for design in x]
+
+    def _historyToData(self, callback: "HistCallback") -> DataFrame:
+        x_hist = self._decodeDesigns(  # e.g. designs of algorithms without repair
+            concatenate(callback.data["x_hist"]).tolist()
+        )
+        r_hist = concatenate(callback.data["r_hist"]).tolist()
+
+        data = concatenate([x_hist, r_hist], axis=1)
+        data = DataFrame(
+            data,
+            columns=self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions,
+        )
+
+        data = data.T.drop_duplicates().T  # drop duplicate columns
+
+        return data
+
+
+def _runOptimization(
+    problem: ProblemConstructor,
+    evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+    optimizerName: str,
+    termination: Tuple[str, int],
+    seed: int,
+    restartX,
+    kwargs: dict,
+):
+    """Run one optimization in a worker, returning best designs, objectives, violations, history and final population."""
+    if restartX is not None:
+        kwargs = dict(kwargs, restartPop=Population.new("X", restartX))
+    optimizer = Optimizer(problem, evaluator)
+    x, f, data = optimizer.optimize(
+        optimizerName=optimizerName, termination=termination, seed=seed, **kwargs
+    )
+    return x, f, optimizer.optimumViolation, data, optimizer.population
+
+
+def _evaluateDesign(
+    evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+    objectives: List[Callable],
+    constraints: List[Callable],
+    pNames: List[str],
+    x: List[float],
+) -> Tuple[List[float], List[float], List[float], float, float, str]:
+    """Evaluate a single design in a worker, returning results, objectives, constraints, timing and the worker name."""
+    start = time()
+    results = evaluator({name: value for name, value in zip(pNames, x)})
+    f = [obj(results) for obj in objectives]
+    g = [constr(results) for constr in constraints]
+    return list(results.values()), f, g, start, time(), workerName()
+
 
 class OptimizationProblem(ElementwiseProblem):
     def __init__(
         self,
         problem: ProblemConstructor,
         evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        stream: Union[ResultsStream, None] = None,
+        lowerBounds: Union[List[float], None] = None,
+        upperBounds: Union[List[float], None] = None,
         **kwargs
     ):
         """Initialize the optimization problem.
@@ -115,9 +1074,19 @@ class OptimizationProblem(ElementwiseProblem):
         Args:
             problem (ProblemConstructor): The problem to be evaluated.
             evaluator (Evaluator): The evaluator to be used.
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
+            lowerBounds (Union[List[float], None], optional): Overrides the lower bounds of the problem, e.g. with a trust region. Defaults to None.
+            upperBounds (Union[List[float], None], optional): Overrides the upper bounds of the problem. Defaults to None.
         """
 
         self._evaluator = evaluator
+        self._stream = stream
+        self._names = (
+            problem.getPnames()
+            + problem.getResultsExpressions()
+            + problem.getObjectivesExpressions()
+            + problem.getConstraintsExpressions()
+        )
 
         self._nvar = problem.getNvar()
         self._nobj = problem.getNobj()
@@ -127,6 +1096,10 @@ class OptimizationProblem(ElementwiseProblem):
         self._objectives = problem.getObjectives()
         self._constraints = problem.getConstraints()
         self._lowerBounds, self._upperBounds = problem.getBounds()
+        if lowerBounds is not None:
+            self._lowerBounds = lowerBounds
+        if upperBounds is not None:
+            self._upperBounds = upperBounds
 
         super().__init__(
             n_var=self._nvar,
@@ -145,12 +1118,18 @@ class OptimizationProblem(ElementwiseProblem):
         """
 
         parameters = {name: value for name, value in zip(self._pnames, x)}
+        start = time()
         results = self._evaluator(parameters)
 
         f = [obj(results) for obj in self._objectives]
         g = [constr(results) for constr in self._constraints]
         r = list(results.values())
 
+        if self._stream is not None:
+            self._stream.writeEvaluation(
+                self._names, list(x) + r + f + g, start, time()
+            )
+
         out["F"] = f
         out["G"] = g
         out["R"] = r + f + g
@@ -159,11 +1138,24 @@ class OptimizationProblem(ElementwiseProblem):
 class HistCallback(Callback):
     """A class to store the all history of the optimization process."""
 
-    def __init__(self) -> None:
+    def __init__(self, archive: Union[ParetoArchive, None] = None) -> None:
         super().__init__()
+        self.archive = archive
         self.data["x_hist"] = []
         self.data["r_hist"] = []
 
     def notify(self, algorithm):
-        self.data["x_hist"].append(algorithm.pop.get("X"))
-        self.data["r_hist"].append(algorithm.pop.get("R"))
+        self.record(algorithm.pop)
+
+    def record(self, pop: Population) -> None:
+        """Store evaluated designs in the history and the archive.
+
+        Args:
+            pop (Population): The evaluated designs.
+        """
+        X = pop.get("X")
+        R = pop.get("R")
+        self.data["x_hist"].append(X)
+        self.data["r_hist"].append(R)
+        if self.archive is not None:
+            self.archive.insertMany(pop.get("F"), hstack([X, R]).tolist(), pop.get("CV"))
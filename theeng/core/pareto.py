@@ -0,0 +1,283 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Union
+
+import numpy as np
+from pandas import DataFrame, Series
+from pymoo.util.nds.non_dominated_sorting import NonDominatedSorting
+
+from theeng.core.problem import ProblemConstructor
+
+
+class ParetoArchive:
+    """An incremental archive of the non-dominated feasible designs found so far.
+
+    For two objectives the front is kept sorted by the first objective, so that dominance checks are
+    binary searches. For more objectives a vectorized comparison against the (small) front is used.
+    """
+
+    def __init__(self, problem: ProblemConstructor) -> None:
+        """Initialize an empty archive.
+
+        Args:
+            problem (ProblemConstructor): The problem whose objectives define dominance.
+        """
+        self.nObj = problem.getNobj()
+        self.objectiveExpressions = problem.getObjectivesExpressions()
+        self.constraintExpressions = problem.getConstraintsExpressions()
+        self.columns = (
+            problem.getPnames()
+            + problem.getResultsExpressions()
+            + problem.getObjectivesExpressions()
+            + problem.getConstraintsExpressions()
+        )
+        self._F = np.empty((0, self.nObj))
+        self._rows = []
+        self._f1 = []  # sorted first objective (two objectives only)
+        self._f2 = []  # matching second objective, strictly decreasing
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def insert(
+        self,
+        f: List[float],
+        row: Union[List[float], None] = None,
+        cv: float = 0.0,
+    ) -> bool:
+        """Insert a design if it is feasible and not dominated, removing the designs it dominates.
+
+        Args:
+            f (List[float]): Objectives of the design.
+            row (Union[List[float], None], optional): Data stored with the design (parameters, results, objectives, constraints). Defaults to None.
+            cv (float, optional): Constraint violation, designs with cv > 0 are rejected. Defaults to 0.0.
+
+        Returns:
+            bool: True if the design entered the archive.
+        """
+        if cv > 0:
+            return False
+        f = np.asarray(f, dtype=float)
+        if self.nObj == 2:
+            return self._insert2d(f, row)
+
+        if len(self._F):
+            if np.any(np.all(self._F <= f, axis=1)):  # dominated or duplicate
+                return False
+            dominated = np.all(f <= self._F, axis=1)
+            if dominated.any():
+                keep = np.flatnonzero(~dominated)
+                self._F = self._F[keep]
+                self._rows = [self._rows[i] for i in keep]
+        self._F = np.vstack([self._F, f])
+        self._rows.append(row)
+        return True
+
+    def insertMany(self, F, rows=None, CV=None) -> int:
+        """Insert a batch of designs.
+
+        Args:
+            F (array_like): Objectives, one row per design.
+            rows (optional): Data stored with each design. Defaults to None.
+            CV (optional): Constraint violation of each design. Defaults to None.
+
+        Returns:
+            int: Number of designs that entered the archive.
+        """
+        F = np.atleast_2d(np.asarray(F, dtype=float))
+        rows = rows if rows is not None else [None] * len(F)
+        CV = np.ravel(CV) if CV is not None else np.zeros(len(F))
+        return sum(self.insert(f, row, cv) for f, row, cv in zip(F, rows, CV))
+
+    def insertData(self, data: DataFrame) -> int:
+        """Insert the designs of a DataFrame laid out as the Sampler or Optimizer data.
+
+        Args:
+            data (DataFrame): The designs.
+
+        Returns:
+            int: Number of designs that entered the archive.
+        """
+        F = data[self.objectiveExpressions].to_numpy(dtype=float)
+        G = data[self.constraintExpressions].to_numpy(dtype=float)
+        CV = np.maximum(G, 0).sum(axis=1)
+        rows = data.reindex(columns=self.columns).values.tolist()
+        return self.insertMany(F, rows, CV)
+
+    def getObjectives(self) -> np.ndarray:
+        """Returns the objectives of the archived designs.
+
+        Returns:
+            np.ndarray: One row per archived design.
+        """
+        if self.nObj == 2:
+            return np.column_stack([self._f1, self._f2]).reshape(-1, 2)
+        return self._F.copy()
+
+    def getData(self) -> DataFrame:
+        """Returns the archived designs in the same layout as the Optimizer data.
+
+        Returns:
+            DataFrame: The non-dominated designs.
+        """
+        data = DataFrame(list(self._rows), columns=self.columns)
+        data = data.T.drop_duplicates().T  # drop duplicate columns
+        return data
+
+    def _insert2d(self, f: np.ndarray, row) -> bool:
+        f1, f2 = float(f[0]), float(f[1])
+        index = bisect_left(self._f1, f1)
+        if index > 0 and self._f2[index - 1] <= f2:  # dominated by a design with smaller f1
+            return False
+        if index < len(self._f1) and self._f1[index] == f1 and self._f2[index] <= f2:
+            return False
+
+        end = index  # the designs dominated by f are contiguous, since f2 decreases along the front
+        while end < len(self._f1) and self._f2[end] >= f2:
+            end += 1
+        self._f1[index:end] = [f1]
+        self._f2[index:end] = [f2]
+        self._rows[index:end] = [row]
+        return True
+
+
+def nonDominatedSort(data: DataFrame, columns: List[str]) -> Series:
+    """Assign every design its non-dominated front (0 being the Pareto front), all columns minimized.
+
+    Two objectives are sorted in O(n log n), more objectives use pymoo's efficient non-dominated sort.
+
+    Args:
+        data (DataFrame): The designs.
+        columns (List[str]): The objective columns.
+
+    Returns:
+        Series: The front of each design, with the index of data.
+    """
+    F = data[columns].to_numpy(dtype=float)
+    ranks = np.empty(len(F), dtype=int)
+
+    if len(F) and F.shape[1] == 2:
+        order = np.lexsort((F[:, 1], F[:, 0]))
+        frontMinF2 = []  # smallest second objective of each front, non-decreasing with the front
+        previous = None
+        for i in order:
+            if previous is not None and np.array_equal(F[i], F[previous]):
+                ranks[i] = ranks[previous]
+                continue
+            front = bisect_right(frontMinF2, F[i, 1])
+            if front == len(frontMinF2):
+                frontMinF2.append(F[i, 1])
+            else:
+                frontMinF2[front] = F[i, 1]
+            ranks[i] = front
+            previous = i
+    elif len(F):
+        for front, members in enumerate(NonDominatedSorting().do(F)):
+            ranks[members] = front
+
+    return Series(ranks, index=data.index, name="Front")
+
+
+def paretoFront(data: DataFrame, columns: List[str]) -> DataFrame:
+    """Returns the non-dominated designs of data.
+
+    Args:
+        data (DataFrame): The designs.
+        columns (List[str]): The objective columns, all minimized.
+
+    Returns:
+        DataFrame: The designs of the first front.
+    """
+    return data[nonDominatedSort(data, columns) == 0]
+
+
+def nonDominatedMask(F) -> np.ndarray:
+    """Flag the non-dominated rows of F, all columns minimized, without the quadratic memory of a full sort.
+
+    Rows are visited by increasing sum of objectives, so that a row can only be dominated by rows already
+    visited, and each row is compared to the front found so far.
+
+    Args:
+        F (array_like): Objectives, one row per design.
+
+    Returns:
+        np.ndarray: A boolean mask of the first front.
+    """
+    F = np.asarray(F, dtype=float)
+    mask = np.zeros(len(F), dtype=bool)
+    if not len(F):
+        return mask
+    if F.shape[1] == 2:
+        order = np.lexsort((F[:, 1], F[:, 0]))
+        previousMin = np.minimum.accumulate(np.append(np.inf, F[order[:-1], 1]))
+        mask[order] = F[order, 1] < previousMin
+        return mask
+
+    front = np.empty((0, F.shape[1]))
+    order = np.argsort(F.sum(axis=1), kind="stable")
+    for start in range(0, len(order), 1024):  # discard most of a block against the front at once
+        block = order[start : start + 1024]
+        dominated = np.any(np.all(front[None, :, :] <= F[block, None, :], axis=2), axis=1)
+        for i in block[~dominated]:
+            if not np.any(np.all(front <= F[i], axis=1)):  # dominated or duplicate
+                front = np.vstack([front, F[i]])
+                mask[i] = True
+    return mask
+
+
+def hypervolume(
+    F, reference, nSamples: int = 100000, seed: int = 1
+) -> float:
+    """Hypervolume dominated by the designs F and bounded by the reference point, all objectives minimized.
+
+    Exact for up to three objectives, estimated by Monte Carlo sampling for more.
+
+    Args:
+        F (array_like): Objectives, one row per design.
+        reference (array_like): The reference (worst) point.
+        nSamples (int, optional): Number of Monte Carlo samples for more than three objectives. Defaults to 100000.
+        seed (int, optional): Random seed of the Monte Carlo estimate. Defaults to 1.
+
+    Returns:
+        float: The hypervolume.
+    """
+    reference = np.asarray(reference, dtype=float)
+    F = np.asarray(F, dtype=float).reshape(-1, len(reference))
+    F = F[np.all(F < reference, axis=1)]
+    if not len(F):
+        return 0.0
+
+    nObj = F.shape[1]
+    if nObj == 1:
+        return float(reference[0] - F[:, 0].min())
+    elif nObj == 2:
+        return _hypervolume2d(F, reference)
+    elif nObj == 3:
+        order = np.argsort(F[:, 2])
+        F = F[order]
+        heights = np.diff(np.append(F[:, 2], reference[2]))
+        return float(
+            sum(
+                _hypervolume2d(F[: i + 1, :2], reference[:2]) * heights[i]
+                for i in range(len(F))
+                if heights[i] > 0
+            )
+        )
+
+    lower = F.min(axis=0)
+    rng = np.random.default_rng(seed)
+    chunkSize = max(1, 10**7 // (len(F) * nObj))
+    dominated = 0
+    for start in range(0, nSamples, chunkSize):
+        samples = lower + rng.random((min(chunkSize, nSamples - start), nObj)) * (
+            reference - lower
+        )
+        dominated += np.count_nonzero(
+            np.any(np.all(F[None, :, :] <= samples[:, None, :], axis=2), axis=1)
+        )
+    return float(np.prod(reference - lower) * dominated / nSamples)
+
+
+def _hypervolume2d(F: np.ndarray, reference: np.ndarray) -> float:
+    F = F[np.lexsort((F[:, 1], F[:, 0]))]
+    previousF2 = np.minimum.accumulate(np.append(reference[1], F[:-1, 1]))
+    return float(np.sum((reference[0] - F[:, 0]) * np.maximum(previousF2 - F[:, 1], 0)))
@@ -1,6 +1,9 @@
 import operator
+from functools import partial
 from typing import Callable, Dict, Iterable, List, Tuple, Union
 
+import numpy as np
+
 
 class ProblemConstructor:
     """The ProblemConstructor class is used to construct the problem to be solved by the optimizer."""
@@ -24,6 +27,8 @@ class ProblemConstructor:
         self.nconst = 0
         self.nvar = 0
         self.pnames = []
+        self.variableTypes = []
+        self.categories = {}
 
     def setObjectives(self, expressions: Dict[str, float]) -> None:
         """Set the objectives of the problem.
@@ -37,8 +42,10 @@ class ProblemConstructor:
         for expression in expressions.keys():
             operands, operations = ProblemConstructor._expressionParser(expression)
             self._objectives.append(
-                lambda results, operands=operands, operations=operations: ProblemConstructor._expressionEvaluator(
-                    results, operands, operations
+                partial(  # a partial rather than a lambda keeps the problem picklable for process pools
+                    ProblemConstructor._expressionEvaluator,
+                    operands=operands,
+                    operations=operations,
                 )
             )
             self.nobj += 1
@@ -57,8 +64,10 @@ class ProblemConstructor:
         for expression in expressions.keys():
             operands, operations = ProblemConstructor._expressionParser(expression)
             self._constraints.append(
-                lambda results, operands=operands, operations=operations: ProblemConstructor._expressionEvaluator(
-                    results, operands, operations
+                partial(
+                    ProblemConstructor._expressionEvaluator,
+                    operands=operands,
+                    operations=operations,
                 )
             )
             self.nconst += 1
@@ -80,12 +89,59 @@ class ProblemConstructor:
             self.boundsExpressions.append(f"{value[0]} <= {key} <= {value[1]}")
             self.nvar += 1
             self.pnames.append(key)
+            self.variableTypes.append("real")
+
+    def setIntegers(self, bounds: Dict[str, Tuple[int, int]]) -> None:
+        """Set integer parameters of the problem (e.g. bolt counts).
+
+        Args:
+            bounds (Dict[str, Tuple[int, int]]): A dictionary of the form {parameter: (lower_bound, upper_bound)}, bounds included.
+        """
+
+        ProblemConstructor._checkBounds(bounds)
+        if not all(
+            float(value).is_integer() for bound in bounds.values() for value in bound
+        ):
+            raise TypeError("The bounds of integer parameters must be integers.")
+
+        for key, value in bounds.items():
+            self._loweBounds.append(int(value[0]))
+            self._upperBounds.append(int(value[1]))
+            self.boundsExpressions.append(f"{value[0]} <= {key} <= {value[1]}, integer")
+            self.nvar += 1
+            self.pnames.append(key)
+            self.variableTypes.append("integer")
+
+    def setCategories(self, categories: Dict[str, Iterable[float]]) -> None:
+        """Set categorical parameters taking values from a numeric catalog (e.g. plate thicknesses or profile sizes).
+
+        The optimizers search between the smallest and largest value of the catalog and every design is snapped to the nearest catalog value.
+
+        Args:
+            categories (Dict[str, Iterable[float]]): A dictionary of the form {parameter: [value1, value2, ...]}.
+        """
+        for key, values in categories.items():
+            if not isinstance(key, str):
+                raise TypeError("The categories keys must be strings.")
+            if not all(isinstance(value, (int, float)) for value in values):
+                raise TypeError("The categories values must be integers or floats.")
+            values = sorted(set(values))
+            if len(values) < 2:
+                raise ValueError("A categorical parameter needs at least two values.")
+
+            self._loweBounds.append(values[0])
+            self._upperBounds.append(values[-1])
+            self.boundsExpressions.append(f"{key} in {values}")
+            self.nvar += 1
+            self.pnames.append(key)
+            self.variableTypes.append("categorical")
+            self.categories[key] = values
 
     def setResults(self, expressions: Dict[str, Union[None, str]]) -> None:
         """Set the results to get from the simulation.
 
         Args:
-            expressions (List[str]): List of results name as set in the FreeCAD spreadsheet.
+            expressions (Dict[str, Union[None, str]]): Results name as set in the FreeCAD spreadsheet with the action to reduce iterable results ("Max", "Min", "Avg" or a percentile such as "P95"), None for scalar results.
         """
         ProblemConstructor._checkExpressions(expressions)  # type: ignore
 
@@ -108,9 +164,70 @@ class ProblemConstructor:
         """
         return self._constraints
 
+    def getObjectivesBatch(self) -> List[Callable[(...), np.ndarray]]:
+        """Returns a list of callables to evaluate the objectives of many designs at once.
+
+        Each callable takes a dictionary of results whose values are arrays (e.g. batch surrogate predictions) and returns an array of the same shape.
+
+        Returns:
+            List[Callable[(...), np.ndarray]]: List of callables to evaluate the objectives of many designs.
+        """
+        return ProblemConstructor._compileBatch(self.objectivesExpressions)
+
+    def getConstraintsBatch(self) -> List[Callable[(...), np.ndarray]]:
+        """Returns a list of callables to evaluate the constraints of many designs at once.
+
+        Returns:
+            List[Callable[(...), np.ndarray]]: List of callables to evaluate the constraints of many designs.
+        """
+        return ProblemConstructor._compileBatch(self.constraintsExpressions)
+
+    def getObjectivesGradients(self) -> List[Callable[(...), np.ndarray]]:
+        """Returns a list of callables to evaluate the gradients of the objectives.
+
+        Each callable takes the results and their gradients with respect to the design parameters, e.g. from Surrogate.generateGradient(), and returns the gradient of the objective.
+
+        Returns:
+            List[Callable[(...), np.ndarray]]: List of callables to evaluate the gradients of the objectives.
+        """
+        return ProblemConstructor._compileGradients(self.objectivesExpressions)
+
+    def getConstraintsGradients(self) -> List[Callable[(...), np.ndarray]]:
+        """Returns a list of callables to evaluate the gradients of the constraints.
+
+        Returns:
+            List[Callable[(...), np.ndarray]]: List of callables to evaluate the gradients of the constraints.
+        """
+        return ProblemConstructor._compileGradients(self.constraintsExpressions)
+
     def getBounds(self) -> Tuple[List[float], List[float]]:
         """Returns the lower and upper bounds of the problem.
 
+        Integer and categorical ranges are widened by half a step on each side, so that once decoded the end
+        values cover as much of the search space as the others.
+
+        Returns:
+            Tuple[List[float], List[float]]: List of lower bounds and list of upper bounds.
+        """
+        if not self.isMixed():
+            return self._loweBounds, self._upperBounds
+        lowerBounds, upperBounds = [], []
+        for name, variableType, lowerBound, upperBound in zip(
+            self.pnames, self.variableTypes, self._loweBounds, self._upperBounds
+        ):
+            if variableType == "integer":
+                lowerBound, upperBound = lowerBound - 0.5, upperBound + 0.5
+            elif variableType == "categorical":
+                catalog = self.categories[name]
+                lowerBound -= (catalog[1] - catalog[0]) / 2
+                upperBound += (catalog[-1] - catalog[-2]) / 2
+            lowerBounds.append(lowerBound)
+            upperBounds.append(upperBound)
+        return lowerBounds, upperBounds
+
+    def getDeclaredBounds(self) -> Tuple[List[float], List[float]]:
+        """Returns the bounds as declared, without the widening of getBounds(): integer bounds and the smallest and largest catalog values.
+
         Returns:
             Tuple[List[float], List[float]]: List of lower bounds and list of upper bounds.
         """
@@ -156,6 +273,67 @@ class ProblemConstructor:
         """
         return self.pnames
 
+    def getVariableTypes(self) -> List[str]:
+        """Returns the type of each parameter: "real", "integer" or "categorical".
+
+        Returns:
+            List[str]: The parameters types.
+        """
+        return self.variableTypes
+
+    def getCategories(self) -> Dict[str, List[float]]:
+        """Returns the catalogs of the categorical parameters.
+
+        Returns:
+            Dict[str, List[float]]: The sorted values of each categorical parameter.
+        """
+        return self.categories
+
+    def isMixed(self) -> bool:
+        """Returns True if any parameter is integer or categorical.
+
+        Returns:
+            bool: True for mixed-variable problems.
+        """
+        return any(variableType != "real" for variableType in self.variableTypes)
+
+    def decode(self, x: Iterable[float]) -> List[float]:
+        """Snap a design to the discrete lattice: integers are rounded and categorical parameters take the nearest catalog value.
+
+        Decoding a decoded design leaves it unchanged.
+
+        Args:
+            x (Iterable[float]): Parameters values in the order of the parameters names.
+
+        Returns:
+            List[float]: The decoded design.
+        """
+        decoded = []
+        for name, variableType, value, lowerBound, upperBound in zip(
+            self.pnames, self.variableTypes, x, self._loweBounds, self._upperBounds
+        ):
+            if variableType == "integer":
+                value = int(min(max(round(value), lowerBound), upperBound))
+            elif variableType == "categorical":
+                catalog = self.categories[name]
+                value = catalog[int(np.argmin(np.abs(np.asarray(catalog) - value)))]
+            decoded.append(value)
+        return decoded
+
+    def decodeParameters(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        """Decode a design given as a dictionary of parameters, see decode().
+
+        Args:
+            parameters (Dict[str, float]): Parameters names and values.
+
+        Returns:
+            Dict[str, float]: The decoded parameters, in the same order.
+        """
+        if not self.isMixed():
+            return parameters
+        byName = dict(zip(self.pnames, self.decode([parameters[name] for name in self.pnames])))
+        return {name: byName.get(name, value) for name, value in parameters.items()}
+
     def getNobj(self) -> int:
         """Returns the number of objectives.
 
@@ -196,6 +374,34 @@ class ProblemConstructor:
         """
         return self.constraintsExpressions
 
+    @staticmethod
+    def _compileBatch(expressions: List[str]) -> List[Callable[(...), np.ndarray]]:
+        batch = []
+        for expression in expressions:
+            operands, operations = ProblemConstructor._expressionParser(expression)
+            batch.append(
+                partial(
+                    ProblemConstructor._expressionEvaluatorBatch,
+                    operands=operands,
+                    operations=operations,
+                )
+            )
+        return batch
+
+    @staticmethod
+    def _compileGradients(expressions: List[str]) -> List[Callable[(...), np.ndarray]]:
+        gradients = []
+        for expression in expressions:
+            operands, operations = ProblemConstructor._expressionParser(expression)
+            gradients.append(
+                partial(
+                    ProblemConstructor._expressionGradient,
+                    operands=operands,
+                    operations=operations,
+                )
+            )
+        return gradients
+
     @staticmethod
     def _expressionParser(expression: str) -> Tuple[List[str], List[str]]:
         """Parse an expression into a list of operands and a list of operations.
@@ -256,6 +462,75 @@ class ProblemConstructor:
             Author: https://stackoverflow.com/users/748858/mgilson
         """
 
+        operands_values = ProblemConstructor._operandsValues(results, operands)
+        return ProblemConstructor._applyOperations(operands_values, operations)
+
+    @staticmethod
+    def _expressionEvaluatorBatch(
+        results: Dict[str, Iterable[float]], operands: List[str], operations: List[str]
+    ) -> np.ndarray:
+        """Evaluate an expression element-wise on arrays of results.
+
+        Args:
+            results (Dict[str, Iterable[float]]): Dictionary of results arrays, all of the same shape.
+            operands (List[str]): List of operands in the expression.
+            operations (List[str]): List of operations in the expression.
+
+        Returns:
+            np.ndarray: Result of the expression for each element.
+        """
+        arrays = {name: np.asarray(values, dtype=float) for name, values in results.items()}
+        operands_values = ProblemConstructor._operandsValues(arrays, operands)
+        value = ProblemConstructor._applyOperations(operands_values, operations, cast=None)
+        shape = np.broadcast_shapes(*(values.shape for values in arrays.values()))
+        return np.broadcast_to(value, shape).astype(float)  # constant expressions
+
+    @staticmethod
+    def _expressionGradient(
+        results: Dict[str, float],
+        jacobian: Dict[str, Iterable[float]],
+        operands: List[str],
+        operations: List[str],
+    ) -> np.ndarray:
+        """Evaluate the gradient of an expression with respect to the design parameters by forward-mode differentiation.
+
+        Args:
+            results (Dict[str, float]): Dictionary of results from the simulator (or surrogate).
+            jacobian (Dict[str, Iterable[float]]): Gradient of each result with respect to the design parameters.
+            operands (List[str]): List of operands in the expression.
+            operations (List[str]): List of operations in the expression.
+
+        Returns:
+            np.ndarray: Gradient of the expression.
+        """
+        nvar = len(next(iter(jacobian.values())))
+        duals = {
+            name: _Dual(results[name], np.asarray(gradient, dtype=float))
+            for name, gradient in jacobian.items()
+            if name in results
+        }
+        operands_values = ProblemConstructor._operandsValues(duals, operands)
+        value = ProblemConstructor._applyOperations(
+            operands_values, operations, cast=None
+        )
+        if isinstance(value, _Dual):
+            return value.gradient
+        return np.zeros(nvar)  # the expression does not depend on any result
+
+    @staticmethod
+    def _operandsValues(results: Dict, operands: List[str]) -> List:
+        """Resolve the operands of an expression to values.
+
+        Args:
+            results (Dict): Dictionary of results, the values may be floats, arrays or dual numbers.
+            operands (List[str]): List of operands in the expression.
+
+        Raises:
+            ValueError: When a operand used in the expression is not known.
+
+        Returns:
+            List: The operands values.
+        """
         operands_values = []
         for operand in operands:
             if operand in results:
@@ -266,7 +541,22 @@ class ProblemConstructor:
                 operands_values.append(float(operand))
             else:
                 raise ValueError(f"Unknown operand {operand}")
+        return operands_values
 
+    @staticmethod
+    def _applyOperations(
+        operands_values: List, operations: List[str], cast: Union[Callable, None] = float
+    ):
+        """Apply the operations of an expression to its operands values, respecting precedence.
+
+        Args:
+            operands_values (List): The operands values.
+            operations (List[str]): List of operations in the expression.
+            cast (Union[Callable, None], optional): Conversion applied to the operands of each operation, None to keep arrays or dual numbers as they are. Defaults to float.
+
+        Returns:
+            Result of the expression.
+        """
         operator_order = (
             "^",
             "*/",
@@ -281,6 +571,7 @@ class ProblemConstructor:
             "^": operator.pow,
         }
 
+        operands_values = list(operands_values)
         operations_copy = operations.copy()
 
         for op in operator_order:  # Loop over precedence levels
@@ -291,9 +582,9 @@ class ProblemConstructor:
                     (i, o) for i, o in enumerate(operations_copy) if o in op
                 )  # Next operator with this precedence
                 operations_copy.pop(idx)  # remove this operator from the operator list
-                values = map(
-                    float, operands_values[idx : idx + 2]
-                )  # here I just assume float for everything
+                values = operands_values[idx : idx + 2]
+                if cast is not None:
+                    values = map(cast, values)
                 value = op_dict[oo](*values)
                 operands_values[idx : idx + 2] = [value]  # clear out those indices
 
@@ -367,3 +658,63 @@ class ProblemConstructor:
             return True
         except ValueError:
             return False
+
+
+class _Dual:
+    """A dual number carrying a value and its gradient, used to differentiate expressions."""
+
+    def __init__(self, value: float, gradient: np.ndarray) -> None:
+        self.value = float(value)
+        self.gradient = gradient
+
+    def __add__(self, other):
+        if isinstance(other, _Dual):
+            return _Dual(self.value + other.value, self.gradient + other.gradient)
+        return _Dual(self.value + other, self.gradient)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, _Dual):
+            return _Dual(self.value - other.value, self.gradient - other.gradient)
+        return _Dual(self.value - other, self.gradient)
+
+    def __rsub__(self, other):
+        return _Dual(other - self.value, -self.gradient)
+
+    def __mul__(self, other):
+        if isinstance(other, _Dual):
+            return _Dual(
+                self.value * other.value,
+                self.gradient * other.value + other.gradient * self.value,
+            )
+        return _Dual(self.value * other, self.gradient * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, _Dual):
+            return _Dual(
+                self.value / other.value,
+                (self.gradient * other.value - other.gradient * self.value)
+                / other.value**2,
+            )
+        return _Dual(self.value / other, self.gradient / other)
+
+    def __rtruediv__(self, other):
+        return _Dual(other / self.value, -other * self.gradient / self.value**2)
+
+    def __pow__(self, other):
+        if isinstance(other, _Dual):
+            value = self.value**other.value
+            gradient = other.value * self.value ** (other.value - 1) * self.gradient
+            if self.value > 0:
+                gradient = gradient + value * np.log(self.value) * other.gradient
+            return _Dual(value, gradient)
+        return _Dual(
+            self.value**other, other * self.value ** (other - 1) * self.gradient
+        )
+
+    def __rpow__(self, other):
+        value = other**self.value
+        return _Dual(value, value * np.log(other) * self.gradient)
@@ -1,13 +1,23 @@
+from bisect import bisect_left, insort
+from heapq import heappush, heapreplace
+from os.path import splitext
+from typing import Iterator, List, Sequence, Union
+
 import numpy as np
-from pandas import DataFrame
+from pandas import DataFrame, read_csv
 
 from theeng.algorithms.rankers import Rankers
 from theeng.core.abstract import Step
+from theeng.core.pareto import ParetoArchive
 from theeng.core.problem import ProblemConstructor
 
 
 class Ranker(Step):
-    def __init__(self, problem: ProblemConstructor, data: DataFrame) -> None:
+    def __init__(
+        self, problem: ProblemConstructor, data: Union[DataFrame, ParetoArchive]
+    ) -> None:
+        if isinstance(data, ParetoArchive):  # rank only the non-dominated designs
+            data = data.getData()
         objectiveExpressions = problem.getObjectivesExpressions()
         constraintsExpressions = problem.getConstraintsExpressions()
         objectiveWeights = problem.getObjectiveWeights()
@@ -51,7 +61,7 @@ class Ranker(Step):
         self.data = data
         self.objectiveWeights = objectiveWeights
 
-    def rank(self, rankingName: str = "topsis"):
+    def rank(self, rankingName: str = "topsis", **kwargs):
         rankingMethod = self._getMethod(
             Rankers,
             rankingName,
@@ -59,5 +69,363 @@ class Ranker(Step):
             data=self.data,
             weights=self.objectiveWeights,
         )
-        data = rankingMethod()
+        data = rankingMethod(**kwargs)
         return data
+
+
+class StreamingRanker:
+    """Rank designs stored in result files too large for memory, reading them in chunks.
+
+    A first pass computes the constraint minima and the objectives bounds of the feasible designs, which fix the
+    normalization and the ideal and anti-ideal points. A second pass scores each chunk and keeps the best designs
+    in a bounded heap, so memory stays constant whatever the size of the histories.
+    """
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        paths: Union[str, List[str]],
+        chunkSize: int = 100000,
+    ) -> None:
+        """Initialize the ranker.
+
+        Args:
+            problem (ProblemConstructor): The problem defining objectives, weights and constraints relaxation.
+            paths (Union[str, List[str]]): Result files, ".csv", ".parquet" or ".arrow" streams, read as one history.
+            chunkSize (int, optional): Number of rows read at once. Defaults to 100000.
+        """
+        objectiveWeights = problem.getObjectiveWeights()
+        if not len(objectiveWeights) == len(problem.getObjectivesExpressions()):
+            raise ValueError("Weights should be the same length as objectives.")
+        if not sum(objectiveWeights) == 1:
+            raise ValueError("Weights should sum up to 1.")
+
+        self.problem = problem
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.chunkSize = chunkSize
+        self.objectiveExpressions = problem.getObjectivesExpressions()
+        self.constraintsExpressions = problem.getConstraintsExpressions()
+        self.objectiveWeights = np.asarray(objectiveWeights, dtype=float)
+        self.constraintsRelaxation = None
+        self.nFeasible = 0
+        self.minimum = None
+        self.maximum = None
+
+    def rank(self, rankingName: str = "topsis", k: int = 100) -> DataFrame:
+        """Rank all the designs and return the k best ones.
+
+        Args:
+            rankingName (str, optional): "topsis" or "simpleAdditive". Defaults to "topsis".
+            k (int, optional): Number of designs returned. Defaults to 100.
+
+        Returns:
+            DataFrame: The k best designs laid out as Ranker.rank(), with their "Score" and "Efficiency" (within the best 20% of all the feasible designs).
+        """
+        if rankingName not in ("topsis", "simpleAdditive"):
+            raise ValueError("Streaming ranking supports topsis and simpleAdditive.")
+        if self.minimum is None:
+            self.computeBounds()
+
+        higherIsBetter = rankingName == "topsis"
+
+        heap = []  # (key, order, row) of the k best designs, worst on top
+        columns = None
+        order = 0
+        for chunk in self._feasibleChunks():
+            if columns is None:  # files may order or extend their columns differently
+                columns = list(chunk.columns)
+            scores = _boundedScores(
+                chunk[self.objectiveExpressions].to_numpy(dtype=float),
+                self.minimum,
+                self.maximum,
+                self.objectiveWeights,
+                rankingName,
+            )
+            keys = np.nan_to_num(scores if higherIsBetter else -scores, nan=-np.inf)
+
+            candidates = np.arange(len(keys))
+            if len(keys) > k:  # only the best k of a chunk can enter the heap
+                candidates = np.argpartition(-keys, k - 1)[:k]
+            rows = chunk.reindex(columns=columns).to_numpy()
+            for i in candidates:
+                item = (keys[i], order + i, rows[i].tolist() + [scores[i]])
+                if len(heap) < k:
+                    heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapreplace(heap, item)
+            order += len(keys)
+
+        if columns is None:
+            return DataFrame(columns=self._columns() + ["Score", "Efficiency"])
+
+        best = sorted(heap, key=lambda item: (-item[0], item[1]))
+        data = DataFrame([item[2] for item in best], columns=columns + ["Score"])
+        data["Efficiency"] = np.arange(len(data)) < int(self.nFeasible * 0.20)
+        return data.sort_values("Score", ascending=True)
+
+    def computeBounds(self) -> None:
+        """First pass over the files: constraints relaxation, number of feasible designs and objectives bounds."""
+        relaxation = list(self.problem.getConstraintsRelaxation())
+        if not len(relaxation) == len(self.constraintsExpressions):
+            raise ValueError(
+                "Constraints relaxation should be the same length as constraints expressions."
+            )
+
+        constraintsMinimum = np.full(len(self.constraintsExpressions), np.inf)
+        for chunk in self._chunks():
+            if len(chunk) and self.constraintsExpressions:
+                values = chunk[self.constraintsExpressions].to_numpy(dtype=float)
+                constraintsMinimum = np.fmin(constraintsMinimum, np.nanmin(values, axis=0))
+        for i, minConstraintViolation in enumerate(constraintsMinimum):
+            if relaxation[i] is not None and relaxation[i] < minConstraintViolation:
+                print(
+                    f"Warning: Relaxation value of {self.constraintsExpressions[i]} is smaller than its minimum, set to {minConstraintViolation}"
+                )
+                relaxation[i] = minConstraintViolation
+        self.constraintsRelaxation = relaxation
+
+        nObj = len(self.objectiveExpressions)
+        self.minimum, self.maximum = np.full(nObj, np.inf), np.full(nObj, -np.inf)
+        self.nFeasible = 0
+        for chunk in self._feasibleChunks():
+            values = chunk[self.objectiveExpressions].to_numpy(dtype=float)
+            self.minimum = np.fmin(self.minimum, values.min(axis=0))
+            self.maximum = np.fmax(self.maximum, values.max(axis=0))
+            self.nFeasible += len(chunk)
+
+    def _feasibleChunks(self) -> Iterator[DataFrame]:
+        for chunk in self._chunks():
+            feasible = np.ones(len(chunk), dtype=bool)
+            for expression, relaxation in zip(
+                self.constraintsExpressions, self.constraintsRelaxation
+            ):
+                if relaxation is not None:
+                    feasible &= chunk[expression].to_numpy(dtype=float) <= relaxation
+            if feasible.any():
+                yield chunk[feasible]
+
+    def _chunks(self) -> Iterator[DataFrame]:
+        needed = self.objectiveExpressions + self.constraintsExpressions
+        for path in self.paths:
+            for chunk in self._readChunks(path):
+                missing = [name for name in needed if name not in chunk.columns]
+                if missing:
+                    raise ValueError(f"Results file {path} lacks the columns {missing}.")
+                yield chunk
+
+    def _readChunks(self, path: str) -> Iterator[DataFrame]:
+        extension = splitext(path)[1].lower()
+        if extension == ".csv":
+            yield from read_csv(path, chunksize=self.chunkSize)
+        elif extension == ".parquet":
+            import pyarrow.parquet as pq  # only needed for Parquet files
+
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=self.chunkSize):
+                yield batch.to_pandas()
+        elif extension in (".arrow", ".arrows"):
+            import pyarrow as pa  # only needed for Arrow streams
+
+            with pa.memory_map(path, "r") as source:
+                for batch in pa.ipc.open_stream(source):
+                    yield batch.to_pandas()
+        else:
+            raise ValueError(
+                f"Unsupported results format {extension}. Use .csv, .parquet or .arrow files."
+            )
+
+    def _columns(self) -> List[str]:
+        return (
+            self.problem.getPnames()
+            + self.problem.getResultsExpressions()
+            + self.objectiveExpressions
+            + self.constraintsExpressions
+        )
+
+
+class IncrementalRanker:
+    """Keep designs ranked while they arrive, e.g. after every batch of an adaptive run.
+
+    The running objectives bounds fix the normalization and the ideal and anti-ideal points. New designs are
+    scored and inserted in a blocked sorted index, O(log n + block size) per design, their objectives and
+    scores appended to arrays growing geometrically, amortized O(1) per design. All the n designs are rescored
+    and re-sorted, O(n log n), only when a new design moves the bounds, which becomes rare as the run
+    proceeds. The best designs are always available.
+    """
+
+    def __init__(self, problem: ProblemConstructor, rankingName: str = "topsis") -> None:
+        """Initialize an empty ranker.
+
+        Args:
+            problem (ProblemConstructor): The problem defining objectives, weights and constraints relaxation.
+            rankingName (str, optional): "topsis" or "simpleAdditive". Defaults to "topsis".
+        """
+        if rankingName not in ("topsis", "simpleAdditive"):
+            raise ValueError("Incremental ranking supports topsis and simpleAdditive.")
+        objectiveWeights = problem.getObjectiveWeights()
+        if not len(objectiveWeights) == len(problem.getObjectivesExpressions()):
+            raise ValueError("Weights should be the same length as objectives.")
+        if not sum(objectiveWeights) == 1:
+            raise ValueError("Weights should sum up to 1.")
+
+        self.rankingName = rankingName
+        self.objectiveExpressions = problem.getObjectivesExpressions()
+        self.constraintsExpressions = problem.getConstraintsExpressions()
+        self.constraintsRelaxation = problem.getConstraintsRelaxation()
+        self.objectiveWeights = np.asarray(objectiveWeights, dtype=float)
+
+        self.columns = None
+        self.minimum = np.full(len(self.objectiveExpressions), np.inf)
+        self.maximum = np.full(len(self.objectiveExpressions), -np.inf)
+        self.nRescores = 0
+        self._rows = []
+        self._values = np.empty((0, len(self.objectiveExpressions)))  # capacity, first len(self) rows used
+        self._scores = np.empty(0)
+        self._index = _SortedBlocks()  # (key, design) sorted from the best design
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def update(self, data: DataFrame) -> int:
+        """Add new designs, discarding those violating the constraints relaxation.
+
+        Args:
+            data (DataFrame): The new designs, laid out as the Sampler or Optimizer data.
+
+        Returns:
+            int: Number of designs added.
+        """
+        feasible = np.ones(len(data), dtype=bool)
+        for expression, relaxation in zip(
+            self.constraintsExpressions, self.constraintsRelaxation
+        ):
+            if relaxation is not None:
+                feasible &= data[expression].to_numpy(dtype=float) <= relaxation
+        data = data[feasible]
+        if not len(data):
+            return 0
+        if self.columns is None:
+            self.columns = list(data.columns)
+
+        values = data[self.objectiveExpressions].to_numpy(dtype=float)
+        minimum = np.fmin(self.minimum, np.nanmin(values, axis=0))
+        maximum = np.fmax(self.maximum, np.nanmax(values, axis=0))
+        boundsChanged = not (
+            np.array_equal(minimum, self.minimum) and np.array_equal(maximum, self.maximum)
+        )
+        self.minimum, self.maximum = minimum, maximum
+
+        start = len(self._rows)
+        self._rows.extend(data[self.columns].values.tolist())
+        self._reserve(len(self._rows))
+        self._values[start : len(self._rows)] = values
+        if boundsChanged:
+            self._rescore()
+        else:
+            scores = self._score(values)
+            self._scores[start : len(self._rows)] = scores
+            for design, key in enumerate(self._keys(scores).tolist(), start):
+                self._index.insert((key, design))
+        return len(data)
+
+    def top(self, k: int = 10) -> DataFrame:
+        """Returns the current best designs.
+
+        Args:
+            k (int, optional): Number of designs. Defaults to 10.
+
+        Returns:
+            DataFrame: The k best designs, best first, with their "Score" and "Efficiency" (within the best 20% of all the designs).
+        """
+        designs = [design for _, design in self._index.head(k)]
+        data = DataFrame(
+            [self._rows[design] for design in designs], columns=self.columns
+        )
+        data["Score"] = self._scores[designs]
+        data["Efficiency"] = np.arange(len(designs)) < int(len(self) * 0.20)
+        return data
+
+    def _reserve(self, size: int) -> None:
+        """Grow the objectives and scores arrays to hold size designs, at least doubling their capacity."""
+        capacity = len(self._scores)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        values = np.empty((capacity, self._values.shape[1]))
+        values[: len(self._values)] = self._values
+        scores = np.empty(capacity)
+        scores[: len(self._scores)] = self._scores
+        self._values, self._scores = values, scores
+
+    def _rescore(self) -> None:
+        n = len(self._rows)
+        scores = self._score(self._values[:n])
+        self._scores[:n] = scores
+        keys = self._keys(scores)
+        self._index = _SortedBlocks(sorted(zip(keys.tolist(), range(n))))
+        self.nRescores += 1
+
+    def _score(self, values: np.ndarray) -> np.ndarray:
+        return _boundedScores(
+            values, self.minimum, self.maximum, self.objectiveWeights, self.rankingName
+        )
+
+    def _keys(self, scores: np.ndarray) -> np.ndarray:
+        """Sort keys, smallest for the best design and undefined scores last."""
+        keys = -scores if self.rankingName == "topsis" else scores
+        return np.nan_to_num(keys, nan=np.inf)
+
+
+class _SortedBlocks:
+    """A sorted list split in blocks of at most 2 * blockSize items.
+
+    An insertion bisects the blocks last items, then inserts in one block, shifting at most 2 * blockSize
+    items instead of the whole list: O(log n + blockSize). A full block is split in two, which shifts the
+    n / blockSize blocks once every blockSize insertions.
+    """
+
+    def __init__(self, items: Sequence = (), blockSize: int = 512) -> None:
+        self.blockSize = blockSize
+        self._blocks = [
+            list(items[i : i + blockSize]) for i in range(0, len(items), blockSize)
+        ]
+        self._lasts = [block[-1] for block in self._blocks]
+
+    def insert(self, item) -> None:
+        if not self._blocks:
+            self._blocks.append([item])
+            self._lasts.append(item)
+            return
+        b = min(bisect_left(self._lasts, item), len(self._blocks) - 1)
+        block = self._blocks[b]
+        insort(block, item)
+        self._lasts[b] = block[-1]
+        if len(block) > 2 * self.blockSize:
+            half = len(block) // 2
+            self._blocks[b : b + 1] = [block[:half], block[half:]]
+            self._lasts[b : b + 1] = [block[half - 1], block[-1]]
+
+    def head(self, k: int) -> List:
+        """Returns the k smallest items."""
+        items = []
+        for block in self._blocks:
+            if len(items) >= k:
+                break
+            items.extend(block[: k - len(items)])
+        return items
+
+
+def _boundedScores(
+    values: np.ndarray,
+    minimum: np.ndarray,
+    maximum: np.ndarray,
+    weights: np.ndarray,
+    rankingName: str,
+) -> np.ndarray:
+    """TOPSIS or simple additive scores of objectives normalized by known bounds, as Rankers computes them on the whole data."""
+    weightedNormData = (values - minimum) / (maximum - minimum) * weights
+    if rankingName == "simpleAdditive":
+        return weightedNormData.sum(axis=1)
+    weightedBounds = np.stack([np.zeros_like(weights), weights])
+    return Rankers._topsisScores(
+        weightedNormData, weightedBounds.min(axis=0), weightedBounds.max(axis=0)
+    )
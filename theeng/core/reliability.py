@@ -0,0 +1,384 @@
+from typing import Callable, Dict, Tuple, Union
+
+import numpy as np
+from scipy.stats import norm
+
+from theeng.core.problem import ProblemConstructor
+from theeng.core.surrogate import Surrogate
+
+
+class ReliabilityAnalysis:
+    """Failure probability of the constraints of a design under random parameters, computed on a surrogate.
+
+    The toleranced parameters are mapped to independent standard normal variables u, a constraint fails
+    where it is positive. FORM searches the most probable failure point with the HL-RF iteration, SORM
+    corrects it with the curvatures of the limit state (Breitung) and adaptive importance sampling samples
+    around the design point. Every step predicts its designs in a single surrogate batch, so probabilities
+    down to 1e-6 take seconds.
+    """
+
+    distributions = ("normal", "uniform", "lognormal")
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        surrogate: Surrogate,
+        tolerances: Dict[str, Tuple[str, float]],
+        step: float = 1e-4,
+    ) -> None:
+        """Initialize the analysis.
+
+        Args:
+            problem (ProblemConstructor): The problem defining parameters and constraints.
+            surrogate (Surrogate): A trained surrogate of the evaluator.
+            tolerances (Dict[str, Tuple[str, float]]): Distribution of each random parameter around its nominal value, e.g. {"Width": ("normal", 0.1)} with the standard deviation, ("uniform", 0.2) with the half width, or ("lognormal", 0.05) with the standard deviation of the logarithm. Other parameters are exact.
+            step (float, optional): Finite difference step in standard normal space. Defaults to 1e-4.
+
+        Raises:
+            ValueError: If a distribution or a parameter name is unknown.
+        """
+        self.problem = problem
+        self.surrogate = surrogate
+        self.step = step
+        self.pNames = problem.getPnames()
+        self.constraintExpressions = problem.getConstraintsExpressions()
+        self.constraintsBatch = problem.getConstraintsBatch()
+
+        for name, (distribution, _) in tolerances.items():
+            if name not in self.pNames:
+                raise ValueError(f"Parameter {name} is not defined in the problem.")
+            if distribution not in ReliabilityAnalysis.distributions:
+                raise ValueError(
+                    f"Distribution must be one of {ReliabilityAnalysis.distributions}."
+                )
+        self.tolerances = tolerances
+        self.randomNames = list(tolerances.keys())
+        self._columns = [self.pNames.index(name) for name in self.randomNames]
+
+    def form(
+        self,
+        design: Dict[str, float],
+        constraint: Union[str, None] = None,
+        maxIter: int = 100,
+        tolerance: float = 1e-6,
+    ) -> Dict[str, object]:
+        """First order reliability method: the HL-RF search of the design point.
+
+        Args:
+            design (Dict[str, float]): Nominal design parameters.
+            constraint (Union[str, None], optional): Constraint expression. Defaults to the first constraint.
+            maxIter (int, optional): Maximum number of iterations. Defaults to 100.
+            tolerance (float, optional): Convergence tolerance on the design point in standard normal space. Defaults to 1e-6.
+
+        Returns:
+            Dict[str, object]: The reliability index "beta", failure probability "pf", design point in parameters "designPoint" and standard normal "u" space, sensitivities "alpha", "converged" and "nEvaluations".
+        """
+        limitState = self._limitState(design, constraint)
+        m = len(self.randomNames)
+        u = np.zeros(m)
+        g0 = None
+        nEvaluations = 0
+        converged = False
+        for _ in range(maxIter):
+            g, gradient = self._gradient(limitState, u)
+            nEvaluations += 2 * m + 1
+            if g0 is None:
+                g0 = g
+                scale = abs(g) + 1e-12
+            norm2 = gradient @ gradient
+            if norm2 == 0:
+                break
+            uNew = (gradient @ u - g) / norm2 * gradient
+            if np.linalg.norm(uNew - u) < tolerance * max(1, np.linalg.norm(u)) and abs(g) < 1e-3 * scale:
+                u = uNew
+                converged = True
+                break
+            u = uNew
+
+        g, gradient = self._gradient(limitState, u)
+        nEvaluations += 2 * m + 1
+        beta = float(np.linalg.norm(u)) * (1 if g0 <= 0 else -1)  # negative when the nominal design fails
+        alpha = gradient / (np.linalg.norm(gradient) or 1)
+        return {
+            "beta": beta,
+            "pf": float(norm.cdf(-beta)),
+            "designPoint": dict(zip(self.pNames, self._toParameters(design, u[None])[0].tolist())),
+            "u": u,
+            "alpha": dict(zip(self.randomNames, alpha.tolist())),
+            "converged": converged,
+            "nEvaluations": nEvaluations,
+        }
+
+    def sorm(
+        self,
+        design: Dict[str, float],
+        constraint: Union[str, None] = None,
+        formResult: Union[Dict[str, object], None] = None,
+    ) -> Dict[str, object]:
+        """Second order reliability method: Breitung's correction of FORM with the principal curvatures at the design point.
+
+        Args:
+            design (Dict[str, float]): Nominal design parameters.
+            constraint (Union[str, None], optional): Constraint expression. Defaults to the first constraint.
+            formResult (Union[Dict[str, object], None], optional): A previous form() result of the same design and constraint. Defaults to None.
+
+        Returns:
+            Dict[str, object]: The FORM result with the SORM "pf" (nan where Breitung's formula does not apply) and the "curvatures".
+        """
+        result = dict(formResult or self.form(design, constraint))
+        limitState = self._limitState(design, constraint)
+        u = np.asarray(result["u"], dtype=float)
+        m = len(u)
+
+        _, gradient = self._gradient(limitState, u)
+        h = self.step
+        offsets = np.concatenate([np.eye(m) * h, -np.eye(m) * h])
+        gradients = np.array([self._gradient(limitState, u + offset)[1] for offset in offsets])
+        hessian = (gradients[:m] - gradients[m:]) / (2 * h)
+        hessian = (hessian + hessian.T) / 2
+
+        gradientNorm = np.linalg.norm(gradient) or 1
+        alpha = gradient / gradientNorm
+        basis, _ = np.linalg.qr(np.column_stack([alpha, np.eye(m)]))
+        tangent = basis[:, 1:m]
+        curvatures = np.linalg.eigvalsh(-tangent.T @ hessian @ tangent / gradientNorm)
+
+        beta = result["beta"]
+        factors = 1 + beta * curvatures
+        pf = (
+            float(norm.cdf(-beta) * np.prod(factors**-0.5))
+            if np.all(factors > 0)
+            else np.nan
+        )
+        result.update(
+            pf=pf,
+            curvatures=curvatures,
+            nEvaluations=result["nEvaluations"] + 2 * m * (2 * m + 1) + 2 * m + 1,
+        )
+        return result
+
+    def importanceSampling(
+        self,
+        design: Dict[str, float],
+        constraint: Union[str, None] = None,
+        center: Union[np.ndarray, None] = None,
+        nSamples: int = 10000,
+        maxRounds: int = 20,
+        targetCov: float = 0.05,
+        seed: int = 1,
+    ) -> Dict[str, object]:
+        """Adaptive importance sampling around the design point.
+
+        Each round samples a normal density centered on the current center, estimates the failure probability with
+        the likelihood ratio weights, and moves the center and spread to the weighted mean and standard deviation of
+        its failures (cross-entropy update), so that failure regions on several sides of the design point are covered.
+        The estimates of the rounds are combined by inverse variance until their coefficient of variation reaches targetCov.
+
+        Args:
+            design (Dict[str, float]): Nominal design parameters.
+            constraint (Union[str, None], optional): Constraint expression. Defaults to the first constraint.
+            center (Union[np.ndarray, None], optional): Initial center in standard normal space. Defaults to the FORM design point.
+            nSamples (int, optional): Samples per round, predicted in one batch. Defaults to 10000.
+            maxRounds (int, optional): Maximum number of rounds. Defaults to 20.
+            targetCov (float, optional): Target coefficient of variation of the estimate. Defaults to 0.05.
+            seed (int, optional): Random seed. Defaults to 1.
+
+        Returns:
+            Dict[str, object]: The failure probability "pf", its coefficient of variation "cov", the final "center" and "spread" and "nEvaluations".
+        """
+        limitState = self._limitState(design, constraint)
+        nEvaluations = 0
+        if center is None:
+            formResult = self.form(design, constraint)
+            center = formResult["u"]
+            nEvaluations += formResult["nEvaluations"]
+        center = np.asarray(center, dtype=float)
+        spread = np.ones_like(center)
+        rng = np.random.default_rng(seed)
+
+        estimates, variances = [], []
+        pf, cov = np.nan, np.inf
+        for _ in range(maxRounds):
+            z = rng.standard_normal((nSamples, len(center)))
+            u = center + spread * z
+            failed = limitState(u) > 0
+            nEvaluations += nSamples
+            logRatio = -0.5 * (u * u).sum(axis=1) + 0.5 * (z * z).sum(axis=1) + np.log(spread).sum()
+            weights = np.exp(logRatio) * failed
+            estimate = weights.mean()
+            variance = weights.var() / nSamples
+            if estimate > 0:
+                estimates.append(estimate)
+                variances.append(max(variance, 1e-300))
+                center = (weights[:, None] * u).sum(axis=0) / weights.sum()
+                spread = np.sqrt((weights[:, None] * (u - center) ** 2).sum(axis=0) / weights.sum())
+                spread = np.clip(spread, 0.5, 3.0)
+
+            if len(estimates) > 1:  # the first round only adapts the density
+                inverse = 1 / np.array(variances[1:])
+                pf = float((np.array(estimates[1:]) * inverse).sum() / inverse.sum())
+                cov = float(np.sqrt(1 / inverse.sum()) / pf)
+                if cov <= targetCov:
+                    break
+            elif estimates:
+                pf = estimates[0]
+
+        return {
+            "pf": 0.0 if not estimates else pf,
+            "cov": cov,
+            "center": center,
+            "spread": spread,
+            "nEvaluations": nEvaluations,
+        }
+
+    def failureProbability(
+        self,
+        design: Dict[str, float],
+        constraint: Union[str, None] = None,
+        method: str = "form",
+        **kwargs
+    ) -> Dict[str, object]:
+        """Failure probability of a constraint with the given method.
+
+        Args:
+            design (Dict[str, float]): Nominal design parameters.
+            constraint (Union[str, None], optional): Constraint expression. Defaults to the first constraint.
+            method (str, optional): "form", "sorm" or "importanceSampling". Defaults to "form".
+
+        Raises:
+            ValueError: If the method is unknown.
+
+        Returns:
+            Dict[str, object]: The result of the method, always holding "pf".
+        """
+        if method not in ("form", "sorm", "importanceSampling"):
+            raise ValueError("Method must be form, sorm or importanceSampling.")
+        return getattr(self, method)(design, constraint, **kwargs)
+
+    def verify(
+        self,
+        formResult: Dict[str, object],
+        simulator: Callable[[Dict[str, float]], Dict[str, float]],
+        constraint: Union[str, None] = None,
+    ) -> Dict[str, float]:
+        """Simulate the design point of a FORM result, where the constraint should be zero if the surrogate is accurate.
+
+        Args:
+            formResult (Dict[str, object]): A form() or sorm() result.
+            simulator (Callable[[Dict[str, float]], Dict[str, float]]): The real evaluator.
+            constraint (Union[str, None], optional): Constraint expression of the result. Defaults to the first constraint.
+
+        Returns:
+            Dict[str, float]: The "predicted" and "simulated" constraint at the design point and their "error".
+        """
+        index = self._constraintIndex(constraint)
+        designPoint = formResult["designPoint"]
+        results = simulator(dict(designPoint))
+        simulated = float(self.problem.getConstraints()[index](results))
+        x = np.array([[designPoint[name] for name in self.pNames]], dtype=float)
+        predicted = float(self._constraintValues(x, index)[0])
+        return {
+            "predicted": predicted,
+            "simulated": simulated,
+            "error": simulated - predicted,
+        }
+
+    def _limitState(
+        self, design: Dict[str, float], constraint: Union[str, None]
+    ) -> Callable[[np.ndarray], np.ndarray]:
+        """The constraint of the design as a vectorized function of the standard normal variables."""
+        index = self._constraintIndex(constraint)
+        return lambda u: self._constraintValues(
+            self._toParameters(design, np.atleast_2d(u)), index
+        )
+
+    def _gradient(
+        self, limitState: Callable[[np.ndarray], np.ndarray], u: np.ndarray
+    ) -> Tuple[float, np.ndarray]:
+        """Value and central difference gradient of the limit state, in a single batch."""
+        m = len(u)
+        offsets = np.concatenate([np.zeros((1, m)), np.eye(m) * self.step, -np.eye(m) * self.step])
+        values = limitState(u + offsets)
+        return float(values[0]), (values[1 : m + 1] - values[m + 1 :]) / (2 * self.step)
+
+    def _toParameters(self, design: Dict[str, float], u: np.ndarray) -> np.ndarray:
+        """Map standard normal variables (n, nRandom) to designs (n, nVar)."""
+        x = np.tile(np.array([design[name] for name in self.pNames], dtype=float), (len(u), 1))
+        for k, (name, column) in enumerate(zip(self.randomNames, self._columns)):
+            distribution, scale = self.tolerances[name]
+            if distribution == "normal":
+                x[:, column] += scale * u[:, k]
+            elif distribution == "uniform":
+                x[:, column] += scale * (2 * norm.cdf(u[:, k]) - 1)
+            else:
+                x[:, column] *= np.exp(scale * u[:, k])
+        return x
+
+    def _constraintValues(self, x: np.ndarray, index: int) -> np.ndarray:
+        predictions = self.surrogate.predictBatch(x)
+        results = {
+            name: predictions[:, i]
+            for i, name in enumerate(self.surrogate.resultsExpressions)
+        }
+        return np.broadcast_to(self.constraintsBatch[index](results), (len(x),))
+
+    def _constraintIndex(self, constraint: Union[str, None]) -> int:
+        if not self.constraintExpressions:
+            raise ValueError("The problem has no constraints.")
+        if constraint is None:
+            return 0
+        if constraint not in self.constraintExpressions:
+            raise ValueError(f"Constraint {constraint} is not defined in the problem.")
+        return self.constraintExpressions.index(constraint)
+
+
+class ReliabilityEvaluator:
+    """An evaluator adding the reliability of constraints to the results, to constrain it in the Optimizer.
+
+    The reliability index beta is returned rather than the failure probability, being better scaled for
+    optimizers: a target pf of 1e-6 reads as the constraint "4.75-betaStress" on the result "betaStress".
+    """
+
+    def __init__(
+        self,
+        analysis: ReliabilityAnalysis,
+        names: Dict[str, str],
+        evaluator: Union[Callable[[Dict[str, float]], Dict[str, float]], None] = None,
+        method: str = "form",
+        output: str = "beta",
+    ) -> None:
+        """Initialize the evaluator.
+
+        Args:
+            analysis (ReliabilityAnalysis): The reliability analysis.
+            names (Dict[str, str]): Name of the added result for each analysed constraint expression, e.g. {"betaStress": "stress-200"}.
+            evaluator (Union[Callable[[Dict[str, float]], Dict[str, float]], None], optional): Evaluator of the other results. Defaults to None (the surrogate of the analysis).
+            method (str, optional): Method of ReliabilityAnalysis.failureProbability. Defaults to "form".
+            output (str, optional): "beta" for the reliability index, "pf" for the failure probability. Defaults to "beta".
+        """
+        if output not in ("beta", "pf"):
+            raise ValueError("Output must be beta or pf.")
+        self.analysis = analysis
+        self.names = names
+        self.evaluator = evaluator
+        self.method = method
+        self.output = output
+
+    def __call__(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        if self.evaluator is not None:
+            results = dict(self.evaluator(parameters))
+        else:
+            surrogate = self.analysis.surrogate
+            prediction = surrogate.predictBatch([list(parameters.values())])[0]
+            results = dict(zip(surrogate.resultsExpressions, prediction.tolist()))
+
+        for name, constraint in self.names.items():
+            result = self.analysis.failureProbability(parameters, constraint, self.method)
+            pf = float(np.clip(result["pf"], 1e-300, 1.0)) if np.isfinite(result["pf"]) else 1.0
+            if self.output == "pf":
+                results[name] = pf
+            elif self.method == "form":
+                results[name] = result["beta"]
+            else:  # generalized reliability index
+                results[name] = float(-norm.ppf(pf))
+        return results
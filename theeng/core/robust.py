@@ -0,0 +1,169 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pymoo.core.problem import Problem
+
+from theeng.core.problem import ProblemConstructor
+from theeng.core.surrogate import Surrogate
+
+
+class RobustProblem(Problem):
+    """A vectorized pymoo problem whose objectives and constraints are statistics over manufacturing tolerances.
+
+    Every design is expanded into nSamples perturbed designs, the whole population is predicted by the
+    surrogate in a single batch, and the objectives are summarized by their mean, standard deviation or
+    quantile. Constraints become chance constraints: their reliability quantile must not be positive.
+    The perturbations are drawn once (common random numbers), so that designs are compared on the same
+    samples and the robust objectives stay smooth along the optimization.
+    """
+
+    measures = ("mean", "std", "meanStd", "quantile")
+    distributions = ("normal", "uniform", "triangular")
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        surrogate: Surrogate,
+        tolerances: Dict[str, Tuple[str, float]],
+        nSamples: int = 1000,
+        measure: str = "meanStd",
+        kappa: float = 1.0,
+        quantile: float = 0.9,
+        reliability: float = 0.95,
+        seed: int = 1,
+        chunkSize: int = 200000,
+    ):
+        """Initialize the robust problem.
+
+        Args:
+            problem (ProblemConstructor): The problem to be optimized.
+            surrogate (Surrogate): A trained surrogate of the evaluator.
+            tolerances (Dict[str, Tuple[str, float]]): Distribution of each toleranced parameter, e.g. {"Width": ("normal", 0.1)} with the standard deviation, or ("uniform", 0.2) and ("triangular", 0.2) with the half width. Other parameters are exact.
+            nSamples (int, optional): Number of perturbed samples of each design. Defaults to 1000.
+            measure (str, optional): Robust measure of the objectives: "mean", "std", "meanStd" (mean + kappa * std) or "quantile". Defaults to "meanStd".
+            kappa (float, optional): Weight of the standard deviation in "meanStd". Defaults to 1.0.
+            quantile (float, optional): Quantile of the objectives in "quantile". Defaults to 0.9.
+            reliability (float, optional): Probability with which every constraint must be satisfied. Defaults to 0.95.
+            seed (int, optional): Random seed of the perturbations. Defaults to 1.
+            chunkSize (int, optional): Largest number of perturbed designs predicted at once, bounding memory. Defaults to 200000.
+
+        Raises:
+            ValueError: If the measure, a distribution or a parameter name is unknown.
+        """
+        if measure not in RobustProblem.measures:
+            raise ValueError(f"Measure must be one of {RobustProblem.measures}.")
+
+        self.pNames = problem.getPnames()
+        self.objectiveExpressions = problem.getObjectivesExpressions()
+        self.constraintExpressions = problem.getConstraintsExpressions()
+        self.objectivesBatch = problem.getObjectivesBatch()
+        self.constraintsBatch = problem.getConstraintsBatch()
+        self.surrogate = surrogate
+        self.nSamples = nSamples
+        self.measure = measure
+        self.kappa = kappa
+        self.quantile = quantile
+        self.reliability = reliability
+        self.chunkSize = chunkSize
+        self.perturbations = RobustProblem._perturbations(
+            self.pNames, tolerances, nSamples, seed
+        )
+        self.names = (
+            self.pNames
+            + [f"mean {name}" for name in self.objectiveExpressions]
+            + [f"std {name}" for name in self.objectiveExpressions]
+            + self.objectiveExpressions
+            + self.constraintExpressions
+        )
+
+        lowerBounds, upperBounds = problem.getBounds()
+        super().__init__(
+            n_var=problem.getNvar(),
+            n_obj=problem.getNobj(),
+            n_constr=problem.getNconst(),
+            xl=lowerBounds,
+            xu=upperBounds,
+        )
+
+    def _evaluate(self, x, out: dict, *args, **kwargs):
+        """Evaluate the robust objectives and chance constraints of a population.
+
+        Args:
+            x (ndarray): Designs (nDesigns, nVar).
+            out (dict): dictionary containing the robust objectives and constraints.
+        """
+        F, G = self.statistics(x)
+        mean, std = F.mean(axis=1), F.std(axis=1)
+
+        if self.measure == "mean":
+            f = mean
+        elif self.measure == "std":
+            f = std
+        elif self.measure == "meanStd":
+            f = mean + self.kappa * std
+        else:
+            f = np.quantile(F, self.quantile, axis=1)
+        g = np.quantile(G, self.reliability, axis=1)
+
+        out["F"] = f
+        out["G"] = g
+        out["R"] = np.hstack([mean, std, f, g])
+
+    def statistics(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Objectives and constraints of the perturbed samples of each design.
+
+        Args:
+            x (ndarray): Designs (nDesigns, nVar).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Objectives (nDesigns, nSamples, nObj) and constraints (nDesigns, nSamples, nConst).
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        perturbed = (x[:, None, :] + self.perturbations[None, :, :]).reshape(-1, x.shape[1])
+
+        predictions = np.concatenate(
+            [
+                self.surrogate.predictBatch(perturbed[start : start + self.chunkSize])
+                for start in range(0, len(perturbed), self.chunkSize)
+            ]
+        )
+        results = {
+            name: predictions[:, i]
+            for i, name in enumerate(self.surrogate.resultsExpressions)
+        }
+        shape = (len(x), self.nSamples, -1)
+        F = RobustProblem._stack(self.objectivesBatch, results, len(perturbed))
+        G = RobustProblem._stack(self.constraintsBatch, results, len(perturbed))
+        return F.reshape(shape), G.reshape(shape)
+
+    @staticmethod
+    def _stack(expressions: List, results: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        if not expressions:
+            return np.zeros((n, 0))
+        return np.stack([expression(results) for expression in expressions], axis=1)
+
+    @staticmethod
+    def _perturbations(
+        pNames: List[str],
+        tolerances: Dict[str, Tuple[str, float]],
+        nSamples: int,
+        seed: int,
+    ) -> np.ndarray:
+        """Draw the perturbations (nSamples, nVar) shared by all the designs."""
+        rng = np.random.default_rng(seed)
+        perturbations = np.zeros((nSamples, len(pNames)))
+        for name, (distribution, scale) in tolerances.items():
+            if name not in pNames:
+                raise ValueError(f"Parameter {name} is not defined in the problem.")
+            column = pNames.index(name)
+            if distribution == "normal":
+                perturbations[:, column] = rng.normal(0.0, scale, nSamples)
+            elif distribution == "uniform":
+                perturbations[:, column] = rng.uniform(-scale, scale, nSamples)
+            elif distribution == "triangular":
+                perturbations[:, column] = rng.triangular(-scale, 0.0, scale, nSamples)
+            else:
+                raise ValueError(
+                    f"Distribution must be one of {RobustProblem.distributions}."
+                )
+        return perturbations
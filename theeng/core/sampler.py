@@ -1,5 +1,6 @@
 from collections import defaultdict
-from typing import Callable, Dict, List, Tuple
+from time import time
+from typing import Callable, Dict, List, Tuple, Union
 
 from numpy import concatenate
 from pandas import DataFrame
@@ -7,7 +8,9 @@ from scipy.stats import qmc
 
 from theeng.algorithms.samplers import Samplers
 from theeng.core.abstract import Step
+from theeng.core.cache import NeighborIndex
 from theeng.core.problem import ProblemConstructor
+from theeng.core.stream import ResultsStream
 
 
 class Sampler(Step):
@@ -19,13 +22,29 @@ class Sampler(Step):
         super().__init__(problem, evaluator)
 
     def sample(
-        self, samplerName: str = "latinHypercube", nSamples: int = 50
+        self,
+        samplerName: str = "latinHypercube",
+        nSamples: int = 50,
+        stream: Union[ResultsStream, None] = None,
+        neighbors: Union[NeighborIndex, None] = None,
     ) -> Tuple[List[List[float]], List[List[float]], DataFrame]:
-        problem = SamplingProblem(self.problem, self.evaluator)
+        problem = SamplingProblem(self.problem, self.evaluator, stream=stream)
         samplerMethod = self._getMethod(Samplers, samplerName, nVar=self.nVar)()
 
         samp = samplerMethod.random(n=nSamples)
         x = qmc.scale(samp, self.lowerBounds, self.upperBounds).tolist()
+        if self.problem.isMixed():
+            x = [self.problem.decode(design) for design in x]
+        names = (
+            self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions
+        )
+        if neighbors is not None:  # skip designs already evaluated and near-duplicates
+            x = [design for design, new in zip(x, neighbors.isNew(x)) if new]
+            if not x:
+                return [], [], DataFrame(columns=list(dict.fromkeys(names)))
 
         out = defaultdict(list)
         res = problem._evaluate(x, out)  # type: ignore
@@ -34,16 +53,14 @@ class Sampler(Step):
         r = res["R"]
 
         data = concatenate([x, r], axis=1)
-        data = DataFrame(
-            data,
-            columns=self.pNames
-            + self.resultsExpressions
-            + self.objectiveExpressions
-            + self.constraintExpressions,
-        )
+        data = DataFrame(data, columns=names)
 
         data = data.T.drop_duplicates().T
 
+        if neighbors is not None:  # unless the index evaluated them itself, index the new designs
+            notIndexed = neighbors.isNew(x, tolerance=0.0)
+            neighbors.addData(data[notIndexed])
+
         return x, f, data
 
 
@@ -52,14 +69,23 @@ class SamplingProblem:
         self,
         problem: ProblemConstructor,
         evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+        stream: Union[ResultsStream, None] = None,
     ):
         """Initialize the sampling problem.
 
         Args:
             problem (ProblemConstructor): The problem to be evaluated.
             evaluator (Evaluator): The evaluator to be used.
+            stream (Union[ResultsStream, None], optional): Sink receiving each evaluation as soon as it completes. Defaults to None.
         """
         self._evaluator = evaluator
+        self._stream = stream
+        self._names = (
+            problem.getPnames()
+            + problem.getResultsExpressions()
+            + problem.getObjectivesExpressions()
+            + problem.getConstraintsExpressions()
+        )
 
         self._nVar = problem.getNvar()
         self._pNames = problem.getPnames()
@@ -86,12 +112,18 @@ class SamplingProblem:
 
         for sample in x:
             parameters = {name: value for name, value in zip(self._pNames, sample)}
+            start = time()
             results = self._evaluator(parameters)
 
             objs = [obj(results) for obj in self._objectives]
             consts = [constr(results) for constr in self._constraints]
             res = list(results.values()) + objs + consts
 
+            if self._stream is not None:
+                self._stream.writeEvaluation(
+                    self._names, list(sample) + res, start, time()
+                )
+
             f.append(objs)
             g.append(consts)
             r.append(res)
@@ -100,4 +132,7 @@ class SamplingProblem:
         out["G"] = g
         out["R"] = r
 
+        if self._stream is not None:
+            self._stream.flush()
+
         return out
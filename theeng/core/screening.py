@@ -0,0 +1,224 @@
+from functools import partial
+from typing import Callable, Dict, List, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame, Series
+from scipy.stats import qmc
+
+from theeng.core.abstract import Step
+from theeng.core.problem import ProblemConstructor
+from theeng.core.surrogate import Surrogate
+
+
+class Screener(Step):
+    """Variable screening: measure the influence of each parameter on the objectives and constraints and freeze the negligible ones."""
+
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+    ) -> None:
+        super().__init__(problem, evaluator)
+        self.outputs = self.objectiveExpressions + self.constraintExpressions
+        self.influence = Series(dtype=float)
+        self.data = DataFrame()
+
+    def morris(
+        self, nTrajectories: int = 10, nLevels: int = 4, seed: int = 1
+    ) -> DataFrame:
+        """Morris elementary effects, from nTrajectories * (nVar + 1) evaluations.
+
+        Args:
+            nTrajectories (int, optional): Number of one-at-a-time trajectories. Defaults to 10.
+            nLevels (int, optional): Number of grid levels of each parameter (even). Defaults to 4.
+            seed (int, optional): Random seed. Defaults to 1.
+
+        Returns:
+            DataFrame: For each parameter (rows) the mean absolute elementary effect "muStar" and its standard deviation "sigma" on each output, in normalized parameter units.
+        """
+        rng = np.random.default_rng(seed)
+        delta = nLevels / (2 * (nLevels - 1))
+        lowerBounds, upperBounds = np.array(self.lowerBounds), np.array(self.upperBounds)
+
+        U = []
+        for _ in range(nTrajectories):
+            start = rng.integers(0, nLevels // 2, self.nVar) / (nLevels - 1)
+            signs = rng.choice([-1.0, 1.0], self.nVar)
+            point = np.where(signs > 0, start, start + delta)  # every step stays in [0, 1]
+            trajectory = [point.copy()]
+            for i in rng.permutation(self.nVar):
+                point[i] += signs[i] * delta
+                trajectory.append(point.copy())
+            U.append(trajectory)
+        U = np.array(U)  # (nTrajectories, nVar + 1, nVar)
+
+        X = lowerBounds + U.reshape(-1, self.nVar) * (upperBounds - lowerBounds)
+        Y = self._evaluate(X).reshape(nTrajectories, self.nVar + 1, -1)
+
+        steps = np.diff(U, axis=1)  # exactly one non-zero entry per step
+        variables = np.abs(steps).argmax(axis=2)
+        stepSizes = np.take_along_axis(steps, variables[:, :, None], axis=2)
+        effects = np.empty((nTrajectories, self.nVar, len(self.outputs)))
+        for t in range(nTrajectories):
+            effects[t, variables[t]] = np.diff(Y[t], axis=0) / stepSizes[t]
+
+        columns = {}
+        for k, output in enumerate(self.outputs):
+            columns[f"muStar {output}"] = np.abs(effects[:, :, k]).mean(axis=0)
+            columns[f"sigma {output}"] = effects[:, :, k].std(axis=0)
+        indices = DataFrame(columns, index=self.pNames)
+
+        muStar = indices[[f"muStar {output}" for output in self.outputs]]
+        relative = muStar / muStar.max(axis=0).replace(0, 1)
+        self.influence = relative.max(axis=1).rename("Influence")
+        return indices
+
+    def sobol(
+        self, surrogate: Surrogate, nSamples: int = 4096, seed: int = 1
+    ) -> DataFrame:
+        """First-order and total Sobol indices estimated on a trained surrogate, with a single batch prediction of the Saltelli sample.
+
+        Args:
+            surrogate (Surrogate): A trained surrogate of the evaluator.
+            nSamples (int, optional): Base sample size, nSamples * (nVar + 2) designs are predicted. Defaults to 4096.
+            seed (int, optional): Random seed of the scrambled Sobol sequence. Defaults to 1.
+
+        Returns:
+            DataFrame: For each parameter (rows) the first-order "S1" and total "ST" indices of each output.
+        """
+        lowerBounds, upperBounds = np.array(self.lowerBounds), np.array(self.upperBounds)
+        AB = qmc.Sobol(d=2 * self.nVar, seed=seed).random(nSamples)
+        A, B = AB[:, : self.nVar], AB[:, self.nVar :]
+        ABi = np.repeat(A[None, :, :], self.nVar, axis=0)
+        ABi[np.arange(self.nVar), :, np.arange(self.nVar)] = B.T  # column i taken from B
+
+        U = np.concatenate([A, B, ABi.reshape(-1, self.nVar)])
+        X = lowerBounds + U * (upperBounds - lowerBounds)
+        predictions = surrogate.predictBatch(X)
+        results = {
+            name: predictions[:, i] for i, name in enumerate(surrogate.resultsExpressions)
+        }
+        Y = self._expressions(results)
+
+        YA, YB = Y[:nSamples], Y[nSamples : 2 * nSamples]
+        YABi = Y[2 * nSamples :].reshape(self.nVar, nSamples, -1)
+        variance = np.concatenate([YA, YB]).var(axis=0)
+        variance[variance == 0] = 1
+        S1 = np.mean(YB * (YABi - YA), axis=1) / variance  # Saltelli 2010
+        ST = 0.5 * np.mean((YA - YABi) ** 2, axis=1) / variance  # Jansen
+
+        columns = {}
+        for k, output in enumerate(self.outputs):
+            columns[f"S1 {output}"] = S1[:, k]
+            columns[f"ST {output}"] = ST[:, k]
+        indices = DataFrame(columns, index=self.pNames)
+
+        self.influence = Series(ST.max(axis=1), index=self.pNames, name="Influence")
+        return indices
+
+    def freeze(
+        self,
+        threshold: float = 0.05,
+        values: Union[Dict[str, float], None] = None,
+        influence: Union[Series, None] = None,
+    ) -> Tuple[ProblemConstructor, Callable[[Dict[str, float]], Dict[str, float]]]:
+        """Freeze the parameters whose influence is below threshold.
+
+        Args:
+            threshold (float, optional): Influence below which a parameter is frozen: the relative muStar for Morris, the total index for Sobol. Defaults to 0.05.
+            values (Union[Dict[str, float], None], optional): Values of the frozen parameters. Defaults to the middle of their bounds.
+            influence (Union[Series, None], optional): Influence of each parameter. Defaults to the result of the last morris() or sobol().
+
+        Returns:
+            Tuple[ProblemConstructor, Callable[[Dict[str, float]], Dict[str, float]]]: The problem on the influential parameters only, and the evaluator completing its designs with the frozen values.
+        """
+        influence = self.influence if influence is None else influence
+        if influence.empty:
+            raise ValueError("No influence computed. Run morris() or sobol() first.")
+
+        values = values or {}
+        lowerBounds, upperBounds = self.problem.getDeclaredBounds()
+        middles = self.problem.decode(
+            [(lower + upper) / 2 for lower, upper in zip(lowerBounds, upperBounds)]
+        )
+        kept = []
+        frozen = {}
+        for name, middle in zip(self.pNames, middles):
+            if influence[name] >= threshold:
+                kept.append(name)
+            else:
+                frozen[name] = values.get(name, middle)
+        if not kept:  # keep at least the most influential parameter
+            name = influence.idxmax()
+            kept.append(name)
+            frozen.pop(name)
+
+        reduced = ProblemConstructor()
+        reduced.setResults(
+            dict(zip(self.resultsExpressions, self.problem.getIterableOutput()))
+        )
+        reduced.setObjectives(
+            dict(zip(self.objectiveExpressions, self.problem.getObjectiveWeights()))
+        )
+        if self.constraintExpressions:
+            reduced.setContraints(
+                dict(
+                    zip(
+                        self.constraintExpressions,
+                        self.problem.getConstraintsRelaxation(),
+                    )
+                )
+            )
+        categories = self.problem.getCategories()
+        for name, variableType, lowerBound, upperBound in zip(
+            self.pNames, self.problem.getVariableTypes(), lowerBounds, upperBounds
+        ):  # one at a time, keeping the parameters order and types
+            if name not in kept:
+                continue
+            if variableType == "integer":
+                reduced.setIntegers({name: (lowerBound, upperBound)})
+            elif variableType == "categorical":
+                reduced.setCategories({name: categories[name]})
+            else:
+                reduced.setBounds({name: (lowerBound, upperBound)})
+
+        evaluator = partial(
+            _frozenEvaluator, evaluator=self.evaluator, frozen=frozen, pNames=self.pNames
+        )
+        return reduced, evaluator
+
+    def _evaluate(self, X: np.ndarray) -> np.ndarray:
+        """Evaluate designs one by one, storing them in self.data, and return their outputs."""
+        rows = []
+        for x in X:
+            results = self.evaluator(dict(zip(self.pNames, x)))
+            objs = [obj(results) for obj in self.objectives]
+            consts = [constr(results) for constr in self.constraints]
+            rows.append(list(x) + list(results.values()) + objs + consts)
+
+        data = DataFrame(
+            rows,
+            columns=self.pNames
+            + self.resultsExpressions
+            + self.objectiveExpressions
+            + self.constraintExpressions,
+        )
+        self.data = data.T.drop_duplicates().T
+
+        return np.array([row[len(row) - len(self.outputs) :] for row in rows], dtype=float)
+
+    def _expressions(self, results: Dict[str, np.ndarray]) -> np.ndarray:
+        """Evaluate objectives and constraints on arrays of results."""
+        expressions = self.problem.getObjectivesBatch() + self.problem.getConstraintsBatch()
+        return np.stack([expression(results) for expression in expressions], axis=1)
+
+
+def _frozenEvaluator(
+    parameters: Dict[str, float],
+    evaluator: Callable[[Dict[str, float]], Dict[str, float]],
+    frozen: Dict[str, float],
+    pNames: List[str],
+) -> Dict[str, float]:
+    """Complete a design of the reduced problem with the frozen parameters, in the original parameters order."""
+    full = {**frozen, **parameters}
+    return evaluator({name: full[name] for name in pNames})
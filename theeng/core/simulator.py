@@ -1,34 +1,86 @@
 from os.path import isfile
-from typing import Callable, Dict
+from typing import Callable, Dict, Tuple, Union
 
 from theeng.algorithms.simulators import Simulators
 from theeng.core.abstract import Step
+from theeng.core.cache import EvaluationCache
+from theeng.core.fidelity import MultiFidelityEvaluator
+from theeng.core.fields import FieldStore
 from theeng.core.problem import ProblemConstructor
 
 
 class Simulator(Step):
     def __init__(self, problem: ProblemConstructor) -> None:
+        self.problem = problem
         self.resultsExpressions = problem.getResultsExpressions()
         self.iterableOutput = problem.getIterableOutput()
         self.simulator = None
+        self.fieldStore = None
 
     def generate(
-        self, simulatorName: str, fcdPath: str
+        self,
+        simulatorName: str,
+        fcdPath: str,
+        fieldStorePath: Union[str, None] = None,
     ) -> Callable[[Dict[str, float]], Dict[str, float]]:
         if not isfile(fcdPath):
             raise FileNotFoundError(
                 f"FreeCAD file at {fcdPath} was not found. Check path or filename."
             )
+        if fieldStorePath:
+            self.fieldStore = FieldStore(fieldStorePath)
         simulator = self._getMethod(
             Simulators,
             simulatorName,
             resultsExpressions=self.resultsExpressions,
             iterableOutput=self.iterableOutput,
             fcdPath=fcdPath,
+            fieldStore=self.fieldStore,
         )
+        if self.problem.isMixed():  # one cache for every step using this simulator
+            simulator = EvaluationCache.shared(simulator, self.problem)
         self.simulator = simulator
         return simulator
 
+    def generateMultiFidelity(
+        self,
+        simulatorName: str,
+        levels: Dict[str, Tuple[str, float]],
+        fieldStorePath: Union[str, None] = None,
+        **kwargs,
+    ) -> MultiFidelityEvaluator:
+        """Generate an evaluator running several models of the same design (e.g. coarse and fine meshes) as fidelity levels.
+
+        Args:
+            simulatorName (str): Name of the method of Simulators to use.
+            levels (Dict[str, Tuple[str, float]]): {levelName: (fcdPath, cost)}, the most expensive level being the reference.
+            fieldStorePath (Union[str, None], optional): Store of the full results of the reference level. Defaults to None.
+            **kwargs: Arguments of MultiFidelityEvaluator.
+
+        Returns:
+            MultiFidelityEvaluator: The multi-fidelity evaluator, also callable as a simulator.
+        """
+        evaluator = MultiFidelityEvaluator(self.problem, **kwargs)
+        reference = max(levels, key=lambda name: levels[name][1])
+        for name, (fcdPath, cost) in levels.items():
+            if not isfile(fcdPath):
+                raise FileNotFoundError(
+                    f"FreeCAD file at {fcdPath} was not found. Check path or filename."
+                )
+            if name == reference and fieldStorePath:
+                self.fieldStore = FieldStore(fieldStorePath)
+            simulator = self._getMethod(
+                Simulators,
+                simulatorName,
+                resultsExpressions=self.resultsExpressions,
+                iterableOutput=self.iterableOutput,
+                fcdPath=fcdPath,
+                fieldStore=self.fieldStore if name == reference else None,
+            )
+            evaluator.addLevel(name, simulator, cost=cost)
+        self.simulator = evaluator
+        return evaluator
+
     def simulate(self, parameters: Dict[str, float]) -> Dict[str, float]:
         if not self.simulator:
             raise ValueError("No simulator has been generated. Use do() method first.")
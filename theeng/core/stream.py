@@ -0,0 +1,227 @@
+import csv
+from io import StringIO
+from os import fsync, getpid
+from os.path import getsize, isfile, splitext
+from threading import Lock, current_thread
+from time import time
+from typing import Dict, List, Union
+
+from pandas import DataFrame, read_csv
+
+
+class ResultsStream:
+    """An append-only sink writing every completed evaluation to disk, with durable batched flushes."""
+
+    def __init__(
+        self,
+        path: str,
+        flushEvery: int = 10,
+        flushInterval: float = 5.0,
+        append: bool = False,
+    ) -> None:
+        """Open a results stream.
+
+        Args:
+            path (str): Output file. A ".csv" extension writes CSV, ".arrow" or ".arrows" an Arrow IPC stream.
+            flushEvery (int, optional): Number of buffered evaluations triggering a flush. Defaults to 10.
+            flushInterval (float, optional): Seconds after which buffered evaluations are flushed anyway. Defaults to 5.0.
+            append (bool, optional): Append to an existing CSV stream instead of overwriting it. Defaults to False.
+        """
+        self.path = path
+        self.format = ResultsStream._getFormat(path)
+        self.flushEvery = flushEvery
+        self.flushInterval = flushInterval
+
+        if append and self.format != "csv":
+            raise ValueError("Only CSV streams can be appended to.")
+
+        self.columns = None
+        self.nEvaluations = 0
+        if append and isfile(path) and getsize(path):
+            with open(path, "r", newline="") as f:
+                self.columns = next(csv.reader(f))
+            self.nEvaluations = len(ResultsStreamReader(path).read())
+
+        if self.format == "csv":
+            self._file = open(path, "a" if append else "w", newline="")
+        else:
+            self._file = open(path, "wb")
+        self._writer = None
+        self._buffer = []
+        self._lastFlush = time()
+        self._lock = Lock()
+
+    def write(self, row: Dict[str, float]) -> None:
+        """Buffer one evaluation and flush if the batch is full or the flush interval has elapsed.
+
+        Args:
+            row (Dict[str, float]): The evaluation, column names and values.
+        """
+        with self._lock:
+            if self.columns is None:
+                self.columns = list(row.keys())
+            self._buffer.append([row.get(column) for column in self.columns])
+            self.nEvaluations += 1
+            if (
+                len(self._buffer) >= self.flushEvery
+                or time() - self._lastFlush >= self.flushInterval
+            ):
+                self._flush()
+
+    def writeEvaluation(
+        self,
+        names: List[str],
+        values: List[float],
+        start: float,
+        end: float,
+        worker: Union[str, None] = None,
+    ) -> None:
+        """Write one evaluation together with its timing and the worker that computed it.
+
+        Args:
+            names (List[str]): Column names (parameters, results, objectives and constraints).
+            values (List[float]): Values in the same order as names.
+            start (float): Epoch time at which the evaluation started.
+            end (float): Epoch time at which the evaluation completed.
+            worker (Union[str, None], optional): The worker that computed it, see workerName(). Defaults to the calling thread.
+        """
+        row = dict(zip(names, values))
+        row["_start"] = start
+        row["_end"] = end
+        row["_worker"] = worker or workerName()
+        self.write(row)
+
+    def flush(self) -> None:
+        """Write the buffered evaluations and force them to disk."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Flush the remaining evaluations and close the file."""
+        with self._lock:
+            self._flush()
+            if self._writer is not None:
+                self._writer.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _flush(self) -> None:
+        self._lastFlush = time()
+        if not self._buffer:
+            return
+        if self.format == "csv":
+            writer = csv.writer(self._file, lineterminator="\n")
+            if self._file.tell() == 0:
+                writer.writerow(self.columns)
+            writer.writerows(self._buffer)
+        else:
+            import pyarrow as pa  # only needed for Arrow streams
+
+            columns = list(zip(*self._buffer))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(column) for column in columns], names=self.columns
+            )
+            if self._writer is None:
+                self._writer = pa.ipc.new_stream(self._file, batch.schema)
+            self._writer.write_batch(batch)
+        self._file.flush()
+        fsync(self._file.fileno())
+        self._buffer = []
+
+    @staticmethod
+    def _getFormat(path: str) -> str:
+        extension = splitext(path)[1].lower()
+        if extension == ".csv":
+            return "csv"
+        elif extension in (".arrow", ".arrows"):
+            return "arrow"
+        raise ValueError(
+            f"Unsupported stream format {extension}. Use .csv or .arrow files."
+        )
+
+
+def workerName() -> str:
+    """Returns the name of the calling process and thread, as written in the "_worker" column."""
+    return f"{getpid()}-{current_thread().name}"
+
+
+class ResultsStreamReader:
+    """Read a results stream, possibly while it is still being written."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize the reader.
+
+        Args:
+            path (str): The stream file written by ResultsStream.
+        """
+        self.path = path
+        self.format = ResultsStream._getFormat(path)
+        self.columns = None
+        self._offset = 0  # bytes of complete lines or messages already read
+        self._schema = None
+
+    def read(self) -> DataFrame:
+        """Read the whole stream.
+
+        Returns:
+            DataFrame: All evaluations written so far.
+        """
+        return ResultsStreamReader(self.path).tail()
+
+    def tail(self) -> DataFrame:
+        """Read only the evaluations appended since the previous call.
+
+        Returns:
+            DataFrame: The new evaluations, empty if there are none yet.
+        """
+        if not isfile(self.path):
+            return DataFrame()
+        if self.format == "csv":
+            return self._tailCsv()
+        return self._tailArrow()
+
+    def _tailCsv(self) -> DataFrame:
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        complete = chunk[: chunk.rfind(b"\n") + 1]  # ignore a partially written line
+        if not complete:
+            return DataFrame(columns=self.columns)
+        self._offset += len(complete)
+
+        text = complete.decode()
+        if self.columns is None:
+            header, _, text = text.partition("\n")
+            self.columns = next(csv.reader([header]))
+        if not text.strip():
+            return DataFrame(columns=self.columns)
+        return read_csv(StringIO(text), header=None, names=self.columns)
+
+    def _tailArrow(self) -> DataFrame:
+        import pyarrow as pa  # only needed for Arrow streams
+
+        batches = []
+        with pa.memory_map(self.path, "r") as source:
+            source.seek(self._offset)  # resume after the last complete message
+            reader = pa.ipc.MessageReader.open_stream(source)
+            while True:
+                try:
+                    message = reader.read_next_message()
+                except (StopIteration, pa.ArrowInvalid, OSError):  # end of stream or partially written
+                    break
+                if self._schema is None:
+                    self._schema = pa.ipc.read_schema(message)
+                    self.columns = self._schema.names
+                else:
+                    batches.append(pa.ipc.read_record_batch(message, self._schema))
+                self._offset = source.tell()
+
+        if not batches:
+            return DataFrame(columns=self.columns)
+        return pa.Table.from_batches(batches).to_pandas()
+
@@ -1,13 +1,16 @@
 from os.path import isfile
 from pickle import dump, load
-from typing import Callable, Dict, Tuple
+from typing import Callable, Dict, List, Tuple, Union
 
+import numpy as np
 from numpy import ndarray
 from pandas import DataFrame
+from sklearn.base import clone
 from sklearn.model_selection import cross_val_score
 
-from theeng.algorithms.surrogates import Surrogates
+from theeng.algorithms.surrogates import SurrogateGradients, Surrogates
 from theeng.core.abstract import Step
+from theeng.core.fields import FieldStore, reduceField
 from theeng.core.problem import ProblemConstructor
 
 
@@ -23,16 +26,23 @@ class Surrogate(Step):
         self.trainingData_x = data[parameterNames].values
         self.trainingData_y = data[resultsExpressions].values
         self.trainedSurrogate = None
+        self.jacobian = None
+        self.ensemble = []
         self.resultsExpressions = resultsExpressions
 
     def generate(
-        self, surrogateName: str = "polynomial", save: bool = False, **kwargs
+        self,
+        surrogateName: str = "polynomial",
+        save: bool = False,
+        validate: bool = True,
+        **kwargs
     ) -> Tuple[Callable[[Dict[str, float]], Dict[str, float]], Tuple[float, float]]:
         surrogateMethod = self._getMethod(Surrogates, surrogateName)(**kwargs)
         trainedSurrogate, surrogatePerformance = self._train(
-            surrogateMethod, save=save, **kwargs
+            surrogateMethod, save=save, validate=validate, **kwargs
         )
         self.trainedSurrogate = trainedSurrogate
+        self.ensemble = []
 
         return self._predict, surrogatePerformance
 
@@ -51,6 +61,91 @@ class Surrogate(Step):
             )
         return self._predict
 
+    def predictBatch(
+        self, x: ndarray, returnStd: bool = False, nModels: int = 8
+    ) -> Union[ndarray, Tuple[ndarray, ndarray]]:
+        """Predict the results of many designs with a single call to the surrogate.
+
+        Args:
+            x (ndarray): Design parameters (nDesigns, nVar).
+            returnStd (bool, optional): Also return the prediction uncertainty, from the Gaussian process or else from a bootstrap ensemble. Defaults to False.
+            nModels (int, optional): Size of the bootstrap ensemble, fitted on first use. Defaults to 8.
+
+        Raises:
+            ValueError: If no surrogate has been generated.
+
+        Returns:
+            Union[ndarray, Tuple[ndarray, ndarray]]: The predicted results (nDesigns, nResults) and, if requested, their standard deviations.
+        """
+        if not self.trainedSurrogate:
+            raise ValueError(
+                "No surrogate has been generated. Use train() method first."
+            )
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        if not returnStd:
+            return np.asarray(self.trainedSurrogate.predict(x)).reshape(len(x), -1)  # type: ignore
+
+        if "gauss" in getattr(self.trainedSurrogate, "named_steps", {}):
+            mean, std = self.trainedSurrogate.predict(x, return_std=True)  # type: ignore
+            return mean.reshape(len(x), -1), std.reshape(len(x), -1)
+
+        if len(self.ensemble) != nModels:
+            rng = np.random.default_rng(0)
+            self.ensemble = []
+            for _ in range(nModels):
+                rows = rng.integers(0, len(self.trainingData_x), len(self.trainingData_x))
+                self.ensemble.append(
+                    clone(self.trainedSurrogate).fit(
+                        self.trainingData_x[rows], self.trainingData_y[rows]
+                    )
+                )
+        predictions = np.stack(
+            [np.asarray(model.predict(x)).reshape(len(x), -1) for model in self.ensemble]
+        )
+        mean = np.asarray(self.trainedSurrogate.predict(x)).reshape(len(x), -1)  # type: ignore
+        return mean, predictions.std(axis=0)
+
+    def generateGradient(self) -> Callable[[Dict[str, float]], Dict[str, ndarray]]:
+        """Generate the analytic gradient of the trained surrogate, available for polynomial and spline surrogates.
+
+        Raises:
+            ValueError: If no surrogate has been generated.
+            NotImplementedError: If the surrogate has no analytic gradient.
+
+        Returns:
+            Callable[[Dict[str, float]], Dict[str, ndarray]]: An evaluator returning the gradient of each result with respect to the design parameters.
+        """
+        if not self.trainedSurrogate:
+            raise ValueError(
+                "No surrogate has been generated. Use train() method first."
+            )
+        steps = getattr(self.trainedSurrogate, "named_steps", {})
+        if "poly" in steps:
+            gradientName = "polynomial"
+        elif "spline" in steps:
+            gradientName = "spline"
+        else:
+            raise NotImplementedError(
+                "Analytic gradients are only available for polynomial and spline surrogates."
+            )
+        self.jacobian = self._getMethod(
+            SurrogateGradients, gradientName, pipeline=self.trainedSurrogate
+        )()
+
+        return self._gradient
+
+    def _gradient(self, parameters: Dict[str, float]) -> Dict[str, ndarray]:
+        """Method to evaluate the gradient of the surrogate model.
+
+        Args:
+            parameters (Dict[str, float]): A dicttionary of design parameters values and their aliases contained in the spreadsheet (names).
+
+        Returns:
+            Dict[str, ndarray]: A dictionary containing results aliases and their gradients.
+        """
+        jacobian = self.jacobian([list(parameters.values())])[0]
+        return dict(zip(self.resultsExpressions, jacobian))
+
     def _predict(self, parameters: Dict[str, float]) -> Dict[str, float]:
         """Method to evaluate the surrogate model.
 
@@ -75,24 +170,28 @@ class Surrogate(Step):
         self,
         surrogateMethod,
         save: bool = False,
+        validate: bool = True,
         **kwargs,
     ) -> Tuple[object, Tuple[float, float]]:
         trainedSurrogate = surrogateMethod.fit(self.trainingData_x, self.trainingData_y)
 
-        n_data_rows = len(self.trainingData_x)
-        test_set_numdata = (
-            n_data_rows * 0.2
-        )  # 20% of the data is used for testing in cross validation.
-        n_kfold_splits = (
-            round(n_data_rows / test_set_numdata) if test_set_numdata > 2 else 2
-        )
-        scores = cross_val_score(
-            trainedSurrogate,
-            self.trainingData_x,
-            self.trainingData_y,
-            cv=n_kfold_splits,
-        )
-        surrogatePerformance = (scores.mean(), scores.std())
+        if validate:
+            n_data_rows = len(self.trainingData_x)
+            test_set_numdata = (
+                n_data_rows * 0.2
+            )  # 20% of the data is used for testing in cross validation.
+            n_kfold_splits = (
+                round(n_data_rows / test_set_numdata) if test_set_numdata > 2 else 2
+            )
+            scores = cross_val_score(
+                trainedSurrogate,
+                self.trainingData_x,
+                self.trainingData_y,
+                cv=n_kfold_splits,
+            )
+            surrogatePerformance = (scores.mean(), scores.std())
+        else:  # e.g. surrogates refitted at every generation
+            surrogatePerformance = (np.nan, np.nan)
 
         if save:
             if not kwargs.get("surrogatePath"):
@@ -112,3 +211,112 @@ class Surrogate(Step):
     def _checkPath(path: str, *args) -> None:
         if not isfile(path):
             raise FileNotFoundError(args[0])
+
+
+class FieldSurrogate(Surrogate):
+    def __init__(
+        self,
+        problem: ProblemConstructor,
+        fieldStore: FieldStore,
+        fieldName: str,
+        designIds: Union[List[int], None] = None,
+    ) -> None:
+        """Initialize a reduced-order surrogate of a full result field.
+
+        Args:
+            problem (ProblemConstructor): The problem whose parameters generated the fields.
+            fieldStore (FieldStore): The store containing the field snapshots.
+            fieldName (str): The result alias of the field.
+            designIds (Union[List[int], None], optional): Designs used for training. Defaults to all stored designs.
+        """
+        parameterNames = problem.getPnames()
+        if designIds is None:
+            designIds = fieldStore.getDesignIds(fieldName)
+
+        self.trainingData_x = fieldStore.getParameters().loc[designIds, parameterNames].values
+        self.trainingData_y = np.asarray(
+            fieldStore.getFields(fieldName, designIds), dtype=np.float64
+        )
+        self.trainedSurrogate = None
+        self.jacobian = None
+        self.ensemble = []
+        self.fieldName = fieldName
+        self.resultsExpressions = [fieldName]
+
+        resultsExpressions = problem.getResultsExpressions()
+        iterableOutput = problem.getIterableOutput()
+        if fieldName in resultsExpressions:
+            self.iterableAction = iterableOutput[resultsExpressions.index(fieldName)] or "Max"
+        else:
+            self.iterableAction = "Max"
+
+    def generate(
+        self, surrogateName: str = "polynomial", save: bool = False, **kwargs
+    ) -> Tuple[Callable[[Dict[str, float]], Dict[str, float]], Tuple[float, float]]:
+        """Compress the field snapshots with a truncated SVD and regress the modal coefficients.
+
+        Args:
+            surrogateName (str, optional): The surrogate used for the modal coefficients. Defaults to "polynomial".
+            save (bool, optional): Whether to pickle the trained model to surrogatePath. Defaults to False.
+
+        Returns:
+            Tuple[Callable[[Dict[str, float]], Dict[str, float]], Tuple[float, float]]: An evaluator returning the reduced field and the cross validation score.
+        """
+        surrogateMethod = self._getMethod(Surrogates, "reducedOrder")(
+            regressorName=surrogateName, **kwargs
+        )
+        trainedSurrogate, surrogatePerformance = self._train(
+            surrogateMethod, save=save, **kwargs
+        )
+        self.trainedSurrogate = trainedSurrogate
+
+        return self._predict, surrogatePerformance
+
+    def predictFields(self, x: ndarray) -> ndarray:
+        """Predict the full fields of a batch of designs.
+
+        Args:
+            x (ndarray): Design parameters (nDesigns, nVar).
+
+        Returns:
+            ndarray: The predicted fields (nDesigns, nValues).
+        """
+        if not self.trainedSurrogate:
+            raise ValueError(
+                "No surrogate has been generated. Use generate() method first."
+            )
+        return self.trainedSurrogate.predict(np.atleast_2d(x))  # type: ignore
+
+    def predictReduction(
+        self, x: ndarray, action: Union[str, None] = None, batchSize: int = 1024
+    ) -> ndarray:
+        """Predict a reduction of the fields of a batch of designs without holding all fields in memory.
+
+        Args:
+            x (ndarray): Design parameters (nDesigns, nVar).
+            action (Union[str, None], optional): Reduction as in FieldStore.reduce, e.g. "Max", "P95" or "ArgMax" for the peak location. Defaults to the problem iterable action.
+            batchSize (int, optional): Number of fields reconstructed at once. Defaults to 1024.
+
+        Returns:
+            ndarray: One reduced value per design.
+        """
+        action = action or self.iterableAction
+        x = np.atleast_2d(x)
+        return np.concatenate(
+            [
+                reduceField(self.predictFields(x[i : i + batchSize]), action, axis=1)
+                for i in range(0, len(x), batchSize)
+            ]
+        )
+
+    def _predict(self, parameters: Dict[str, float]) -> Dict[str, float]:
+        """Method to evaluate the reduced field on a single design.
+
+        Args:
+            parameters (Dict[str, float]): A dicttionary of design parameters values and their aliases.
+
+        Returns:
+            Dict[str, float]: A dictionary containing the field alias and its reduced value.
+        """
+        reduced = self.predictReduction([list(parameters.values())])
+        return {self.fieldName: reduced[0]}
@@ -14,10 +14,12 @@ class Visualization(Step):
         self,
         visualizationName: str = "parallelCoordinate",
         savePath: Union[None, str] = None,
+        includePlotlyjs: Union[bool, str] = True,
         **kwargs
     ):
         visualizationMethod = self._getMethod(
             Visualizations, visualizationName, data=self.data
         )(**kwargs)
         if savePath:
-            visualizationMethod.write_html(savePath)
+            # "directory" writes plotly.js once next to the plots instead of embedding it in each file
+            visualizationMethod.write_html(savePath, include_plotlyjs=includePlotlyjs)
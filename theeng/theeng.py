@@ -3,11 +3,14 @@ from os.path import isfile, join
 
 from pandas import concat
 
+from theeng.core.cache import EvaluationCache
+from theeng.core.database import StudyDatabase
 from theeng.core.optimizer import Optimizer
 from theeng.core.problem import ProblemConstructor
 from theeng.core.ranker import Ranker
 from theeng.core.sampler import Sampler
 from theeng.core.simulator import Simulator
+from theeng.core.stream import ResultsStream
 from theeng.core.surrogate import Surrogate
 from theeng.core.visualization import Visualization
 
@@ -23,6 +26,12 @@ class TheEng:
 
         self.workingDirectory = ""
         self.simulationDirectory = ""
+        self.fieldStoreDirectory = None
+        self.coarseSimulationDirectory = None
+        self.coarseSimulationCost = 0.1
+        self.databasePath = None
+        self.studyName = "default"
+        self.historyStream = None
         self.simulatorName = ""
         self.nCPUs = None
         self.results = None
@@ -36,6 +45,8 @@ class TheEng:
         self.optimizerName = ""
         self.popSize = None
         self.termination = None
+        self.convergenceTolerance = None
+        self.trustRegion = False
         self.rankingName = ""
         self.objectives = None
         self.objectiveWeights = None
@@ -54,16 +65,48 @@ class TheEng:
         problem.setBounds(self.bounds)  # type: ignore
 
         simul = Simulator(problem)
-        simulator = simul.generate(
-            simulatorName=self.simulatorName,
-            fcdPath=self.simulationDirectory,
-        )
+        if self.coarseSimulationDirectory:
+            simulator = simul.generateMultiFidelity(
+                simulatorName=self.simulatorName,
+                levels={
+                    "coarse": (self.coarseSimulationDirectory, self.coarseSimulationCost),
+                    "fine": (self.simulationDirectory, 1.0),
+                },
+                fieldStorePath=self.fieldStoreDirectory,
+            )
+        else:
+            simulator = simul.generate(
+                simulatorName=self.simulatorName,
+                fcdPath=self.simulationDirectory,
+                fieldStorePath=self.fieldStoreDirectory,
+            )
+        if problem.isMixed():  # one cache shared by sampling, optimization and verification
+            simulator = EvaluationCache.shared(simulator, problem)
+
+        database = None
+        if self.databasePath:
+            database = StudyDatabase(
+                self.databasePath,
+                study=self.studyName,
+                modelHash=StudyDatabase.hashModel(self.simulationDirectory),
+            )
+
+        stream = None
+        if self.historyStream:  # followed live by theeng/ui/web/liveDashboard.py
+            stream = ResultsStream(join(self.workingDirectory, self.historyStream))
 
         evaluator = simulator
+        if database:
+            evaluator = database.recorder(simulator, source="optimizer")
 
         if self.makeSurrogate:
-            sampler = Sampler(problem, simulator)
-            _, _, dataSamp = sampler.sample(nSamples=self.nSamples)  # type: ignore
+            samplingSimulator = simulator
+            if database:
+                samplingSimulator = database.recorder(simulator, source="sampler")
+            sampler = Sampler(problem, samplingSimulator)
+            _, _, dataSamp = sampler.sample(nSamples=self.nSamples, stream=stream)  # type: ignore
+            if database:  # train on every design ever simulated in this study
+                dataSamp = database.getData(problem)
 
             surrog = Surrogate(problem, dataSamp)  # type: ignore
             surrogate, _ = surrog.generate(
@@ -75,16 +118,42 @@ class TheEng:
             evaluator = surrogate
 
         optimizer = Optimizer(problem, evaluator)
-        xOpt, _, dataOpt = optimizer.optimize(
-            optimizerName=self.optimizerName, termination=self.termination, popSize=self.popSize  # type: ignore
-        )
+        optimizerStream = None if self.makeSurrogate else stream  # only simulations go to the history
+        if self.optimizerName in ("SLSQP", "trust-constr"):
+            if not self.makeSurrogate:
+                raise ValueError(
+                    "Gradient-based optimization requires a polynomial or spline surrogate."
+                )
+            xOpt, fOpt, dataOpt = optimizer.optimizeGradient(
+                surrog.generateGradient(), method=self.optimizerName, nStarts=self.popSize, stream=optimizerStream  # type: ignore
+            )
+        else:
+            xOpt, fOpt, dataOpt = optimizer.optimize(
+                optimizerName=self.optimizerName, termination=self.termination, popSize=self.popSize, convergenceTolerance=self.convergenceTolerance, stream=optimizerStream  # type: ignore
+            )
 
         if self.makeSurrogate:
-            _, _, dataOpt = optimizer.convertToSimulator(xOpt, simulator)
+            verificationSimulator = simulator
+            if database:
+                verificationSimulator = database.recorder(simulator, source="verification")
+            if self.trustRegion:  # refine the global surrogate optimum
+                weights = problem.getObjectiveWeights() or [1.0] * len(fOpt[0])
+                start = min(
+                    range(len(xOpt)),
+                    key=lambda i: sum(w * f for w, f in zip(weights, fOpt[i])),
+                )
+                _, _, dataOpt = optimizer.optimizeTrustRegion(
+                    verificationSimulator, dataSamp, surrogateName=self.surrogateName, x0=xOpt[start], popSize=self.popSize, stream=stream  # type: ignore
+                )
+            else:
+                _, _, dataOpt = optimizer.convertToSimulator(xOpt, verificationSimulator, stream=stream)
             data = concat([dataSamp, dataOpt])
         else:
             data = dataOpt
 
+        if stream is not None:
+            stream.close()
+
         ranker = Ranker(problem, data)
         dataRanked = ranker.rank(rankingName=self.rankingName)
 
@@ -95,10 +164,13 @@ class TheEng:
         visualizer.plot(
             visualizationName="parallelCoordinate",
             savePath=join(self.workingDirectory, "parallel_coord.html"),
+            includePlotlyjs="directory",
+            paretoColumns=problem.getObjectivesExpressions(),
         )
         visualizer.plot(
             visualizationName="heatMap",
             savePath=join(self.workingDirectory, "heatmap.html"),
+            includePlotlyjs="directory",
         )
 
     def getSettingsFromJson(self, jsonPath):
@@ -124,8 +196,14 @@ class TheEng:
         self.workingDirectory = generalSettings["Working Directory"]
         self.simulationDirectory = generalSettings["Simulation Directory"]
         self.simulatorName = generalSettings["Simulator Name"]
+        self.fieldStoreDirectory = generalSettings.get("Field Store Directory")
+        self.coarseSimulationDirectory = generalSettings.get("Coarse Simulation Directory")
+        self.coarseSimulationCost = generalSettings.get("Coarse Simulation Cost", 0.1)
         self.makeSurrogate = generalSettings["Use Surrogate"]
         self.nCPUs = generalSettings["nCPUs"]
+        self.databasePath = generalSettings.get("Study Database")
+        self.studyName = generalSettings.get("Study Name", "default")
+        self.historyStream = generalSettings.get("History Stream")
 
     def _getProblemSettings(self):
         problemSettings = self._settings["Problem"]
@@ -154,6 +232,8 @@ class TheEng:
         self.popSize = optimizationSettings["Population Size"]
         n_eval = optimizationSettings["Number of Evaluations"]
         self.termination = ("n_eval", n_eval)
+        self.convergenceTolerance = optimizationSettings.get("Convergence Tolerance")
+        self.trustRegion = optimizationSettings.get("Trust Region", False)
         self.rankingName = optimizationSettings["Ranking Method"]
         self.objectives = optimizationSettings["Objectives Expressions"]
         self.constraints = optimizationSettings["Constraints Expressions"]
@@ -0,0 +1,237 @@
+import sys
+from time import sleep
+from typing import Dict, List, Union
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from pandas import DataFrame, to_numeric
+
+from theeng.core.pareto import hypervolume, nonDominatedMask
+from theeng.core.stream import ResultsStreamReader
+
+
+class HistoryMonitor:
+    """Incremental summary of a results stream: Pareto front, hypervolume, throughput and worker utilization.
+
+    Only the evaluations appended since the previous update are read and only aggregates are kept, so an
+    update costs the same at the first and at the millionth evaluation.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        objectives: List[str],
+        constraints: Union[List[str], None] = None,
+        reference: Union[List[float], None] = None,
+        binSeconds: float = 60.0,
+    ) -> None:
+        """Initialize the monitor.
+
+        Args:
+            path (str): The stream written by ResultsStream during the run.
+            objectives (List[str]): Objective columns, all minimized.
+            constraints (Union[List[str], None], optional): Constraint columns, feasible when <= 0. Defaults to None.
+            reference (Union[List[float], None], optional): Hypervolume reference point. Defaults to the worst objectives of the first feasible batch, plus 10% of their range.
+            binSeconds (float, optional): Width of the throughput bins. Defaults to 60.0.
+        """
+        self.reader = ResultsStreamReader(path)
+        self.objectives = objectives
+        self.constraints = constraints or []
+        self.reference = None if reference is None else np.asarray(reference, dtype=float)
+        self.binSeconds = binSeconds
+
+        self.nEvaluations = 0
+        self.nFeasible = 0
+        self.front = np.empty((0, len(objectives)))
+        self.hypervolumeHistory = []  # (nEvaluations, hypervolume)
+        self.throughput = {}  # bin start: evaluations completed
+        self.busy = {}  # worker: seconds spent evaluating
+        self.firstStart = np.inf
+        self.lastEnd = -np.inf
+
+    def update(self) -> int:
+        """Read the evaluations appended since the previous update.
+
+        Returns:
+            int: Number of new evaluations.
+        """
+        data = self.reader.tail()
+        if not len(data):
+            return 0
+        self.nEvaluations += len(data)
+
+        if "_start" in data.columns and "_end" in data.columns:
+            start = to_numeric(data["_start"], errors="coerce").to_numpy(dtype=float)
+            end = to_numeric(data["_end"], errors="coerce").to_numpy(dtype=float)
+            self.firstStart = min(self.firstStart, np.nanmin(start))
+            self.lastEnd = max(self.lastEnd, np.nanmax(end))
+            bins, counts = np.unique(
+                np.floor(end / self.binSeconds) * self.binSeconds, return_counts=True
+            )
+            for b, count in zip(bins.tolist(), counts.tolist()):
+                self.throughput[b] = self.throughput.get(b, 0) + count
+            if "_worker" in data.columns:
+                durations = DataFrame({"worker": data["_worker"].astype(str), "duration": end - start})
+                for worker, duration in durations.groupby("worker")["duration"].sum().items():
+                    self.busy[worker] = self.busy.get(worker, 0.0) + float(duration)
+
+        F = data[self.objectives].apply(to_numeric, errors="coerce").to_numpy(dtype=float)
+        feasible = np.isfinite(F).all(axis=1)
+        for constraint in self.constraints:
+            feasible &= to_numeric(data[constraint], errors="coerce").to_numpy(dtype=float) <= 0
+        F = F[feasible]
+        self.nFeasible += len(F)
+        if len(F):
+            if self.reference is None:
+                self.reference = F.max(axis=0) + 0.1 * (np.ptp(F, axis=0) + 1e-12)
+            candidates = np.vstack([self.front, F])
+            self.front = candidates[nonDominatedMask(candidates)]
+        if self.reference is not None:
+            self.hypervolumeHistory.append(
+                (self.nEvaluations, hypervolume(self.front, self.reference))
+            )
+        return len(data)
+
+    def getUtilization(self) -> Dict[str, float]:
+        """Returns the fraction of the run each worker spent evaluating.
+
+        Returns:
+            Dict[str, float]: Utilization of each worker, between 0 and 1.
+        """
+        span = self.lastEnd - self.firstStart
+        if not np.isfinite(span) or span <= 0:
+            return {worker: 0.0 for worker in self.busy}
+        return {worker: busy / span for worker, busy in self.busy.items()}
+
+
+class LiveDashboard:
+    def __init__(self, path: str, follow: bool = True) -> None:
+        st.set_page_config(layout="wide")
+        st.title("Live Optimization Dashboard")
+
+        with st.expander("Settings", expanded=True):
+            left, center, right = st.columns((1, 1, 1))
+            with left:
+                self.path = st.text_input("Path to history stream", path)
+                interval = st.number_input("Refresh interval [s]", 0.5, 3600.0, 5.0)
+            with center:
+                objectives = self._getNames("Objectives name")
+                constraints = self._getNames("Constraints name")
+            with right:
+                reference = self._getNames("Hypervolume reference (optional)")
+                follow = st.checkbox("Follow the run", value=follow)
+
+        if not objectives:
+            st.info("Set the objectives to monitor.")
+            return
+
+        settings = (self.path, tuple(objectives), tuple(constraints), tuple(reference))
+        if st.session_state.get("monitorSettings") != settings:  # keep the monitor across reruns
+            st.session_state["monitorSettings"] = settings
+            st.session_state["monitor"] = HistoryMonitor(
+                self.path,
+                objectives,
+                constraints,
+                [float(value) for value in reference] if reference else None,
+            )
+        monitor = st.session_state["monitor"]
+
+        metrics = st.empty()
+        top_left, top_right = st.columns((1, 1))
+        bottom_left, bottom_right = st.columns((1, 1))
+        with top_left:
+            frontPlot = st.empty()
+        with top_right:
+            hypervolumePlot = st.empty()
+        with bottom_left:
+            throughputPlot = st.empty()
+        with bottom_right:
+            utilizationPlot = st.empty()
+
+        while True:
+            try:
+                monitor.update()
+            except KeyError as error:
+                st.error(f"Column {error} not found in the history stream.")
+                return
+            with metrics.container():
+                self._showMetrics(monitor)
+            frontPlot.plotly_chart(self._frontFigure(monitor), use_container_width=True)
+            hypervolumePlot.plotly_chart(
+                self._hypervolumeFigure(monitor), use_container_width=True
+            )
+            throughputPlot.plotly_chart(
+                self._throughputFigure(monitor), use_container_width=True
+            )
+            utilizationPlot.plotly_chart(
+                self._utilizationFigure(monitor), use_container_width=True
+            )
+            if not follow:
+                break
+            sleep(interval)
+
+    def _getNames(self, label: str) -> List[str]:
+        namesString = st.text_input(label)
+        return list(filter(None, namesString.replace(" ", "").split(",")))
+
+    def _showMetrics(self, monitor: HistoryMonitor):
+        columns = st.columns(4)
+        columns[0].metric("Evaluations", monitor.nEvaluations)
+        columns[1].metric("Feasible", monitor.nFeasible)
+        columns[2].metric("Pareto designs", len(monitor.front))
+        hypervolumes = monitor.hypervolumeHistory
+        columns[3].metric(
+            "Hypervolume", f"{hypervolumes[-1][1]:.4g}" if hypervolumes else "-"
+        )
+
+    def _frontFigure(self, monitor: HistoryMonitor) -> go.Figure:
+        front = monitor.front[np.argsort(monitor.front[:, 0])] if len(monitor.front) else monitor.front
+        if front.shape[1] >= 2:
+            figure = go.Figure(
+                go.Scattergl(x=front[:, 0], y=front[:, 1], mode="markers+lines")
+            )
+            figure.update_layout(
+                xaxis_title=monitor.objectives[0], yaxis_title=monitor.objectives[1]
+            )
+        else:
+            figure = go.Figure(go.Scatter(y=front[:, 0] if len(front) else [], mode="markers"))
+            figure.update_layout(yaxis_title=monitor.objectives[0])
+        figure.update_layout(title="Pareto front")
+        return figure
+
+    def _hypervolumeFigure(self, monitor: HistoryMonitor) -> go.Figure:
+        history = np.array(monitor.hypervolumeHistory).reshape(-1, 2)
+        figure = go.Figure(go.Scatter(x=history[:, 0], y=history[:, 1], mode="lines"))
+        figure.update_layout(
+            title="Hypervolume", xaxis_title="Evaluations", yaxis_title="Hypervolume"
+        )
+        return figure
+
+    def _throughputFigure(self, monitor: HistoryMonitor) -> go.Figure:
+        bins = sorted(monitor.throughput)
+        figure = go.Figure(
+            go.Bar(
+                x=[b - monitor.firstStart for b in bins],
+                y=[monitor.throughput[b] * 60 / monitor.binSeconds for b in bins],
+            )
+        )
+        figure.update_layout(
+            title="Throughput", xaxis_title="Time [s]", yaxis_title="Evaluations per minute"
+        )
+        return figure
+
+    def _utilizationFigure(self, monitor: HistoryMonitor) -> go.Figure:
+        utilization = monitor.getUtilization()
+        figure = go.Figure(
+            go.Bar(x=list(utilization.keys()), y=[100 * u for u in utilization.values()])
+        )
+        figure.update_layout(
+            title="Worker utilization", xaxis_title="Worker", yaxis_title="Busy [%]"
+        )
+        return figure
+
+
+if __name__ == "__main__":
+    # streamlit run liveDashboard.py -- path/to/history.csv
+    view = LiveDashboard(path=sys.argv[1] if len(sys.argv) > 1 else "history.csv")
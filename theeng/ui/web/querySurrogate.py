@@ -1,11 +1,25 @@
+from os import stat
 from os.path import isfile
 from pickle import load
-from typing import List
+from typing import List, Tuple
 
+import numpy as np
+import plotly.graph_objects as go
 import streamlit as st
+from pandas import DataFrame, read_csv
+from plotly.subplots import make_subplots
+
+
+@st.cache_resource(max_entries=4)
+def _loadSurrogate(path: str, modified: int, size: int):
+    """Unpickle a surrogate once; the modification time and size key the cache, so a rewritten file is reloaded."""
+    with open(path, "rb") as surrogateFile:
+        return load(surrogateFile)  # type: ignore
 
 
 class SurrogateView:
+    modes = ("Single design", "Response surface", "Sweep", "Designs file")
+
     def __init__(self, path: str) -> None:
         st.set_page_config(layout="wide")
         st.title("Surrogate Inspector")
@@ -27,25 +41,39 @@ class SurrogateView:
 
             self.names = self.pNames + self.resultNames  # type: ignore
 
+        mode = st.radio("Mode", SurrogateView.modes, horizontal=True)
+
         with st.container():
-            left_1, right_1 = st.columns((1, 1))
+            left_1, right_1 = st.columns((1, 2))
             with left_1:
                 numericInputs = self._getInputs(self.pNames)  # type: ignore
-                predictButton = st.button("Predict")
+                if mode == "Single design":
+                    predictButton = st.button("Predict")
             with right_1:
-                if predictButton:
-                    if evaluator:
-                        resultList = evaluator(numericInputs)  # type: ignore
+                if not evaluator:
+                    return
+                if mode == "Single design":
+                    if predictButton:
+                        resultList = evaluator([numericInputs])  # type: ignore
                         self._getOutputs(self.resultNames, resultList)  # type: ignore
+                elif mode == "Response surface":
+                    self._responseSurface(evaluator, numericInputs)
+                elif mode == "Sweep":
+                    self._sweep(evaluator, numericInputs)
+                else:
+                    self._designsFile(evaluator)
 
     def _setSurrogatePath(self, path: str):
         self.surrogatePath = st.text_input("Path to surrogate", path)
         if isfile(self.surrogatePath):
-            with open(self.surrogatePath, "rb") as surrogateFile:
-                surrogate = load(surrogateFile)  # type: ignore
+            fileStat = stat(self.surrogatePath)
+            surrogate = _loadSurrogate(
+                self.surrogatePath, fileStat.st_mtime_ns, fileStat.st_size
+            )
 
-            def evaluator(parameterValues):
-                return surrogate.predict([parameterValues])
+            def evaluator(designs) -> np.ndarray:
+                designs = np.asarray(designs, dtype=float)
+                return np.asarray(surrogate.predict(designs)).reshape(len(designs), -1)
 
             return evaluator
         else:
@@ -77,6 +105,130 @@ class SurrogateView:
         for output in zip(outputsList, resultList[0]):
             textOutputs.append(st.metric(output[0], output[1]))
 
+    def _responseSurface(self, evaluator, numericInputs: List[float]):
+        """Predict a grid over two parameters, the others fixed at their inputs, in a single call."""
+        pNames = list(filter(None, self.pNames))  # type: ignore
+        if len(pNames) < 2:
+            st.info("A response surface needs at least two parameters.")
+            return
+        left, right = st.columns((1, 1))
+        with left:
+            xName = st.selectbox("X parameter", pNames, index=0)
+        with right:
+            yName = st.selectbox("Y parameter", pNames, index=1)
+        if xName == yName:  # before the range inputs, keyed by parameter name
+            st.info("Choose two different parameters.")
+            return
+        with left:
+            xRange = self._getRange(xName, numericInputs[pNames.index(xName)])
+        with right:
+            yRange = self._getRange(yName, numericInputs[pNames.index(yName)])
+        resolution = st.slider("Grid points per parameter", 10, 300, 100)
+
+        xValues = np.linspace(*xRange, resolution)
+        yValues = np.linspace(*yRange, resolution)
+        xGrid, yGrid = np.meshgrid(xValues, yValues)
+        designs = np.tile(np.asarray(numericInputs, dtype=float), (xGrid.size, 1))
+        designs[:, pNames.index(xName)] = xGrid.ravel()
+        designs[:, pNames.index(yName)] = yGrid.ravel()
+        predictions = evaluator(designs)
+
+        resultIndex, resultName = self._selectResult(predictions)
+        surface = predictions[:, resultIndex].reshape(xGrid.shape)
+        figure = go.Figure(go.Surface(x=xValues, y=yValues, z=surface))
+        figure.update_layout(
+            scene={"xaxis_title": xName, "yaxis_title": yName, "zaxis_title": resultName},
+            height=600,
+        )
+        st.plotly_chart(figure, use_container_width=True)
+
+    def _sweep(self, evaluator, numericInputs: List[float]):
+        """Vary each parameter alone, the others fixed at their inputs, predicting all the sweeps in a single call."""
+        pNames = list(filter(None, self.pNames))  # type: ignore
+        if not pNames:
+            return
+        nPoints = st.number_input("Points per parameter", 2, 100000, 1000, step=100)
+        with st.expander("Ranges"):
+            ranges = [
+                self._getRange(name, value) for name, value in zip(pNames, numericInputs)
+            ]
+
+        nominal = np.asarray(numericInputs, dtype=float)
+        designs = np.tile(nominal, (len(pNames) * nPoints, 1))
+        sweeps = []
+        for i, (lower, upper) in enumerate(ranges):
+            values = np.linspace(lower, upper, nPoints)
+            designs[i * nPoints : (i + 1) * nPoints, i] = values
+            sweeps.append(values)
+        predictions = evaluator(designs)
+
+        resultIndex, resultName = self._selectResult(predictions)
+        nColumns = min(len(pNames), 3)
+        nRows = -(-len(pNames) // nColumns)
+        figure = make_subplots(rows=nRows, cols=nColumns, subplot_titles=pNames)
+        for i, values in enumerate(sweeps):
+            figure.add_trace(
+                go.Scattergl(
+                    x=values,
+                    y=predictions[i * nPoints : (i + 1) * nPoints, resultIndex],
+                    mode="lines",
+                    name=pNames[i],
+                ),
+                row=i // nColumns + 1,
+                col=i % nColumns + 1,
+            )
+        figure.update_yaxes(title_text=resultName, col=1)
+        figure.update_layout(showlegend=False, height=300 * nRows)
+        st.plotly_chart(figure, use_container_width=True)
+
+    def _designsFile(self, evaluator):
+        """Predict every design of an uploaded csv file in a single call."""
+        pNames = list(filter(None, self.pNames))  # type: ignore
+        uploadedFile = st.file_uploader("Designs file", type="csv")
+        if uploadedFile is None:
+            return
+        designs = read_csv(uploadedFile)
+        missing = [name for name in pNames if name not in designs.columns]
+        if missing:
+            st.error(f"Parameters {missing} not found in the designs file.")
+            return
+
+        predictions = evaluator(designs[pNames].to_numpy(dtype=float))
+        results = DataFrame(predictions, columns=self._resultColumns(predictions))
+        data = designs.reset_index(drop=True).join(results, rsuffix=" predicted")
+        st.dataframe(data)
+        st.download_button(
+            "Download predictions", data.to_csv(index=False), "predictions.csv", "text/csv"
+        )
+
+        left, right = st.columns((1, 1))
+        with left:
+            xName = st.selectbox("X axis", list(data.columns), index=0)
+        with right:
+            yName = st.selectbox("Y axis", list(data.columns), index=len(data.columns) - 1)
+        figure = go.Figure(
+            go.Scattergl(x=data[xName], y=data[yName], mode="markers", marker={"size": 4})
+        )
+        figure.update_layout(xaxis_title=xName, yaxis_title=yName)
+        st.plotly_chart(figure, use_container_width=True)
+
+    def _getRange(self, name: str, value: float) -> Tuple[float, float]:
+        # stacked: callers are already inside columns, which streamlit nests only one level deep
+        lower = st.number_input(f"{name} min", value=value - 1.0, key=f"{name} min")
+        upper = st.number_input(f"{name} max", value=value + 1.0, key=f"{name} max")
+        return lower, upper
+
+    def _selectResult(self, predictions: np.ndarray) -> Tuple[int, str]:
+        resultColumns = self._resultColumns(predictions)
+        resultName = st.selectbox("Result", resultColumns)
+        return resultColumns.index(resultName), resultName
+
+    def _resultColumns(self, predictions: np.ndarray) -> List[str]:
+        resultNames = list(filter(None, self.resultNames))  # type: ignore
+        if len(resultNames) != predictions.shape[1]:
+            resultNames = [f"Result {i}" for i in range(predictions.shape[1])]
+        return resultNames
+
 
 if __name__ == "__main__":
     view = SurrogateView(
@@ -0,0 +1,379 @@
+import json
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pickle import load
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import perf_counter, time
+from typing import Callable, Dict, List, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+_STOP = object()  # queued by MicroBatcher.close()
+
+
+class MicroBatcher:
+    """Coalesce concurrent prediction requests into batches evaluated by a single vectorized call.
+
+    Requests are queued; a worker thread takes the first one, waits at most maxDelay for others to
+    arrive, stacks them up to maxBatchSize designs and predicts them at once, then hands every request
+    its own rows back.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[np.ndarray], np.ndarray],
+        maxBatchSize: int = 1024,
+        maxDelay: float = 0.002,
+        latencyWindow: int = 10000,
+    ) -> None:
+        """Initialize the batcher and start its worker thread.
+
+        Args:
+            predict (Callable[[np.ndarray], np.ndarray]): Vectorized prediction, designs (nDesigns, nVar) to results (nDesigns, nResults).
+            maxBatchSize (int, optional): Largest number of designs predicted at once, unless a single request is larger. Defaults to 1024.
+            maxDelay (float, optional): Seconds the first request of a batch waits for others. Defaults to 0.002.
+            latencyWindow (int, optional): Number of recent requests the latency percentiles are computed on. Defaults to 10000.
+        """
+        self.predict = predict
+        self.maxBatchSize = maxBatchSize
+        self.maxDelay = maxDelay
+
+        self.startTime = time()
+        self.nRequests = 0
+        self.nDesigns = 0
+        self.nBatches = 0
+        self.nErrors = 0
+        self.predictSeconds = 0.0
+        self.latencies = deque(maxlen=latencyWindow)
+        self._metricsLock = Lock()
+
+        self._queue = Queue()
+        self._pending = None
+        self._worker = Thread(target=self._run, name="MicroBatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, designs: np.ndarray) -> Future:
+        """Queue designs for prediction.
+
+        Args:
+            designs (np.ndarray): Designs (nDesigns, nVar).
+
+        Returns:
+            Future: Resolves to the predicted results (nDesigns, nResults).
+        """
+        future = Future()
+        self._queue.put((np.atleast_2d(np.asarray(designs, dtype=float)), future, perf_counter()))
+        return future
+
+    def __call__(self, designs: np.ndarray, timeout: Union[float, None] = None) -> np.ndarray:
+        return self.submit(designs).result(timeout)
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._worker.join()
+
+    def getMetrics(self) -> Dict[str, float]:
+        """Returns request, batch and latency statistics since the start.
+
+        Returns:
+            Dict[str, float]: The metrics, latencies in seconds.
+        """
+        with self._metricsLock:
+            latencies = np.array(self.latencies)
+            metrics = {
+                "uptime": time() - self.startTime,
+                "requests": self.nRequests,
+                "designs": self.nDesigns,
+                "batches": self.nBatches,
+                "errors": self.nErrors,
+                "predictSeconds": self.predictSeconds,
+            }
+        metrics["meanBatchSize"] = metrics["designs"] / max(metrics["batches"], 1)
+        metrics["requestsPerSecond"] = metrics["requests"] / metrics["uptime"]
+        metrics["designsPerSecond"] = metrics["designs"] / metrics["uptime"]
+        for name, q in (("p50", 50), ("p90", 90), ("p99", 99)):
+            metrics[f"latency_{name}"] = float(np.percentile(latencies, q)) if len(latencies) else 0.0
+        metrics["latency_max"] = float(latencies.max()) if len(latencies) else 0.0
+        return metrics
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._evaluate(batch)
+
+    def _collect(self) -> Union[List[Tuple[np.ndarray, Future, float]], None]:
+        first = self._pending if self._pending is not None else self._queue.get()
+        self._pending = None
+        if first is _STOP:
+            return None
+        batch, size = [first], len(first[0])
+        deadline = perf_counter() + self.maxDelay
+        while size < self.maxBatchSize:
+            try:
+                request = self._queue.get(timeout=max(deadline - perf_counter(), 0.0))
+            except Empty:
+                break
+            if request is _STOP or size + len(request[0]) > self.maxBatchSize:
+                self._pending = request  # starts the next batch, or stops the worker after this one
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _evaluate(self, batch: List[Tuple[np.ndarray, Future, float]]) -> None:
+        start = perf_counter()
+        try:
+            designs = np.vstack([designs for designs, _, _ in batch])
+            results = np.asarray(self.predict(designs)).reshape(len(designs), -1)
+        except Exception as error:
+            for _, future, _ in batch:
+                future.set_exception(error)
+            with self._metricsLock:
+                self.nErrors += len(batch)
+            return
+        end = perf_counter()
+
+        offset = 0
+        for requestDesigns, future, _ in batch:
+            future.set_result(results[offset : offset + len(requestDesigns)])
+            offset += len(requestDesigns)
+        with self._metricsLock:
+            self.nRequests += len(batch)
+            self.nDesigns += len(designs)
+            self.nBatches += 1
+            self.predictSeconds += end - start
+            self.latencies.extend(end - submitted for _, _, submitted in batch)
+
+
+class SurrogateHandler(BaseHTTPRequestHandler):
+    """Routes of the surrogate service.
+
+    POST /predict   JSON {"designs": [[...], ...]} or {"designs": [{name: value}, ...]}, answered with
+                    {"results": [[...], ...], "names": [...]}; or raw float64 designs with Content-Type
+                    application/octet-stream, answered with raw float64 results.
+    GET  /health    Model and service status.
+    GET  /metrics   Request, batch and latency statistics, as JSON or with ?format=prometheus as text.
+    """
+
+    server: "SurrogateServer"
+    protocol_version = "HTTP/1.1"  # keep-alive, clients reuse their connection
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._sendJson(200, self.server.getHealth())
+        elif url.path == "/metrics":
+            metrics = self.server.batcher.getMetrics()
+            if parse_qs(url.query).get("format") == ["prometheus"]:
+                text = "".join(
+                    f"theeng_surrogate_{name} {value}\n" for name, value in metrics.items()
+                )
+                self._send(200, text.encode(), "text/plain; version=0.0.4")
+            else:
+                self._sendJson(200, metrics)
+        else:
+            self._sendJson(404, {"error": f"Unknown path {url.path}."})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if url.path != "/predict":
+            self._sendJson(404, {"error": f"Unknown path {url.path}."})
+            return
+        binary = self.headers.get("Content-Type", "").startswith("application/octet-stream")
+        try:
+            designs = self._binaryDesigns(body) if binary else self._jsonDesigns(body)
+        except (ValueError, KeyError, TypeError) as error:
+            self._sendJson(400, {"error": str(error)})
+            return
+        try:
+            results = self.server.batcher(designs, timeout=self.server.requestTimeout)
+        except Exception as error:
+            self._sendJson(500, {"error": f"Prediction failed: {error}"})
+            return
+
+        if binary:
+            self._send(
+                200,
+                results.astype("<f8").tobytes(),
+                "application/octet-stream",
+                {"X-Shape": f"{results.shape[0]},{results.shape[1]}"},
+            )
+        else:
+            self._sendJson(
+                200, {"results": results.tolist(), "names": self.server.resultNames}
+            )
+
+    def _jsonDesigns(self, body: bytes) -> np.ndarray:
+        request = json.loads(body)
+        designs = request["designs"] if isinstance(request, dict) else request
+        if designs and isinstance(designs[0], dict):
+            if not self.server.parameterNames:
+                raise ValueError("Designs by name need the service parameter names.")
+            designs = [
+                [design[name] for name in self.server.parameterNames] for design in designs
+            ]
+        return self.server.checkDesigns(np.asarray(designs, dtype=float))
+
+    def _binaryDesigns(self, body: bytes) -> np.ndarray:
+        values = np.frombuffer(body, dtype="<f8")
+        nVar = self.server.nParameters
+        if nVar is None:
+            shape = self.headers.get("X-Shape")
+            if shape is None:
+                raise ValueError("Binary designs need an X-Shape header: nDesigns,nVar.")
+            nVar = int(shape.split(",")[1])
+        if len(values) % nVar:
+            raise ValueError(f"Binary designs must hold a multiple of {nVar} values.")
+        return self.server.checkDesigns(values.reshape(-1, nVar))
+
+    def _sendJson(self, status: int, content: dict):
+        self._send(status, json.dumps(content).encode(), "application/json")
+
+    def _send(self, status: int, body: bytes, contentType: str, headers: Union[Dict[str, str], None] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class SurrogateServer(ThreadingHTTPServer):
+    """A local HTTP service answering predictions of a saved surrogate, batched across concurrent requests."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        surrogatePath: str,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        parameterNames: Union[List[str], None] = None,
+        resultNames: Union[List[str], None] = None,
+        maxBatchSize: int = 1024,
+        maxDelay: float = 0.002,
+        timeout: float = 60.0,
+        verbose: bool = False,
+    ) -> None:
+        """Load the surrogate once and bind the service.
+
+        Args:
+            surrogatePath (str): The pickled surrogate, as saved by Surrogate.generate(save=True).
+            host (str, optional): Interface to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on, 0 for any free port. Defaults to 8000.
+            parameterNames (Union[List[str], None], optional): Parameter names, in the order of the surrogate inputs, allowing designs by name. Defaults to None.
+            resultNames (Union[List[str], None], optional): Result names returned with the predictions. Defaults to None.
+            maxBatchSize (int, optional): Largest number of designs predicted at once. Defaults to 1024.
+            maxDelay (float, optional): Seconds a request waits for others to share its batch. Defaults to 0.002.
+            timeout (float, optional): Seconds a request waits for its prediction. Defaults to 60.0.
+            verbose (bool, optional): Log every request. Defaults to False.
+        """
+        with open(surrogatePath, "rb") as surrogateFile:
+            self.surrogate = load(surrogateFile)  # type: ignore
+        self.surrogatePath = surrogatePath
+        self.parameterNames = parameterNames
+        self.resultNames = resultNames
+        self.nParameters = (
+            len(parameterNames)
+            if parameterNames
+            else getattr(self.surrogate, "n_features_in_", None)
+        )
+        self.requestTimeout = timeout
+        self.verbose = verbose
+        self.batcher = MicroBatcher(self.surrogate.predict, maxBatchSize, maxDelay)
+        super().__init__((host, port), SurrogateHandler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def checkDesigns(self, designs: np.ndarray) -> np.ndarray:
+        designs = np.atleast_2d(designs)
+        if designs.ndim != 2 or not designs.size:
+            raise ValueError("Designs must be a non-empty list of designs.")
+        if self.nParameters is not None and designs.shape[1] != self.nParameters:
+            raise ValueError(
+                f"Designs must have {self.nParameters} parameters, got {designs.shape[1]}."
+            )
+        if not np.isfinite(designs).all():
+            raise ValueError("Designs must be finite.")
+        return designs
+
+    def getHealth(self) -> Dict:
+        return {
+            "status": "ok",
+            "surrogate": self.surrogatePath,
+            "model": type(self.surrogate).__name__,
+            "parameters": self.parameterNames or self.nParameters,
+            "results": self.resultNames,
+        }
+
+    def start(self) -> "SurrogateServer":
+        """Serve in a background thread, e.g. for tests on localhost.
+
+        Returns:
+            SurrogateServer: The running server.
+        """
+        self._thread = Thread(target=self.serve_forever, name="SurrogateServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+        self.batcher.close()
+
+
+def _getNames(namesString: Union[str, None]) -> Union[List[str], None]:
+    if not namesString:
+        return None
+    return list(filter(None, namesString.replace(" ", "").split(",")))
+
+
+if __name__ == "__main__":
+    # python -m theeng.ui.web.surrogateServer path/to/surrogate.pkl --port 0 --parameters x1,x2 --results f1,f2
+    parser = ArgumentParser(description="Serve the predictions of a saved surrogate over HTTP.")
+    parser.add_argument("surrogatePath")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port.")
+    parser.add_argument("--parameters", help="Comma separated parameter names.")
+    parser.add_argument("--results", help="Comma separated result names.")
+    parser.add_argument("--max-batch-size", type=int, default=1024)
+    parser.add_argument("--max-delay", type=float, default=0.002, help="Seconds.")
+    parser.add_argument("--verbose", action="store_true")
+    arguments = parser.parse_args()
+
+    server = SurrogateServer(
+        arguments.surrogatePath,
+        arguments.host,
+        arguments.port,
+        _getNames(arguments.parameters),
+        _getNames(arguments.results),
+        arguments.max_batch_size,
+        arguments.max_delay,
+        verbose=arguments.verbose,
+    )
+    print(f"Serving {arguments.surrogatePath} on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()